@@ -1,36 +1,84 @@
-from flask import Blueprint
-from flask_restx import Api
+import logging
+from flask import Blueprint, request
+from config import Config
+from .spec import GarageApi
+from utils.response_cache import response_cache
+from utils.single_flight import single_flight
 
 # Main Blueprint for all API routes
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
-# Flask-RESTx Api instance
-api = Api(
+# Flask-RESTx Api instance, serving a cached swagger.json
+api = GarageApi(
     api_bp,
     version='1.0',  # API version
     title='Garage API',  # Title displayed in the Swagger documentation
     description='API Swagger documentation',  # Description displayed in the Swagger documentation
-    doc='/docs'  # Documentation URL (http://127.0.0.1:5000/api/docs)
+    doc='/docs' if Config.SWAGGER_UI_ENABLED else False,  # Documentation URL (http://127.0.0.1:5000/api/docs)
+    decorators=[single_flight, response_cache],  # Shared and cached GET responses (the last one runs first)
 )
 
-# Import and register sub-Blueprints (namespaces)
-from .client import clients_ns
-from .employee import employees_ns
-from .task import tasks_ns
-from .setting import settings_ns
-from .work import works_ns
-from .vehicle import vehicles_ns
-from .invoice import invoices_ns
-from .invoice_item import invoice_items_ns
-
-
-# Add namespaces to the Swagger documentation and API
-api.add_namespace(clients_ns, path='/client')  # Routes for client operations
-api.add_namespace(employees_ns, path='/employee')  # Routes for employee operations
-api.add_namespace(tasks_ns, path='/task')
-api.add_namespace(settings_ns, path='/setting')
-api.add_namespace(works_ns, path='/work')  # Routes for work operations
-api.add_namespace(vehicles_ns, path='/vehicle')  # Routes for vehicle operations
-api.add_namespace(invoices_ns, path='/invoice')  # Routes for employee operations
-api.add_namespace(invoice_items_ns, path='/invoice_items')  # Routes for employee operations
+# Set once the namespaces have been added to the API
+_namespaces_registered = False
 
+
+@api_bp.after_request
+def make_conditional(response):
+    """
+    Answer GET requests whose If-None-Match holds the current ETag (row
+    version) of the resource with 304 Not Modified and no body.
+    """
+    if response.status_code == 200 and response.headers.get('ETag'):
+        response.make_conditional(request)
+    return response
+
+
+def register_namespaces():
+    """
+    Import the namespace modules and register them on the API.
+    Kept out of module import so that importing the package (e.g. for api_bp
+    or from tooling) does not load every resource, service and model module;
+    create_app calls it once before registering the blueprint.
+    Calling it again is a no-op.
+    """
+    global _namespaces_registered
+    if _namespaces_registered:
+        return
+    _namespaces_registered = True
+
+    # Import and register sub-Blueprints (namespaces)
+    from .client import clients_ns
+    from .employee import employees_ns
+    from .task import tasks_ns
+    from .setting import settings_ns
+    from .work import works_ns
+    from .vehicle import vehicles_ns
+    from .invoice import invoices_ns
+    from .invoice_item import invoice_items_ns
+    from .event import events_ns
+    from .change import changes_ns
+    from .batch import batch_ns
+    from .metrics import metrics_ns
+
+    # Add namespaces to the Swagger documentation and API
+    api.add_namespace(clients_ns, path='/client')  # Routes for client operations
+    api.add_namespace(employees_ns, path='/employee')  # Routes for employee operations
+    api.add_namespace(tasks_ns, path='/task')
+    api.add_namespace(settings_ns, path='/setting')
+    api.add_namespace(works_ns, path='/work')  # Routes for work operations
+    api.add_namespace(vehicles_ns, path='/vehicle')  # Routes for vehicle operations
+    api.add_namespace(invoices_ns, path='/invoice')  # Routes for employee operations
+    api.add_namespace(invoice_items_ns, path='/invoice_items')  # Routes for employee operations
+    api.add_namespace(events_ns, path='/events')  # Server-sent events stream
+    api.add_namespace(changes_ns, path='/changes')  # Change log for incremental sync
+    api.add_namespace(batch_ns, path='/batch')  # Several requests in one
+    api.add_namespace(metrics_ns, path='/metrics')  # Counters of the worker
+
+    # Optional read-only GraphQL endpoint (requires graphql-core)
+    if Config.GRAPHQL_ENABLED:
+        try:
+            from .graphql import graphql_ns
+        except ImportError as e:
+            logging.getLogger(__name__).warning("GraphQL endpoint disabled, graphql-core is not installed: %s", e)
+        else:
+            api.add_namespace(graphql_ns, path='/graphql')
@@ -0,0 +1,169 @@
+import logging
+from flask import current_app, g, request
+from flask_restx import Resource, fields
+from werkzeug.datastructures import Headers
+from werkzeug.test import EnvironBuilder
+from utils.utils import ApiNamespace
+from errors.errors import handle_errors
+from utils.database import TransactionRolledBack, begin_unit_of_work, end_unit_of_work
+
+
+# Module logger (logging itself is configured once by create_app)
+logger = logging.getLogger(__name__)
+
+# Namespace for multiplexed requests
+batch_ns = ApiNamespace('batch', description='Several API requests in one HTTP request')
+
+# Response headers of a sub-request that are not returned (they describe the HTTP message)
+SKIPPED_HEADERS = {'Content-Length', 'Content-Type'}
+
+# Headers of the batch request passed on to its sub-requests (the credentials of the caller)
+FORWARDED_HEADERS = ('Authorization', 'Cookie')
+
+# WSGI environ keys of the batch request that are not passed on: its HTTP
+# headers and body, and the per-request state of werkzeug and of the application
+SKIPPED_ENVIRON_PREFIXES = ('HTTP_', 'CONTENT_', 'werkzeug.', 'garage.')
+
+# Swagger models for the batch
+sub_request_model = batch_ns.model('SubRequest', {
+    'method': fields.String(required=True, description='HTTP method', enum=['GET', 'POST', 'PUT', 'PATCH', 'DELETE']),
+    'path': fields.String(required=True, description='Path of the API resource, with its query string (e.g. /api/task/?ids=1,2)'),
+    'body': fields.Raw(description='JSON body of the request'),
+    'headers': fields.Raw(description='Request headers (e.g. If-Match, Idempotency-Key)'),
+})
+
+batch_request_model = batch_ns.model('BatchRequest', {
+    'requests': fields.List(fields.Nested(sub_request_model), required=True, description='Requests, run in this order'),
+    'atomic': fields.Boolean(default=False, description='Run all the requests in one transaction, committed only if they all succeed'),
+})
+
+sub_response_model = batch_ns.model('SubResponse', {
+    'status': fields.Integer(description='HTTP status code'),
+    'headers': fields.Raw(description='Response headers (e.g. ETag)'),
+    'body': fields.Raw(description='JSON body of the response'),
+})
+
+batch_response_model = batch_ns.model('BatchResponse', {
+    'responses': fields.List(fields.Nested(sub_response_model), description='Responses, in the order of the requests'),
+    'committed': fields.Boolean(description='Atomic batches only: whether the transaction was committed'),
+})
+
+
+def error_entry(status, message):
+    """
+    Response entry of a sub-request rejected or not run by the batch.
+    """
+    return {"status": status, "headers": {}, "body": {"message": message, "status": "error"}}
+
+
+def sub_request_environ(index, sub_request):
+    """
+    WSGI environ of a sub-request, built from the environ of the batch request:
+    the server, host, scheme, remote address and any keys set by the WSGI
+    server or a proxy are kept, the method, path, headers and body are those
+    of the sub-request. The Authorization and Cookie headers of the batch are
+    passed on unless the sub-request sets its own.
+    :param index: Position of the sub-request in the batch.
+    :param sub_request: Dictionary with method, path, body and headers.
+    :return: dict: The environ.
+    """
+    headers = Headers(sub_request.get('headers') or {})
+    headers['X-Request-ID'] = f"{g.request_id}.{index}"
+    for name in FORWARDED_HEADERS:
+        if name in request.headers and name not in headers:
+            headers[name] = request.headers[name]
+    environ_base = {key: value for key, value in request.environ.items()
+                    if not key.startswith(SKIPPED_ENVIRON_PREFIXES)}
+    options = {'json': sub_request['body']} if sub_request.get('body') is not None else {}
+    return EnvironBuilder(sub_request['path'], base_url=request.root_url, method=sub_request['method'].upper(),
+                          headers=headers, environ_base=environ_base, **options).get_environ()
+
+
+def dispatch(index, sub_request):
+    """
+    Run a sub-request through the API resources, in the application context
+    (and so the database session) of the batch request. The request hooks run
+    as for a normal request; in UNIT_OF_WORK mode the sub-request joins the
+    transaction of the batch if one is open.
+    :param index: Position of the sub-request in the batch.
+    :param sub_request: Dictionary with method, path, body and headers.
+    :return: dict: Status, headers and body of the response.
+    """
+    path = sub_request['path']
+    if not path.startswith('/api/') or path.split('?')[0].rstrip('/') == '/api/batch':
+        return error_entry(400, "path must be an API resource other than /api/batch.")
+
+    # The sub-request shares the application context, and so g, with the batch:
+    # whatever its hooks and handler store there is dropped afterwards
+    saved_g = vars(g).copy()
+    try:
+        with current_app.request_context(sub_request_environ(index, sub_request)):
+            response = current_app.full_dispatch_request()
+    finally:
+        vars(g).clear()
+        vars(g).update(saved_g)
+    if response.is_streamed:
+        response.close()  # e.g. /api/events: never ends, and cannot be buffered
+        return error_entry(400, "Streamed responses are not supported in a batch.")
+    body = response.get_json(silent=True)
+    if body is None and response.data:
+        body = response.get_data(as_text=True)
+    return {
+        "status": response.status_code,
+        "headers": {name: value for name, value in response.headers.items() if name not in SKIPPED_HEADERS},
+        "body": body,
+    }
+
+
+@batch_ns.route('')
+class Batch(Resource):
+    """
+    Runs several API requests in one HTTP request.
+    """
+    # The sub-requests are committed separately or, for atomic batches, together
+    unit_of_work = False
+
+    @batch_ns.doc('batch')
+    @batch_ns.expect(batch_request_model, validate=True)
+    @batch_ns.response(200, 'Responses of the requests', batch_response_model)
+    @batch_ns.response(400, 'Invalid batch')
+    @handle_errors("An error occurred while running the batch.")
+    def post(self):
+        """
+        Run the requests in order and return their responses together.
+        Each request is committed on its own, unless the batch is atomic: then
+        they run in one transaction that is committed only if every request
+        succeeds (status < 400); the requests after a failure are not run
+        (status 424) and nothing is committed.
+        :return: The responses, in the order of the requests
+        """
+        data = batch_ns.payload
+        sub_requests = data['requests']
+        atomic = data.get('atomic', False)
+        if len(sub_requests) > current_app.config['BATCH_MAX_REQUESTS']:
+            batch_ns.abort(400, f"A batch can hold at most {current_app.config['BATCH_MAX_REQUESTS']} requests.")
+
+        responses = []
+        if atomic:
+            begin_unit_of_work()
+        try:
+            for index, sub_request in enumerate(sub_requests):
+                responses.append(dispatch(index, sub_request))
+                if atomic and responses[-1]['status'] >= 400:
+                    break
+        except BaseException:
+            if atomic:
+                end_unit_of_work(commit_changes=False)
+            raise
+        if not atomic:
+            return {"responses": responses}
+
+        succeeded = all(response['status'] < 400 for response in responses)
+        committed = succeeded
+        try:
+            end_unit_of_work(commit_changes=succeeded)
+        except TransactionRolledBack:
+            committed = False  # A service rolled back without failing its request
+        responses += [error_entry(424, "Not run: an earlier request of the atomic batch failed.")
+                      for _ in sub_requests[len(responses):]]
+        return {"responses": responses, "committed": committed}
@@ -0,0 +1,63 @@
+import logging
+from flask import current_app, request
+from flask_restx import Resource, fields
+from utils.utils import ApiNamespace
+from errors.errors import handle_errors
+from services.change_service import get_changes
+
+
+# Module logger (logging itself is configured once by create_app)
+logger = logging.getLogger(__name__)
+
+# Namespace for incremental synchronization
+changes_ns = ApiNamespace('changes', description='Change log for incremental synchronization')
+
+# Entities recorded in the change log
+ENTITIES = ['client', 'employee', 'invoice', 'invoice_item', 'setting', 'task', 'vehicle', 'work']
+
+# Swagger models for the change log
+change_model = changes_ns.model('Change', {
+    'seq': fields.Integer(description='Sequence number of the change'),
+    'entity': fields.String(description='Changed entity', enum=ENTITIES),
+    'id': fields.Integer(description='ID of the changed row'),
+    'op': fields.String(description='Operation', enum=['create', 'update', 'delete']),
+    'version': fields.Integer(description='Version of the row after the change'),
+    'data': fields.Raw(description='Row after the change (only the ID for deletes)'),
+    'created_at': fields.DateTime(description='When the change was recorded'),
+})
+
+change_page_model = changes_ns.model('ChangePage', {
+    'changes': fields.List(fields.Nested(change_model)),
+    'last_seq': fields.Integer(description='Pass as since to fetch the next page'),
+    'has_more': fields.Boolean(description='Whether more changes are pending'),
+})
+
+
+@changes_ns.route('')
+class ChangeList(Resource):
+    """
+    Returns the changes recorded after a sequence number, in order.
+    """
+
+    @changes_ns.doc('get_changes', params={
+        'since': 'Sequence number of the last change already processed (default 0)',
+        'limit': 'Maximum number of changes to return',
+        'entity': 'Only return changes of this entity; repeat for several',
+    })
+    @changes_ns.marshal_with(change_page_model)
+    @handle_errors("An error occurred while retrieving the changes.")
+    def get(self):
+        """
+        Retrieve the changes recorded after `since`.
+        :return: A page of changes and the sequence number to resume from
+        """
+        since = request.args.get('since', '0')
+        limit = request.args.get('limit', str(current_app.config['CHANGES_DEFAULT_LIMIT']))
+        entities = request.args.getlist('entity')
+        if not since.isdigit() or not limit.isdigit() or int(limit) == 0:
+            changes_ns.abort(400, "since and limit must be non-negative integers (limit > 0).")
+        unknown = [entity for entity in entities if entity not in ENTITIES]
+        if unknown:
+            changes_ns.abort(400, f"Unknown entity: {', '.join(unknown)}.")
+        limit = min(int(limit), current_app.config['CHANGES_MAX_LIMIT'])
+        return get_changes(int(since), limit, entities)
@@ -1,32 +1,97 @@
+import json
 import logging
-from flask_restx import Namespace, Resource
-from werkzeug.exceptions import HTTPException
+from decimal import Decimal
+from flask import Response, request, stream_with_context
+from flask_restx import Resource, fields
+from errors.errors import handle_errors
 from services.client_service import (
     get_all_clients,
     get_client,
     create_client,
     update_client,
-    delete_client
+    patch_client,
+    delete_client,
+    iter_client_statement
 )
-from utils.utils import generate_swagger_model
-from models.client import Client
+from utils.utils import ApiNamespace, generate_swagger_model, parse_datetime, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from utils.response_cache import cached
+from models.client import Client as ClientModel
 
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for managing clients
-clients_ns = Namespace('client', description='CRUD operations for managing clients')
+clients_ns = ApiNamespace('client', description='CRUD operations for managing clients')
 
 # Generate the Swagger model for the client resource
 client_model = generate_swagger_model(
     api=clients_ns,        # Namespace to associate with the model
-    model=Client,          # SQLAlchemy model representing the client resource
+    model=ClientModel,          # SQLAlchemy model representing the client resource
     exclude_fields=[],     # No excluded fields in this model
     readonly_fields=['client_id']  # Fields that cannot be modified
 )
 
+# Swagger models documenting the streamed statement of a client
+statement_item_model = clients_ns.model('StatementItem', {
+    'item_id': fields.Integer(description='Invoice item ID'),
+    'description': fields.String(description='Item description'),
+    'cost': fields.Float(description='Item cost'),
+    'task_id': fields.Integer(description='Invoiced task'),
+})
+statement_invoice_model = clients_ns.model('StatementInvoice', {
+    'invoice_id': fields.Integer(description='Invoice ID'),
+    'issued_at': fields.DateTime(description='Issue date'),
+    'total': fields.Float(description='Total before IVA'),
+    'iva': fields.Float(description='IVA rate'),
+    'total_with_iva': fields.Float(description='Total with IVA'),
+    'running_total': fields.Float(description='Sum of the totals up to this invoice'),
+    'running_total_with_iva': fields.Float(description='Sum of the totals with IVA up to this invoice'),
+    'items': fields.List(fields.Nested(statement_item_model)),
+})
+statement_model = clients_ns.model('ClientStatement', {
+    'client_id': fields.Integer(description='Client ID'),
+    'from': fields.DateTime(description='Start of the period (inclusive)'),
+    'to': fields.DateTime(description='End of the period (exclusive)'),
+    'invoices': fields.List(fields.Nested(statement_invoice_model)),
+    'invoice_count': fields.Integer(description='Invoices in the period'),
+    'total': fields.Float(description='Total of the period before IVA'),
+    'total_with_iva': fields.Float(description='Total of the period with IVA'),
+})
+
+
+def _json_default(value):
+    # Amounts are Decimals, rendered as numbers like fields.Float; dates as ISO 8601
+    if isinstance(value, Decimal):
+        return float(value)
+    return value.isoformat()
+
+
+def generate_statement(client_id, start, end):
+    """
+    Encode a client statement as JSON, one invoice at a time.
+    The period totals are the running totals of the last invoice, so they come
+    after the invoices in the document.
+    :return: generator: Chunks of the JSON document.
+    """
+    header = {"client_id": client_id, "from": start, "to": end}
+    yield json.dumps(header, default=_json_default)[:-1] + ', "invoices": ['
+    count, last = 0, None
+    for invoice in iter_client_statement(client_id, start, end):
+        yield (', ' if count else '') + json.dumps(invoice, default=_json_default)
+        count, last = count + 1, invoice
+    totals = {
+        "invoice_count": count,
+        "total": last["running_total"] if last else 0,
+        "total_with_iva": last["running_total_with_iva"] if last else 0,
+    }
+    yield '], ' + json.dumps(totals, default=_json_default)[1:] + '\n'
+
+
+# Body of the batch read
+ids_model = clients_ns.model('Ids', IDS_FIELDS)
+
 
 @clients_ns.route('/')
 class ClientList(Resource):
@@ -35,44 +100,60 @@ class ClientList(Resource):
     Supports retrieving all clients (GET) and creating new clients (POST).
     """
 
-    @clients_ns.doc('get_all_clients')
+    @cached('client')
+    @clients_ns.doc('get_all_clients', params={
+        'updated_since': 'Only return clients changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the clients with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @clients_ns.marshal_list_with(client_model)
+    @handle_errors("An error occurred while retrieving the clients.")
     def get(self):
         """
         Retrieve all clients.
         :return: List of all clients
         """
-        try:
-            # Fetch all clients from the service layer
-            return get_all_clients()
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while retrieving clients: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving clients: {e}")
-            clients_ns.abort(500, "An error occurred while retrieving the clients.")
-
-    @clients_ns.doc('create_client')
+        # Fetch all clients from the service layer
+        ids = parse_ids()
+        clients = get_all_clients(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
+            return clients
+        return clients, 200, missing_ids_header(clients, ids, 'client_id')
+
+    @clients_ns.doc('create_client', params=IDEMPOTENCY_KEY_PARAM)
+    @clients_ns.response(422, 'Idempotency-Key already used for a different request')
     @clients_ns.expect(client_model, validate=True)
+    @idempotent
     @clients_ns.marshal_with(client_model, code=201)
+    @handle_errors("An error occurred while creating the client.")
     def post(self):
         """
         Create a new client.
         :return: The created client with HTTP status code 201
         """
         data = clients_ns.payload  # Extract JSON payload
-        try:
-            # Call the service to create a new client
-            return create_client(data["name"],data["email"],data["phone"],data["address"]), 201
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while creating client: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error creating client: {e}")
-            clients_ns.abort(500, "An error occurred while creating the client.")
+        # Call the service to create a new client
+        return create_client(data["name"],data["email"],data["phone"],data["address"]), 201
+
+
+@clients_ns.route('/batch')
+class ClientBatch(Resource):
+    """
+    Resource for reading many clients by ID in one request, for ID lists too long for a query string.
+    """
+    @clients_ns.doc('get_clients_by_ids')
+    @clients_ns.expect(ids_model, validate=True)
+    @clients_ns.marshal_list_with(client_model)
+    @clients_ns.response(400, 'Invalid IDs')
+    @handle_errors("An error occurred while retrieving the clients.")
+    def post(self):
+        """
+        Retrieve the clients with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the clients found
+        """
+        ids = parse_ids(clients_ns.payload['ids'])
+        clients = get_all_clients(ids=ids)
+        return clients, 200, missing_ids_header(clients, ids, 'client_id')
 
 
 @clients_ns.route('/<int:client_id>')
@@ -83,32 +164,28 @@ class Client(Resource):
     Supports retrieving (GET), updating (PUT), and deleting (DELETE) a client.
     """
 
+    @cached('client')
     @clients_ns.doc('get_client')
     @clients_ns.marshal_with(client_model)
+    @handle_errors("An error occurred while retrieving the client.")
     def get(self, client_id):
         """
         Retrieve a client by ID.
         :param client_id: The ID of the client
         :return: The client details or 404 if not found
         """
-        try:
-            # Fetch client by ID
-            client = get_client(client_id)
-            if not client:
-                # Return a 404 error if client does not exist
-                clients_ns.abort(404, f"Client with ID {client_id} not found.")
-            return client
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while retrieving client with ID {client_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving client with ID {client_id}: {e}")
-            clients_ns.abort(500, "An error occurred while retrieving the client.")
+        # Fetch client by ID
+        client = get_client(client_id)
+        if not client:
+            # Return a 404 error if client does not exist
+            clients_ns.abort(404, f"Client with ID {client_id} not found.")
+        return client, 200, etag_header(client)
 
     @clients_ns.doc('update_client')
+    @clients_ns.response(412, 'The If-Match version is outdated')
     @clients_ns.expect(client_model, validate=True)
     @clients_ns.marshal_with(client_model)
+    @handle_errors("An error occurred while updating the client.")
     def put(self, client_id):
         """
         Update a client by ID.
@@ -116,40 +193,86 @@ class Client(Resource):
         :return: The updated client details or 404 if not found
         """
         data = clients_ns.payload  # Extract JSON payload
+        # Call the service to update the client
+        client = update_client(client_id, data["name"],data["email"],data["phone"],data["address"], version=if_match_version())
+        if not client:
+            # Return a 404 error if client does not exist
+            clients_ns.abort(404, f"Client with ID {client_id} not found.")
+        return client, 200, etag_header(client)
+
+    @clients_ns.doc('patch_client')
+    @clients_ns.response(412, 'The If-Match version is outdated')
+    @clients_ns.expect(client_model)
+    @clients_ns.marshal_with(client_model)
+    @clients_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the client.")
+    def patch(self, client_id):
+        """
+        Partially update a client by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param client_id: The ID of the client
+        :return: The updated client details or 404 if not found
+        """
         try:
-            # Call the service to update the client
-            client = update_client(client_id, data["name"],data["email"],data["phone"],data["address"])
-            if not client:
-                # Return a 404 error if client does not exist
-                clients_ns.abort(404, f"Client with ID {client_id} not found.")
-            return client
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while updating client with ID {client_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error updating client with ID {client_id}: {e}")
-            clients_ns.abort(500, "An error occurred while updating the client.")
+            changes = parse_patch(ClientModel, clients_ns.payload, client_model)
+        except ValueError as e:
+            clients_ns.abort(400, str(e))
+        client = patch_client(client_id, changes, version=if_match_version())
+        if client is None:
+            clients_ns.abort(404, f"Client with ID {client_id} not found.")
+        return client, 200, etag_header(client)
 
     @clients_ns.doc('delete_client')
+    @clients_ns.response(412, 'The If-Match version is outdated')
     @clients_ns.response(204, 'Client successfully deleted')
+    @handle_errors("An error occurred while deleting the client.")
     def delete(self, client_id):
         """
         Delete a client by ID.
         :param client_id: The ID of the client
         :return: HTTP 204 status code if deleted successfully or 404 if not found
         """
+        # Call the service to delete the client
+        client = delete_client(client_id, version=if_match_version())
+        if not client:
+            # Return a 404 error if client does not exist
+            clients_ns.abort(404, f"Client with ID {client_id} not found.")
+        return '', 204  # Return no content with status code 204
+
+
+@clients_ns.route('/<int:client_id>/statement')
+@clients_ns.param('client_id', 'The ID of the client')
+class ClientStatement(Resource):
+    """
+    Statement of a client: its invoices over a period with running totals.
+    """
+
+    @clients_ns.doc('get_client_statement', params={
+        'from': 'Start of the period (ISO 8601, inclusive; default: first invoice)',
+        'to': 'End of the period (ISO 8601, exclusive; default: no limit)',
+    })
+    @clients_ns.response(200, 'Statement', statement_model)
+    @clients_ns.response(400, 'Invalid period')
+    @clients_ns.response(404, 'Client not found')
+    @handle_errors("An error occurred while retrieving the client statement.")
+    def get(self, client_id):
+        """
+        Retrieve the invoices of a client issued in [from, to), oldest first, with their items.
+        The response is streamed as the rows are read from the database.
+        :param client_id: The ID of the client
+        :return: The statement or 404 if the client does not exist
+        """
         try:
-            # Call the service to delete the client
-            client = delete_client(client_id)
-            if not client:
-                # Return a 404 error if client does not exist
-                clients_ns.abort(404, f"Client with ID {client_id} not found.")
-            return '', 204  # Return no content with status code 204
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while deleting client with ID {client_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error deleting client with ID {client_id}: {e}")
-            clients_ns.abort(500, "An error occurred while deleting the client.")
\ No newline at end of file
+            start = parse_datetime(request.args.get('from'))
+            end = parse_datetime(request.args.get('to'))
+        except ValueError:
+            clients_ns.abort(400, "from and to must be ISO 8601 dates or date-times.")
+        start = start.replace(tzinfo=None) if start else None
+        end = end.replace(tzinfo=None) if end else None
+        if start and end and start >= end:
+            clients_ns.abort(400, "from must be before to.")
+        if not get_client(client_id):
+            clients_ns.abort(404, f"Client with ID {client_id} not found.")
+        # The generator runs after the view returns: keep the request (and its session) open until it ends
+        return Response(stream_with_context(generate_statement(client_id, start, end)),
+                        mimetype='application/json')
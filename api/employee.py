@@ -1,25 +1,41 @@
 import logging
-from flask_restx import Namespace, Resource, abort
-from models.employee import Employee
-from services.employee_service import get_all_employees, get_employee, create_employee, update_employee, delete_employee
-from utils.utils import generate_swagger_model
-from werkzeug.exceptions import HTTPException, BadRequest, NotFound
-
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+from flask import request
+from flask_restx import Resource, fields
+from models.employee import Employee as EmployeeModel
+from services.employee_service import get_all_employees, get_employee, create_employee, update_employee, patch_employee, delete_employee, get_available_employees, get_employee_workloads, EmployeeHasTasks
+from utils.utils import ApiNamespace, generate_swagger_model, parse_datetime, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from utils.response_cache import cached
+from errors.errors import handle_errors
+
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for employees
-employees_ns = Namespace('employee', description='CRUD operations for managing employees')
+employees_ns = ApiNamespace('employee', description='CRUD operations for managing employees')
 
 # Generate the Swagger model for employees
 employee_model = generate_swagger_model(
     api=employees_ns,
-    model=Employee,
+    model=EmployeeModel,
     exclude_fields=[],
     readonly_fields=['employee_id', 'created_at']
 )
 
+# Swagger model for the workload of an employee
+workload_model = employees_ns.model('EmployeeWorkload', {
+    'employee_id': fields.Integer(description='Employee ID'),
+    'name': fields.String(description='Employee name'),
+    'role': fields.String(description='Employee role'),
+    'open_tasks': fields.Integer(description='Pending and in-progress tasks'),
+    'completed_this_week': fields.Integer(description='Tasks completed since Monday'),
+    'avg_task_hours': fields.Float(description='Average duration of the finished tasks, in hours'),
+    'week_start': fields.Date(description='Monday of the current week'),
+})
+
+# Body of the batch read
+ids_model = employees_ns.model('Ids', IDS_FIELDS)
+
 # Routes for managing employees
 @employees_ns.route('/')
 @employees_ns.response(500, 'Internal Server Error')
@@ -27,117 +43,210 @@ class EmployeeList(Resource):
     """
     Resource for operations on the collection of employees (GET all, POST new).
     """
-    @employees_ns.doc('get_all_employees')
+    @cached('employee')
+    @employees_ns.doc('get_all_employees', params={
+        'updated_since': 'Only return employees changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the employees with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @employees_ns.marshal_list_with(employee_model)
+    @handle_errors("Internal Server Error")
     def get(self):
         """
         Retrieve all employees.
         :return: List of all employees in dictionary format
         """
-        try:
-            employees = get_all_employees()
+        ids = parse_ids()
+        employees = get_all_employees(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
             return employees
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate as they are
-            raise http_err
-        except Exception as e:
-            # Log and handle unexpected exceptions with a 500 status code
-            logger.error(f"Error fetching all employees: {e}")
-            employees_ns.abort(500, "Internal Server Error")
-
-    @employees_ns.doc('create_employee')
+        return employees, 200, missing_ids_header(employees, ids, 'employee_id')
+
+    @employees_ns.doc('create_employee', params=IDEMPOTENCY_KEY_PARAM)
+    @employees_ns.response(422, 'Idempotency-Key already used for a different request')
     @employees_ns.expect(employee_model)
+    @idempotent
     @employees_ns.marshal_with(employee_model, code=201)
     @employees_ns.response(400, 'Bad Request')
+    @handle_errors("Bad Request", code=400)
     def post(self):
         """
         Create a new employee.
         :return: Dictionary of the created employee with HTTP 201 status code
         """
+        data = employees_ns.payload
+        employee = create_employee(data['name'], data['email'], data['phone'], data['role'], data['hired_date'])
+        return employee, 201
+
+
+@employees_ns.route('/availability')
+class EmployeeAvailability(Resource):
+    """
+    Resource listing the employees free during a time window.
+    """
+    @cached('employee', 'task')
+    @employees_ns.doc('get_available_employees', params={
+        'from': 'Start of the window (ISO 8601, e.g. 2025-01-07T14:00)',
+        'to': 'End of the window (ISO 8601)',
+        'role': 'Only return employees with this role (e.g. mechanic)',
+    })
+    @employees_ns.marshal_list_with(employee_model)
+    @employees_ns.response(400, 'Invalid time window')
+    @handle_errors("Internal Server Error")
+    def get(self):
+        """
+        Retrieve the employees without any task overlapping [from, to).
+        Tasks without an end date occupy the rest of their start day; cancelled tasks are ignored.
+        :return: List of available employees
+        """
         try:
-            data = employees_ns.payload
-            employee = create_employee(data['name'], data['email'], data['phone'], data['role'], data['hired_date'])
-            return employee, 201
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate as they are
-            raise http_err
-        except Exception as e:
-            # Log and handle unexpected exceptions with a 400 status code
-            logger.error(f"Error creating employee: {e}")
-            employees_ns.abort(400, "Bad Request")
+            start = parse_datetime(request.args['from']).replace(tzinfo=None)
+            end = parse_datetime(request.args['to']).replace(tzinfo=None)
+        except (KeyError, ValueError):
+            employees_ns.abort(400, "from and to must be ISO 8601 dates or date-times.")
+        if start >= end:
+            employees_ns.abort(400, "from must be before to.")
+        return get_available_employees(start, end, request.args.get('role'))
+
+
+@employees_ns.route('/workload')
+class EmployeeWorkloadList(Resource):
+    """
+    Resource listing the workload of every employee.
+    """
+    @employees_ns.doc('get_employee_workloads', params={'role': 'Only return employees with this role'})
+    @employees_ns.marshal_list_with(workload_model)
+    @handle_errors("Internal Server Error")
+    def get(self):
+        """
+        Retrieve the workload of all employees (cached for a few seconds).
+        :return: List of workloads
+        """
+        return get_employee_workloads(role=request.args.get('role'))
+
+
+@employees_ns.route('/<int:employee_id>/workload')
+@employees_ns.param('employee_id', 'Employee ID')
+class EmployeeWorkload(Resource):
+    """
+    Resource returning the workload of one employee.
+    """
+    @employees_ns.doc('get_employee_workload')
+    @employees_ns.marshal_with(workload_model)
+    @employees_ns.response(404, 'Employee ID not found')
+    @handle_errors("Internal Server Error")
+    def get(self, employee_id):
+        """
+        Retrieve the workload of an employee (cached for a few seconds).
+        :param employee_id: The ID of the employee
+        :return: Open tasks, tasks completed this week and average task duration
+        """
+        workloads = get_employee_workloads(employee_id=employee_id)
+        if not workloads:
+            employees_ns.abort(404, f"Employee with ID {employee_id} not found.")
+        return workloads[0]
+
+
+@employees_ns.route('/batch')
+class EmployeeBatch(Resource):
+    """
+    Resource for reading many employees by ID in one request, for ID lists too long for a query string.
+    """
+    @employees_ns.doc('get_employees_by_ids')
+    @employees_ns.expect(ids_model, validate=True)
+    @employees_ns.marshal_list_with(employee_model)
+    @employees_ns.response(400, 'Invalid IDs')
+    @handle_errors("Internal Server Error")
+    def post(self):
+        """
+        Retrieve the employees with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the employees found
+        """
+        ids = parse_ids(employees_ns.payload['ids'])
+        employees = get_all_employees(ids=ids)
+        return employees, 200, missing_ids_header(employees, ids, 'employee_id')
 
 
 @employees_ns.route('/<int:employee_id>')
 @employees_ns.response(404, 'Employee ID not found')
+@employees_ns.response(409, 'Employee still has tasks')
 @employees_ns.response(500, 'Internal Server Error')
 @employees_ns.param('employee_id', 'Employee ID')
 class Employee(Resource):
     """
     Resource for operations on a single employee (GET, PUT, DELETE).
     """
-    @employees_ns.route('/<int:employee_id>')
-    class EmployeeResource(Resource):
-        @employees_ns.doc('get_employee')
-        @employees_ns.marshal_with(employee_model)
-        def get(self, employee_id):
-            """
-            Retrieve a specific employee by ID.
-            """
-            try:
-                # Fetch the employee by ID
-                employee = get_employee(employee_id)
-                if not employee:
-                    # Abort with a 404 status and custom message
-                    raise NotFound('My custom message')
-                return employee
-            # except HTTPException as http_err:
-            #     # Allow HTTP exceptions to propagate as they are
-            #     raise http_err
-            except Exception as e:
-                # Log and handle unexpected exceptions with a 500 status code
-                logger.error(f"Error fetching employee {employee_id}: {e}")
-                abort(500, description="Internal Server Error")
+    @cached('employee')
+    @employees_ns.doc('get_employee')
+    @employees_ns.marshal_with(employee_model)
+    @handle_errors("Internal Server Error")
+    def get(self, employee_id):
+        """
+        Retrieve a specific employee by ID.
+        :param employee_id: The ID of the employee
+        :return: Dictionary of the employee or a 404 error if not found
+        """
+        # Fetch the employee by ID
+        employee = get_employee(employee_id)
+        if not employee:
+            # Abort with a 404 status and custom message
+            employees_ns.abort(404, f"Employee with ID {employee_id} not found.")
+        return employee, 200, etag_header(employee)
 
     @employees_ns.doc('update_employee')
+    @employees_ns.response(412, 'The If-Match version is outdated')
     @employees_ns.expect(employee_model)
     @employees_ns.marshal_with(employee_model)
     @employees_ns.response(400, 'Bad Request')
+    @handle_errors("Bad Request", code=400)
     def put(self, employee_id):
         """
         Update an employee.
         :param employee_id: The ID of the employee
         :return: Dictionary of the updated employee or a 404 error if not found
         """
+        data = employees_ns.payload
+        updated_employee = update_employee(employee_id, data['name'], data['email'], data['phone'], data['role'], data['hired_date'], version=if_match_version())
+        if not updated_employee:
+            employees_ns.abort(404, f"Employee with ID {employee_id} not found.")
+        return updated_employee, 200, etag_header(updated_employee)
+
+    @employees_ns.doc('patch_employee')
+    @employees_ns.response(412, 'The If-Match version is outdated')
+    @employees_ns.expect(employee_model)
+    @employees_ns.marshal_with(employee_model)
+    @employees_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the employee.")
+    def patch(self, employee_id):
+        """
+        Partially update a employee by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param employee_id: The ID of the employee
+        :return: The updated employee details or 404 if not found
+        """
         try:
-            data = employees_ns.payload
-            updated_employee = update_employee(employee_id, data['name'], data['email'], data['phone'], data['role'], data['hired_date'])
-            if not updated_employee:
-                employees_ns.abort(404, f"Employee with ID {employee_id} not found.")
-            return updated_employee
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate as they are
-            raise http_err
-        except Exception as e:
-            # Log and handle unexpected exceptions with a 400 status code
-            logger.error(f"Error updating employee {employee_id}: {e}")
-            employees_ns.abort(400, "Bad Request")
+            changes = parse_patch(EmployeeModel, employees_ns.payload, employee_model)
+        except ValueError as e:
+            employees_ns.abort(400, str(e))
+        employee = patch_employee(employee_id, changes, version=if_match_version())
+        if employee is None:
+            employees_ns.abort(404, f"Employee with ID {employee_id} not found.")
+        return employee, 200, etag_header(employee)
 
     @employees_ns.doc('delete_employee')
+    @employees_ns.response(409, 'The employee still has tasks')
+    @employees_ns.response(412, 'The If-Match version is outdated')
+    @handle_errors("Internal Server Error")
     def delete(self, employee_id):
         """
         Delete an employee by ID.
         :param employee_id: The ID of the employee
-        :return: Empty response body with HTTP 204 status code or a 404 error if not found
+        :return: Empty response body with HTTP 204 status code, a 404 error if not found or a 409 error if it still has tasks
         """
         try:
-            deleted = delete_employee(employee_id)
-            if not deleted:
-                employees_ns.abort(404, f"Employee with ID {employee_id} not found.")
-            return '', 204
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate as they are
-            raise http_err
-        except Exception as e:
-            # Log and handle unexpected exceptions with a 500 status code
-            logger.error(f"Error deleting employee {employee_id}: {e}")
-            employees_ns.abort(500, "Internal Server Error")
\ No newline at end of file
+            deleted = delete_employee(employee_id, version=if_match_version())
+        except EmployeeHasTasks as e:
+            employees_ns.abort(409, str(e))
+        if not deleted:
+            employees_ns.abort(404, f"Employee with ID {employee_id} not found.")
+        return '', 204
\ No newline at end of file
@@ -0,0 +1,104 @@
+import json
+import logging
+import queue
+from flask import Response, current_app, request, stream_with_context
+from flask_restx import Resource
+from utils.utils import ApiNamespace
+from utils.database import db
+from utils.events import BATCH_SIZE, broker, fetch_changes
+
+
+# Module logger (logging itself is configured once by create_app)
+logger = logging.getLogger(__name__)
+
+# Namespace for the server-sent events stream
+events_ns = ApiNamespace('events', description='Server-sent events for work and task changes')
+
+
+def format_event(event):
+    """
+    Format an event dictionary as a server-sent event message.
+    :param event: Event dictionary (see utils.events.serialize_change).
+    :return: str: SSE message with id, event name and JSON data.
+    """
+    return f"id: {event['seq']}\nevent: {event['entity']}.{event['op']}\ndata: {json.dumps(event)}\n\n"
+
+
+def event_stream(last_event_id, entities):
+    """
+    Generate the SSE messages of one client connection.
+    Missed events after last_event_id are replayed from the change log, then
+    new events are streamed as the broker publishes them.
+    :param last_event_id: Last event id received by the client, or None.
+    :param entities: Entities the client is interested in.
+    """
+    heartbeat = current_app.config['EVENTS_HEARTBEAT']
+    # Subscribe before reading the backlog so no event is lost in between
+    subscriber, last_seq = broker.subscribe()
+    try:
+        # Tell the client how long to wait before reconnecting
+        yield f"retry: {int(current_app.config['EVENTS_RETRY_MS'])}\n\n"
+        if last_event_id is not None:
+            last_seq = last_event_id
+            while True:
+                backlog = fetch_changes(last_seq, entities)
+                for event in backlog:
+                    last_seq = event['seq']
+                    yield format_event(event)
+                if len(backlog) < BATCH_SIZE:
+                    break
+        # Release the database connection while the stream is idle
+        db.session.remove()
+
+        while True:
+            try:
+                event = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                # Comment line keeping proxies from closing the idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if event['seq'] <= last_seq or event['entity'] not in entities:
+                continue
+            last_seq = event['seq']
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+@events_ns.route('')
+class EventStream(Resource):
+    """
+    Streams create/update/delete events of works and tasks (text/event-stream).
+    """
+
+    @events_ns.doc('stream_events', params={
+        'entity': 'Entity to subscribe to (work or task); repeat for several. Defaults to all.',
+        'last_event_id': 'Resume after this event id (alternative to the Last-Event-ID header).',
+    })
+    @events_ns.produces(['text/event-stream'])
+    def get(self):
+        """
+        Open a server-sent events stream.
+        Reconnecting clients send the Last-Event-ID header to receive the events they missed.
+        :return: Streaming response with one SSE message per change
+        """
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if last_event_id is not None:
+            if not last_event_id.isdigit():
+                events_ns.abort(400, "Last-Event-ID must be a non-negative integer.")
+            last_event_id = int(last_event_id)
+
+        allowed = current_app.config['EVENTS_ENTITIES']
+        entities = request.args.getlist('entity') or allowed
+        unknown = [entity for entity in entities if entity not in allowed]
+        if unknown:
+            events_ns.abort(400, f"Unknown entity: {', '.join(unknown)}. Expected one of: {', '.join(allowed)}.")
+
+        return Response(
+            stream_with_context(event_stream(last_event_id, entities)),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no',  # Disable response buffering in nginx
+            },
+        )
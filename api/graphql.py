@@ -0,0 +1,87 @@
+import json
+import logging
+from flask import current_app, request
+from flask_restx import Resource, fields
+from utils.utils import ApiNamespace
+from graphql import GraphQLError
+from errors.errors import handle_errors
+from services.graphql_service import PersistedQueryNotFound, load_document, run_query
+
+
+# Module logger (logging itself is configured once by create_app)
+logger = logging.getLogger(__name__)
+
+# Namespace for the GraphQL endpoint (registered only when GRAPHQL_ENABLED is set)
+graphql_ns = ApiNamespace('graphql', description='Read-only GraphQL queries over the garage data')
+
+graphql_request_model = graphql_ns.model('GraphQLRequest', {
+    'query': fields.String(description='GraphQL query (may be omitted for a registered persisted query)'),
+    'variables': fields.Raw(description='Values of the query variables'),
+    'operationName': fields.String(description='Operation to run, if the query holds several'),
+    'extensions': fields.Raw(description='{"persistedQuery": {"version": 1, "sha256Hash": "<SHA-256 of the query>"}}'),
+})
+
+# Error returned for an unknown persisted query hash (Apollo automatic persisted queries protocol)
+PERSISTED_QUERY_NOT_FOUND = {"errors": [{"message": "PersistedQueryNotFound",
+                                         "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]}
+
+
+def graphql_response(query, variables, operation_name, extensions):
+    """
+    Run a GraphQL request and build its response.
+    :return: tuple: (GraphQL response, HTTP status code)
+    """
+    persisted = (extensions or {}).get('persistedQuery') or {}
+    try:
+        document = load_document(query, persisted.get('sha256Hash'))
+    except PersistedQueryNotFound:
+        return PERSISTED_QUERY_NOT_FOUND, 200
+    except GraphQLError as e:
+        return {"errors": [e.formatted]}, 400
+    result = run_query(
+        document, variables, operation_name,
+        max_depth=current_app.config['GRAPHQL_MAX_DEPTH'],
+        max_cost=current_app.config['GRAPHQL_MAX_COST'],
+        list_size_ttl=current_app.config['GRAPHQL_LIST_SIZE_TTL'],
+    )
+    return result, 200 if 'data' in result else 400
+
+
+@graphql_ns.route('')
+class GraphQL(Resource):
+    """
+    GraphQL endpoint. Relations are loaded with one query per level; queries
+    are limited in depth (GRAPHQL_MAX_DEPTH) and estimated cost (GRAPHQL_MAX_COST).
+    """
+
+    @graphql_ns.doc('graphql_get', params={
+        'query': 'GraphQL query',
+        'variables': 'Values of the query variables (JSON)',
+        'operationName': 'Operation to run',
+        'extensions': 'Persisted query extension (JSON)',
+    })
+    @graphql_ns.response(400, 'Invalid query')
+    @handle_errors("An error occurred while running the query.")
+    def get(self):
+        """
+        Run a query sent in the query string (cacheable, e.g. persisted queries by hash).
+        :return: The GraphQL response
+        """
+        try:
+            variables = json.loads(request.args['variables']) if 'variables' in request.args else None
+            extensions = json.loads(request.args['extensions']) if 'extensions' in request.args else None
+        except ValueError:
+            graphql_ns.abort(400, "variables and extensions must be JSON objects.")
+        return graphql_response(request.args.get('query'), variables, request.args.get('operationName'), extensions)
+
+    @graphql_ns.doc('graphql_post')
+    @graphql_ns.expect(graphql_request_model, validate=True)
+    @graphql_ns.response(400, 'Invalid query')
+    @handle_errors("An error occurred while running the query.")
+    def post(self):
+        """
+        Run a query sent in the JSON body.
+        :return: The GraphQL response
+        """
+        data = graphql_ns.payload
+        return graphql_response(data.get('query'), data.get('variables'), data.get('operationName'), data.get('extensions'))
@@ -1,33 +1,38 @@
 import logging
-from flask_restx import Namespace, Resource
-from werkzeug.exceptions import HTTPException
+from flask_restx import Resource
+from errors.errors import handle_errors
 from services.invoice_service import (
     get_all_invoices,
     get_invoice,
     create_invoice,
     update_invoice,
+    patch_invoice,
     delete_invoice
 )
-from utils.utils import generate_swagger_model
-from models.invoice import Invoice
+from utils.utils import ApiNamespace, generate_swagger_model, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from models.invoice import Invoice as InvoiceModel
 
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for managing invoices
-invoices_ns = Namespace('invoice', description='CRUD operations for managing invoices')
+invoices_ns = ApiNamespace('invoice', description='CRUD operations for managing invoices')
 
 # Generate the Swagger model for the invoice resource
 invoice_model = generate_swagger_model(
     api=invoices_ns,
-    model=Invoice,
+    model=InvoiceModel,
     exclude_fields=[],
-    readonly_fields=['invoice_id']
+    readonly_fields=['invoice_id', 'total', 'total_with_iva']  # Totals are computed from the items
 )
 
 
+# Body of the batch read
+ids_model = invoices_ns.model('Ids', IDS_FIELDS)
+
+
 @invoices_ns.route('/')
 class InvoiceList(Resource):
     """
@@ -35,39 +40,61 @@ class InvoiceList(Resource):
     Supports retrieving all invoices (GET) and creating new invoices (POST).
     """
 
-    @invoices_ns.doc('get_all_invoices')
+    @invoices_ns.doc('get_all_invoices', params={
+        'updated_since': 'Only return invoices changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the invoices with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @invoices_ns.marshal_list_with(invoice_model)
+    @handle_errors("An error occurred while retrieving the invoices.")
     def get(self):
         """
         Retrieve all invoices.
         :return: List of all invoices
         """
-        try:
-            return get_all_invoices()
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while retrieving invoices: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error retrieving invoices: {e}")
-            invoices_ns.abort(500, "An error occurred while retrieving the invoices.")
-
-    @invoices_ns.doc('create_invoice')
+        ids = parse_ids()
+        invoices = get_all_invoices(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
+            return invoices
+        return invoices, 200, missing_ids_header(invoices, ids, 'invoice_id')
+
+    @invoices_ns.doc('create_invoice', params=IDEMPOTENCY_KEY_PARAM)
+    @invoices_ns.response(400, 'Invalid IVA rate')
+    @invoices_ns.response(422, 'Idempotency-Key already used for a different request')
     @invoices_ns.expect(invoice_model, validate=True)
+    @idempotent
     @invoices_ns.marshal_with(invoice_model, code=201)
+    @handle_errors("An error occurred while creating the invoice.")
     def post(self):
         """
-        Create a new invoice.
+        Create a new invoice (without items; iva defaults to the 'iva' setting).
         :return: The created invoice with HTTP status code 201
         """
         data = invoices_ns.payload
         try:
-            return create_invoice(data["client_id"], data["issued_at"], data["iva"], data["total"], data["total_with_iva"]), 201
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while creating invoice: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error creating invoice: {e}")
-            invoices_ns.abort(500, "An error occurred while creating the invoice.")
+            return create_invoice(data["client_id"], data.get("issued_at"), data.get("iva")), 201
+        except ValueError as e:
+            invoices_ns.abort(400, str(e))
+
+
+@invoices_ns.route('/batch')
+class InvoiceBatch(Resource):
+    """
+    Resource for reading many invoices by ID in one request, for ID lists too long for a query string.
+    """
+    @invoices_ns.doc('get_invoices_by_ids')
+    @invoices_ns.expect(ids_model, validate=True)
+    @invoices_ns.marshal_list_with(invoice_model)
+    @invoices_ns.response(400, 'Invalid IDs')
+    @handle_errors("An error occurred while retrieving the invoices.")
+    def post(self):
+        """
+        Retrieve the invoices with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the invoices found
+        """
+        ids = parse_ids(invoices_ns.payload['ids'])
+        invoices = get_all_invoices(ids=ids)
+        return invoices, 200, missing_ids_header(invoices, ids, 'invoice_id')
 
 
 @invoices_ns.route('/<int:invoice_id>')
@@ -80,27 +107,24 @@ class Invoice(Resource):
 
     @invoices_ns.doc('get_invoice')
     @invoices_ns.marshal_with(invoice_model)
+    @handle_errors("An error occurred while retrieving the invoice.")
     def get(self, invoice_id):
         """
         Retrieve an invoice by ID.
         :param invoice_id: The ID of the invoice
         :return: The invoice details or 404 if not found
         """
-        try:
-            invoice = get_invoice(invoice_id)
-            if not invoice:
-                invoices_ns.abort(404, f"Invoice with ID {invoice_id} not found.")
-            return invoice
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while retrieving invoice with ID {invoice_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error retrieving invoice with ID {invoice_id}: {e}")
-            invoices_ns.abort(500, "An error occurred while retrieving the invoice.")
+        invoice = get_invoice(invoice_id)
+        if not invoice:
+            invoices_ns.abort(404, f"Invoice with ID {invoice_id} not found.")
+        return invoice, 200, etag_header(invoice)
 
     @invoices_ns.doc('update_invoice')
+    @invoices_ns.response(400, 'Invalid IVA rate')
+    @invoices_ns.response(412, 'The If-Match version is outdated')
     @invoices_ns.expect(invoice_model, validate=True)
     @invoices_ns.marshal_with(invoice_model)
+    @handle_errors("An error occurred while updating the invoice.")
     def put(self, invoice_id):
         """
         Update an invoice by ID.
@@ -109,33 +133,46 @@ class Invoice(Resource):
         """
         data = invoices_ns.payload
         try:
-            invoice = update_invoice(invoice_id, data["client_id"], data["issued_at"], data["iva"], data["total"], data["total_with_iva"])
-            if not invoice:
-                invoices_ns.abort(404, f"Invoice with ID {invoice_id} not found.")
-            return invoice
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while updating invoice with ID {invoice_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error updating invoice with ID {invoice_id}: {e}")
-            invoices_ns.abort(500, "An error occurred while updating the invoice.")
+            invoice = update_invoice(invoice_id, data.get("client_id"), data.get("issued_at"), data.get("iva"), version=if_match_version())
+        except ValueError as e:
+            invoices_ns.abort(400, str(e))
+        if not invoice:
+            invoices_ns.abort(404, f"Invoice with ID {invoice_id} not found.")
+        return invoice, 200, etag_header(invoice)
+
+    @invoices_ns.doc('patch_invoice')
+    @invoices_ns.response(412, 'The If-Match version is outdated')
+    @invoices_ns.expect(invoice_model)
+    @invoices_ns.marshal_with(invoice_model)
+    @invoices_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the invoice.")
+    def patch(self, invoice_id):
+        """
+        Partially update a invoice by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param invoice_id: The ID of the invoice
+        :return: The updated invoice details or 404 if not found
+        """
+        try:
+            changes = parse_patch(InvoiceModel, invoices_ns.payload, invoice_model)
+        except ValueError as e:
+            invoices_ns.abort(400, str(e))
+        invoice = patch_invoice(invoice_id, changes, version=if_match_version())
+        if invoice is None:
+            invoices_ns.abort(404, f"Invoice with ID {invoice_id} not found.")
+        return invoice, 200, etag_header(invoice)
 
     @invoices_ns.doc('delete_invoice')
+    @invoices_ns.response(412, 'The If-Match version is outdated')
     @invoices_ns.response(204, 'Invoice successfully deleted')
+    @handle_errors("An error occurred while deleting the invoice.")
     def delete(self, invoice_id):
         """
         Delete an invoice by ID.
         :param invoice_id: The ID of the invoice
         :return: HTTP 204 status code if deleted successfully or 404 if not found
         """
-        try:
-            invoice = delete_invoice(invoice_id)
-            if not invoice:
-                invoices_ns.abort(404, f"Invoice with ID {invoice_id} not found.")
-            return '', 204
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while deleting invoice with ID {invoice_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error deleting invoice with ID {invoice_id}: {e}")
-            invoices_ns.abort(500, "An error occurred while deleting the invoice.")
+        invoice = delete_invoice(invoice_id, version=if_match_version())
+        if not invoice:
+            invoices_ns.abort(404, f"Invoice with ID {invoice_id} not found.")
+        return '', 204
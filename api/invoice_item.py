@@ -1,33 +1,38 @@
 import logging
-from flask_restx import Namespace, Resource
-from werkzeug.exceptions import HTTPException
+from flask_restx import Resource
+from errors.errors import handle_errors
 from services.invoice_item_service import (
     get_all_invoice_items,
     get_invoice_item,
     create_invoice_item,
     update_invoice_item,
+    patch_invoice_item,
     delete_invoice_item
 )
-from utils.utils import generate_swagger_model
-from models.invoice_item import InvoiceItem
+from utils.utils import ApiNamespace, generate_swagger_model, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from models.invoice_item import InvoiceItem as InvoiceItemModel
 
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for managing invoice items
-invoice_items_ns = Namespace('invoice_item', description='CRUD operations for managing invoice items')
+invoice_items_ns = ApiNamespace('invoice_item', description='CRUD operations for managing invoice items')
 
 # Generate the Swagger model for the invoice item resource
 invoice_item_model = generate_swagger_model(
     api=invoice_items_ns,
-    model=InvoiceItem,
+    model=InvoiceItemModel,
     exclude_fields=[],
     readonly_fields=['item_id']
 )
 
 
+# Body of the batch read
+ids_model = invoice_items_ns.model('Ids', IDS_FIELDS)
+
+
 @invoice_items_ns.route('/')
 class InvoiceItemList(Resource):
     """
@@ -35,39 +40,57 @@ class InvoiceItemList(Resource):
     Supports retrieving all invoice items (GET) and creating new invoice items (POST).
     """
 
-    @invoice_items_ns.doc('get_all_invoice_items')
+    @invoice_items_ns.doc('get_all_invoice_items', params={
+        'updated_since': 'Only return invoice items changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the invoice items with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @invoice_items_ns.marshal_list_with(invoice_item_model)
+    @handle_errors("An error occurred while retrieving the invoice items.")
     def get(self):
         """
         Retrieve all invoice items.
         :return: List of all invoice items
         """
-        try:
-            return get_all_invoice_items()
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while retrieving invoice items: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error retrieving invoice items: {e}")
-            invoice_items_ns.abort(500, "An error occurred while retrieving the invoice items.")
-
-    @invoice_items_ns.doc('create_invoice_item')
+        ids = parse_ids()
+        items = get_all_invoice_items(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
+            return items
+        return items, 200, missing_ids_header(items, ids, 'item_id')
+
+    @invoice_items_ns.doc('create_invoice_item', params=IDEMPOTENCY_KEY_PARAM)
+    @invoice_items_ns.response(422, 'Idempotency-Key already used for a different request')
     @invoice_items_ns.expect(invoice_item_model, validate=True)
+    @idempotent
     @invoice_items_ns.marshal_with(invoice_item_model, code=201)
+    @handle_errors("An error occurred while creating the invoice item.")
     def post(self):
         """
         Create a new invoice item.
         :return: The created invoice item with HTTP status code 201
         """
         data = invoice_items_ns.payload
-        try:
-            return create_invoice_item(data["description"], data["cost"], data["invoice_id"], data["task_id"]), 201
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while creating invoice item: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error creating invoice item: {e}")
-            invoice_items_ns.abort(500, "An error occurred while creating the invoice item.")
+        return create_invoice_item(data["description"], data["cost"], data["invoice_id"], data["task_id"]), 201
+
+
+@invoice_items_ns.route('/batch')
+class InvoiceItemBatch(Resource):
+    """
+    Resource for reading many invoice items by ID in one request, for ID lists too long for a query string.
+    """
+    @invoice_items_ns.doc('get_invoice_items_by_ids')
+    @invoice_items_ns.expect(ids_model, validate=True)
+    @invoice_items_ns.marshal_list_with(invoice_item_model)
+    @invoice_items_ns.response(400, 'Invalid IDs')
+    @handle_errors("An error occurred while retrieving the invoice items.")
+    def post(self):
+        """
+        Retrieve the invoice items with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the invoice items found
+        """
+        ids = parse_ids(invoice_items_ns.payload['ids'])
+        items = get_all_invoice_items(ids=ids)
+        return items, 200, missing_ids_header(items, ids, 'item_id')
 
 
 @invoice_items_ns.route('/<int:item_id>')
@@ -80,27 +103,23 @@ class InvoiceItem(Resource):
 
     @invoice_items_ns.doc('get_invoice_item')
     @invoice_items_ns.marshal_with(invoice_item_model)
+    @handle_errors("An error occurred while retrieving the invoice item.")
     def get(self, item_id):
         """
         Retrieve an invoice item by ID.
         :param item_id: The ID of the invoice item
         :return: The invoice item details or 404 if not found
         """
-        try:
-            invoice_item = get_invoice_item(item_id)
-            if not invoice_item:
-                invoice_items_ns.abort(404, f"Invoice item with ID {item_id} not found.")
-            return invoice_item
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while retrieving invoice item with ID {item_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error retrieving invoice item with ID {item_id}: {e}")
-            invoice_items_ns.abort(500, "An error occurred while retrieving the invoice item.")
+        invoice_item = get_invoice_item(item_id)
+        if not invoice_item:
+            invoice_items_ns.abort(404, f"Invoice item with ID {item_id} not found.")
+        return invoice_item, 200, etag_header(invoice_item)
 
     @invoice_items_ns.doc('update_invoice_item')
+    @invoice_items_ns.response(412, 'The If-Match version is outdated')
     @invoice_items_ns.expect(invoice_item_model, validate=True)
     @invoice_items_ns.marshal_with(invoice_item_model)
+    @handle_errors("An error occurred while updating the invoice item.")
     def put(self, item_id):
         """
         Update an invoice item by ID.
@@ -108,34 +127,44 @@ class InvoiceItem(Resource):
         :return: The updated invoice item details or 404 if not found
         """
         data = invoice_items_ns.payload
+        invoice_item = update_invoice_item(item_id, data["description"], data["cost"], data["invoice_id"], data["task_id"], version=if_match_version())
+        if not invoice_item:
+            invoice_items_ns.abort(404, f"Invoice item with ID {item_id} not found.")
+        return invoice_item, 200, etag_header(invoice_item)
+
+    @invoice_items_ns.doc('patch_invoice_item')
+    @invoice_items_ns.response(412, 'The If-Match version is outdated')
+    @invoice_items_ns.expect(invoice_item_model)
+    @invoice_items_ns.marshal_with(invoice_item_model)
+    @invoice_items_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the invoice item.")
+    def patch(self, item_id):
+        """
+        Partially update a invoice item by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param item_id: The ID of the invoice item
+        :return: The updated invoice item details or 404 if not found
+        """
         try:
-            invoice_item = update_invoice_item(item_id, data["description"], data["cost"], data["invoice_id"], data["task_id"])
-            if not invoice_item:
-                invoice_items_ns.abort(404, f"Invoice item with ID {item_id} not found.")
-            return invoice_item
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while updating invoice item with ID {item_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error updating invoice item with ID {item_id}: {e}")
-            invoice_items_ns.abort(500, "An error occurred while updating the invoice item.")
+            changes = parse_patch(InvoiceItemModel, invoice_items_ns.payload, invoice_item_model)
+        except ValueError as e:
+            invoice_items_ns.abort(400, str(e))
+        invoice_item = patch_invoice_item(item_id, changes, version=if_match_version())
+        if invoice_item is None:
+            invoice_items_ns.abort(404, f"Invoice item with ID {item_id} not found.")
+        return invoice_item, 200, etag_header(invoice_item)
 
     @invoice_items_ns.doc('delete_invoice_item')
+    @invoice_items_ns.response(412, 'The If-Match version is outdated')
     @invoice_items_ns.response(204, 'Invoice item successfully deleted')
+    @handle_errors("An error occurred while deleting the invoice item.")
     def delete(self, item_id):
         """
         Delete an invoice item by ID.
         :param item_id: The ID of the invoice item
         :return: HTTP 204 status code if deleted successfully or 404 if not found
         """
-        try:
-            invoice_item = delete_invoice_item(item_id)
-            if not invoice_item:
-                invoice_items_ns.abort(404, f"Invoice item with ID {item_id} not found.")
-            return '', 204
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while deleting invoice item with ID {item_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            logger.error(f"Error deleting invoice item with ID {item_id}: {e}")
-            invoice_items_ns.abort(500, "An error occurred while deleting the invoice item.")
+        invoice_item = delete_invoice_item(item_id, version=if_match_version())
+        if not invoice_item:
+            invoice_items_ns.abort(404, f"Invoice item with ID {item_id} not found.")
+        return '', 204
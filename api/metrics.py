@@ -0,0 +1,49 @@
+import logging
+from flask_restx import Resource, fields
+from utils.utils import ApiNamespace
+from utils import single_flight
+from utils.response_cache import cache
+
+
+# Module logger (logging itself is configured once by create_app)
+logger = logging.getLogger(__name__)
+
+# Namespace for the worker metrics
+metrics_ns = ApiNamespace('metrics', description='Counters of the worker serving the request')
+
+single_flight_model = metrics_ns.model('SingleFlightMetrics', {
+    'executed': fields.Integer(description='GET requests that ran their handler and shared the response'),
+    'coalesced': fields.Integer(description='GET requests served with the response of an identical concurrent request'),
+    'fallbacks': fields.Integer(description='GET requests that waited for an identical request but ran their handler'),
+    'in_flight': fields.Integer(description='GET requests currently running their handler'),
+})
+
+response_cache_model = metrics_ns.model('ResponseCacheMetrics', {
+    'hits': fields.Integer(description='GET requests served from the response cache'),
+    'misses': fields.Integer(description='Cacheable GET requests without a cached response'),
+    'stale': fields.Integer(description='Cached responses dropped because one of their tables changed'),
+    'evictions': fields.Integer(description='Cached responses evicted to stay within RESPONSE_CACHE_MAX_BYTES'),
+    'entries': fields.Integer(description='Responses currently cached'),
+    'bytes': fields.Integer(description='Estimated memory used by the cached responses'),
+})
+
+metrics_model = metrics_ns.model('Metrics', {
+    'single_flight': fields.Nested(single_flight_model),
+    'response_cache': fields.Nested(response_cache_model),
+})
+
+
+@metrics_ns.route('')
+class Metrics(Resource):
+    """
+    Counters of the worker process serving the request (each worker has its own).
+    """
+
+    @metrics_ns.doc('get_metrics')
+    @metrics_ns.marshal_with(metrics_model)
+    def get(self):
+        """
+        Retrieve the counters of the worker.
+        :return: The counters, by component
+        """
+        return {"single_flight": single_flight.stats(), "response_cache": cache.stats()}
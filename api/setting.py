@@ -1,33 +1,38 @@
 import logging
-from flask_restx import Namespace, Resource
-from werkzeug.exceptions import HTTPException
+from flask_restx import Resource
+from errors.errors import handle_errors
 from services.setting_service import (
     get_all_settings,
     get_setting,
     create_setting,
     update_setting,
+    patch_setting,
     delete_setting
 )
-from utils.utils import generate_swagger_model
-from models.setting import Setting
+from utils.utils import ApiNamespace, generate_swagger_model, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from models.setting import Setting as SettingModel
 
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for managing settings
-settings_ns = Namespace('setting', description='CRUD operations for managing settings')
+settings_ns = ApiNamespace('setting', description='CRUD operations for managing settings')
 
 # Generate the Swagger model for the setting resource
 setting_model = generate_swagger_model(
     api=settings_ns,        # Namespace to associate with the model
-    model=Setting,          # SQLAlchemy model representing the setting resource
+    model=SettingModel,          # SQLAlchemy model representing the setting resource
     exclude_fields=[],     # No excluded fields in this model
     readonly_fields=['setting_id']  # Fields that cannot be modified
 )
 
 
+# Body of the batch read
+ids_model = settings_ns.model('Ids', IDS_FIELDS)
+
+
 @settings_ns.route('/')
 class SettingList(Resource):
     """
@@ -35,44 +40,59 @@ class SettingList(Resource):
     Supports retrieving all settings (GET) and creating new settings (POST).
     """
 
-    @settings_ns.doc('get_all_settings')
+    @settings_ns.doc('get_all_settings', params={
+        'updated_since': 'Only return settings changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the settings with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @settings_ns.marshal_list_with(setting_model)
+    @handle_errors("An error occurred while retrieving the settings.")
     def get(self):
         """
         Retrieve all settings.
         :return: List of all settings
         """
-        try:
-            # Fetch all settings from the service layer
-            return get_all_settings()
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while retrieving settings: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving settings: {e}")
-            settings_ns.abort(500, "An error occurred while retrieving the settings.")
-
-    @settings_ns.doc('create_setting')
+        # Fetch all settings from the service layer
+        ids = parse_ids()
+        settings = get_all_settings(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
+            return settings
+        return settings, 200, missing_ids_header(settings, ids, 'setting_id')
+
+    @settings_ns.doc('create_setting', params=IDEMPOTENCY_KEY_PARAM)
+    @settings_ns.response(422, 'Idempotency-Key already used for a different request')
     @settings_ns.expect(setting_model, validate=True)
+    @idempotent
     @settings_ns.marshal_with(setting_model, code=201)
+    @handle_errors("An error occurred while creating the setting.")
     def post(self):
         """
         Create a new setting.
         :return: The created setting with HTTP status code 201
         """
         data = settings_ns.payload  # Extract JSON payload
-        try:
-            # Call the service to create a new setting
-            return create_setting(data["key_name"],data["value"]), 201
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while creating setting: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error creating setting: {e}")
-            settings_ns.abort(500, "An error occurred while creating the setting.")
+        # Call the service to create a new setting
+        return create_setting(data["key_name"],data["value"]), 201
+
+
+@settings_ns.route('/batch')
+class SettingBatch(Resource):
+    """
+    Resource for reading many settings by ID in one request, for ID lists too long for a query string.
+    """
+    @settings_ns.doc('get_settings_by_ids')
+    @settings_ns.expect(ids_model, validate=True)
+    @settings_ns.marshal_list_with(setting_model)
+    @settings_ns.response(400, 'Invalid IDs')
+    @handle_errors("An error occurred while retrieving the settings.")
+    def post(self):
+        """
+        Retrieve the settings with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the settings found
+        """
+        ids = parse_ids(settings_ns.payload['ids'])
+        settings = get_all_settings(ids=ids)
+        return settings, 200, missing_ids_header(settings, ids, 'setting_id')
 
 
 @settings_ns.route('/<int:setting_id>')
@@ -85,30 +105,25 @@ class Setting(Resource):
 
     @settings_ns.doc('get_setting')
     @settings_ns.marshal_with(setting_model)
+    @handle_errors("An error occurred while retrieving the setting.")
     def get(self, setting_id):
         """
         Retrieve a setting by ID.
         :param setting_id: The ID of the setting
         :return: The setting details or 404 if not found
         """
-        try:
-            # Fetch setting by ID
-            setting = get_setting(setting_id)
-            if not setting:
-                # Return a 404 error if setting does not exist
-                settings_ns.abort(404, f"setting with ID {setting_id} not found.")
-            return setting
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while retrieving setting with ID {setting_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving setting with ID {setting_id}: {e}")
-            settings_ns.abort(500, "An error occurred while retrieving the setting.")
+        # Fetch setting by ID
+        setting = get_setting(setting_id)
+        if not setting:
+            # Return a 404 error if setting does not exist
+            settings_ns.abort(404, f"setting with ID {setting_id} not found.")
+        return setting, 200, etag_header(setting)
 
     @settings_ns.doc('update_setting')
+    @settings_ns.response(412, 'The If-Match version is outdated')
     @settings_ns.expect(setting_model, validate=True)
     @settings_ns.marshal_with(setting_model)
+    @handle_errors("An error occurred while updating the setting.")
     def put(self, setting_id):
         """
         Update a setting by ID.
@@ -116,40 +131,48 @@ class Setting(Resource):
         :return: The updated setting details or 404 if not found
         """
         data = settings_ns.payload  # Extract JSON payload
+        # Call the service to update the setting
+        setting = update_setting(setting_id, data["key_name"],data["value"], version=if_match_version())
+        if not setting:
+            # Return a 404 error if setting does not exist
+            settings_ns.abort(404, f"setting with ID {setting_id} not found.")
+        return setting, 200, etag_header(setting)
+
+    @settings_ns.doc('patch_setting')
+    @settings_ns.response(412, 'The If-Match version is outdated')
+    @settings_ns.expect(setting_model)
+    @settings_ns.marshal_with(setting_model)
+    @settings_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the setting.")
+    def patch(self, setting_id):
+        """
+        Partially update a setting by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param setting_id: The ID of the setting
+        :return: The updated setting details or 404 if not found
+        """
         try:
-            # Call the service to update the setting
-            setting = update_setting(setting_id, data["key_name"],data["value"])
-            if not setting:
-                # Return a 404 error if setting does not exist
-                settings_ns.abort(404, f"setting with ID {setting_id} not found.")
-            return setting
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while updating setting with ID {setting_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error updating setting with ID {setting_id}: {e}")
-            settings_ns.abort(500, "An error occurred while updating the setting.")
+            changes = parse_patch(SettingModel, settings_ns.payload, setting_model)
+        except ValueError as e:
+            settings_ns.abort(400, str(e))
+        setting = patch_setting(setting_id, changes, version=if_match_version())
+        if setting is None:
+            settings_ns.abort(404, f"setting with ID {setting_id} not found.")
+        return setting, 200, etag_header(setting)
 
     @settings_ns.doc('delete_setting')
+    @settings_ns.response(412, 'The If-Match version is outdated')
     @settings_ns.response(204, 'setting successfully deleted')
+    @handle_errors("An error occurred while deleting the setting.")
     def delete(self, setting_id):
         """
         Delete a setting by ID.
         :param setting_id: The ID of the setting
         :return: HTTP 204 status code if deleted successfully or 404 if not found
         """
-        try:
-            # Call the service to delete the setting
-            setting = delete_setting(setting_id)
-            if not setting:
-                # Return a 404 error if setting does not exist
-                settings_ns.abort(404, f"setting with ID {setting_id} not found.")
-            return '', 204  # Return no content with status code 204
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while deleting setting with ID {setting_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error deleting setting with ID {setting_id}: {e}")
-            settings_ns.abort(500, "An error occurred while deleting the setting.")
\ No newline at end of file
+        # Call the service to delete the setting
+        setting = delete_setting(setting_id, version=if_match_version())
+        if not setting:
+            # Return a 404 error if setting does not exist
+            settings_ns.abort(404, f"setting with ID {setting_id} not found.")
+        return '', 204  # Return no content with status code 204
\ No newline at end of file
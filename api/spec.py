@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import os
+import click
+from flask import Response, current_app, request
+from flask.cli import with_appcontext
+from flask_restx import Api, Resource
+from werkzeug.exceptions import HTTPException
+from errors.errors import http_error_response
+
+# Module logger (logging itself is configured once by create_app)
+logger = logging.getLogger(__name__)
+
+
+def serialize_spec(schema):
+    """
+    Serialize a Swagger specification to compact JSON.
+    :param schema: Specification dictionary (Api.__schema__).
+    :return: bytes: UTF-8 encoded JSON document.
+    """
+    return json.dumps(schema, separators=(',', ':')).encode('utf-8')
+
+
+class SpecView(Resource):
+    """
+    Serves the Swagger specification (swagger.json) from the bytes cached by the Api.
+    Responses carry a strong ETag and long-lived cache headers; clients
+    revalidating with If-None-Match get a 304 without a body.
+    """
+
+    def get(self):
+        body, etag = self.api.spec()
+        if body is None:
+            return {"message": "Unable to render schema"}, 500
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)  # Strong validator: the bytes only change with a new deploy
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['SWAGGER_SPEC_MAX_AGE']
+        return response.make_conditional(request)
+
+
+class GarageApi(Api):
+    """
+    Flask-RESTx Api serving a precomputed Swagger specification.
+    The specification is serialized once per process, or read from the file
+    set in SWAGGER_SPEC_FILE (see `flask export-spec`). When the Swagger UI is
+    disabled (doc=False) its blueprint of templates and static files is not
+    registered either. HTTP errors are returned in the format of the
+    application error handlers ({"message", "status": "error"}).
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._spec = None  # (bytes, etag) once computed; set before Api.__init__ registers the views
+        super().__init__(*args, **kwargs)
+
+    def spec(self):
+        """
+        Return the serialized specification and its ETag, computing them on first use.
+        :return: tuple: (bytes, str), or (None, None) when the schema cannot be rendered.
+        """
+        if self._spec is None:
+            path = current_app.config.get('SWAGGER_SPEC_FILE')
+            if path and os.path.exists(path):
+                # Specification generated at build time
+                with open(path, 'rb') as spec_file:
+                    body = spec_file.read()
+                logger.info("Serving the Swagger specification from %s", path)
+            else:
+                schema = self.__schema__
+                if 'error' in schema:
+                    return None, None  # Not cached, the error is logged by flask-restx
+                body = serialize_spec(schema)
+            self._spec = (body, hashlib.sha256(body).hexdigest())
+        return self._spec
+
+    def handle_error(self, e):
+        # Same body as errors.errors for HTTP errors, from the precomputed bodies when possible
+        if isinstance(e, HTTPException) and e.code is not None:
+            return http_error_response(e)
+        return super().handle_error(e)
+
+    def _register_specs(self, app_or_blueprint):
+        # Same as Api._register_specs, with the cached view
+        if self._add_specs:
+            endpoint = 'specs'
+            self._register_view(
+                app_or_blueprint,
+                SpecView,
+                self.default_namespace,
+                '/' + self.default_swagger_filename,
+                endpoint=endpoint,
+                resource_class_args=(self,),
+            )
+            self.endpoints.add(endpoint)
+
+    def _register_apidoc(self, app):
+        # The apidoc blueprint only serves the Swagger UI
+        if self._doc:
+            super()._register_apidoc(app)
+
+
+@click.command('export-spec')
+@click.argument('path', default='swagger.json')
+@with_appcontext
+def export_spec_command(path):
+    """
+    Write the Swagger specification to PATH (default: swagger.json).
+    Point SWAGGER_SPEC_FILE at the file to serve it without building the spec at runtime.
+    """
+    from api import api  # The Api instance, with all namespaces registered by create_app
+
+    # The specification contains URLs, which need a request context
+    with current_app.test_request_context():
+        schema = api.__schema__
+    if 'error' in schema:
+        raise click.ClickException("Unable to render the Swagger specification (see the log).")
+    with open(path, 'wb') as spec_file:
+        spec_file.write(serialize_spec(schema))
+    click.echo(f"Swagger specification written to {path}")
@@ -1,33 +1,38 @@
 import logging
-from flask_restx import Namespace, Resource
-from werkzeug.exceptions import HTTPException
+from flask_restx import Resource
+from errors.errors import handle_errors
 from services.task_service import (
     get_all_tasks,
     get_task,
     create_task,
     update_task,
+    patch_task,
     delete_task
 )
-from utils.utils import generate_swagger_model
-from models.task import Task
+from utils.utils import ApiNamespace, generate_swagger_model, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from models.task import Task as TaskModel
 
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for managing tasks
-tasks_ns = Namespace('task', description='CRUD operations for managing tasks')
+tasks_ns = ApiNamespace('task', description='CRUD operations for managing tasks')
 
 # Generate the Swagger model for the task resource
 task_model = generate_swagger_model(
     api=tasks_ns,        # Namespace to associate with the model
-    model=Task,          # SQLAlchemy model representing the task resource
+    model=TaskModel,          # SQLAlchemy model representing the task resource
     exclude_fields=[],     # No excluded fields in this model
     readonly_fields=['task_id']  # Fields that cannot be modified
 )
 
 
+# Body of the batch read
+ids_model = tasks_ns.model('Ids', IDS_FIELDS)
+
+
 @tasks_ns.route('/')
 class TaskList(Resource):
     """
@@ -35,44 +40,59 @@ class TaskList(Resource):
     Supports retrieving all tasks (GET) and creating new tasks (POST).
     """
 
-    @tasks_ns.doc('get_all_tasks')
+    @tasks_ns.doc('get_all_tasks', params={
+        'updated_since': 'Only return tasks changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the tasks with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @tasks_ns.marshal_list_with(task_model)
+    @handle_errors("An error occurred while retrieving the tasks.")
     def get(self):
         """
         Retrieve all tasks.
         :return: List of all tasks
         """
-        try:
-            # Fetch all tasks from the service layer
-            return get_all_tasks()
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while retrieving tasks: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving tasks: {e}")
-            tasks_ns.abort(500, "An error occurred while retrieving the tasks.")
-
-    @tasks_ns.doc('create_task')
+        # Fetch all tasks from the service layer
+        ids = parse_ids()
+        tasks = get_all_tasks(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
+            return tasks
+        return tasks, 200, missing_ids_header(tasks, ids, 'task_id')
+
+    @tasks_ns.doc('create_task', params=IDEMPOTENCY_KEY_PARAM)
+    @tasks_ns.response(422, 'Idempotency-Key already used for a different request')
     @tasks_ns.expect(task_model, validate=True)
+    @idempotent
     @tasks_ns.marshal_with(task_model, code=201)
+    @handle_errors("An error occurred while creating the task.")
     def post(self):
         """
         Create a new task.
         :return: The created task with HTTP status code 201
         """
         data = tasks_ns.payload  # Extract JSON payload
-        try:
-            # Call the service to create a new task
-            return create_task(data["description"],data["end_date"],data["start_date"],data["status"]), 201
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while creating task: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error creating task: {e}")
-            tasks_ns.abort(500, "An error occurred while creating the task.")
+        # Call the service to create a new task
+        return create_task(data["description"],data["employee_id"],data.get("end_date"),data["start_date"],data["status"],data["work_id"]), 201
+
+
+@tasks_ns.route('/batch')
+class TaskBatch(Resource):
+    """
+    Resource for reading many tasks by ID in one request, for ID lists too long for a query string.
+    """
+    @tasks_ns.doc('get_tasks_by_ids')
+    @tasks_ns.expect(ids_model, validate=True)
+    @tasks_ns.marshal_list_with(task_model)
+    @tasks_ns.response(400, 'Invalid IDs')
+    @handle_errors("An error occurred while retrieving the tasks.")
+    def post(self):
+        """
+        Retrieve the tasks with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the tasks found
+        """
+        ids = parse_ids(tasks_ns.payload['ids'])
+        tasks = get_all_tasks(ids=ids)
+        return tasks, 200, missing_ids_header(tasks, ids, 'task_id')
 
 
 @tasks_ns.route('/<int:task_id>')
@@ -85,30 +105,25 @@ class Task(Resource):
 
     @tasks_ns.doc('get_task')
     @tasks_ns.marshal_with(task_model)
+    @handle_errors("An error occurred while retrieving the task.")
     def get(self, task_id):
         """
         Retrieve a task by ID.
         :param task_id: The ID of the task
         :return: The task details or 404 if not found
         """
-        try:
-            # Fetch task by ID
-            task = get_task(task_id)
-            if not task:
-                # Return a 404 error if task does not exist
-                tasks_ns.abort(404, f"task with ID {task_id} not found.")
-            return task
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while retrieving task with ID {task_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving task with ID {task_id}: {e}")
-            tasks_ns.abort(500, "An error occurred while retrieving the task.")
+        # Fetch task by ID
+        task = get_task(task_id)
+        if not task:
+            # Return a 404 error if task does not exist
+            tasks_ns.abort(404, f"task with ID {task_id} not found.")
+        return task, 200, etag_header(task)
 
     @tasks_ns.doc('update_task')
+    @tasks_ns.response(412, 'The If-Match version is outdated')
     @tasks_ns.expect(task_model, validate=True)
     @tasks_ns.marshal_with(task_model)
+    @handle_errors("An error occurred while updating the task.")
     def put(self, task_id):
         """
         Update a task by ID.
@@ -116,40 +131,48 @@ class Task(Resource):
         :return: The updated task details or 404 if not found
         """
         data = tasks_ns.payload  # Extract JSON payload
+        # Call the service to update the task
+        task = update_task(task_id, data.get("description"),data.get("employee_id"),data.get("end_date"),data.get("start_date"),data.get("status"),data.get("work_id"), version=if_match_version())
+        if not task:
+            # Return a 404 error if task does not exist
+            tasks_ns.abort(404, f"task with ID {task_id} not found.")
+        return task, 200, etag_header(task)
+
+    @tasks_ns.doc('patch_task')
+    @tasks_ns.response(412, 'The If-Match version is outdated')
+    @tasks_ns.expect(task_model)
+    @tasks_ns.marshal_with(task_model)
+    @tasks_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the task.")
+    def patch(self, task_id):
+        """
+        Partially update a task by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param task_id: The ID of the task
+        :return: The updated task details or 404 if not found
+        """
         try:
-            # Call the service to update the task
-            task = update_task(task_id, data["description"],data["end_date"],data["start_date"],data["status"])
-            if not task:
-                # Return a 404 error if task does not exist
-                tasks_ns.abort(404, f"task with ID {task_id} not found.")
-            return task
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while updating task with ID {task_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error updating task with ID {task_id}: {e}")
-            tasks_ns.abort(500, "An error occurred while updating the task.")
+            changes = parse_patch(TaskModel, tasks_ns.payload, task_model)
+        except ValueError as e:
+            tasks_ns.abort(400, str(e))
+        task = patch_task(task_id, changes, version=if_match_version())
+        if task is None:
+            tasks_ns.abort(404, f"task with ID {task_id} not found.")
+        return task, 200, etag_header(task)
 
     @tasks_ns.doc('delete_task')
+    @tasks_ns.response(412, 'The If-Match version is outdated')
     @tasks_ns.response(204, 'task successfully deleted')
+    @handle_errors("An error occurred while deleting the task.")
     def delete(self, task_id):
         """
         Delete a task by ID.
         :param task_id: The ID of the task
         :return: HTTP 204 status code if deleted successfully or 404 if not found
         """
-        try:
-            # Call the service to delete the task
-            task = delete_task(task_id)
-            if not task:
-                # Return a 404 error if task does not exist
-                tasks_ns.abort(404, f"task with ID {task_id} not found.")
-            return '', 204  # Return no content with status code 204
-        except HTTPException as http_err:
-            logger.error(f"HTTP error while deleting task with ID {task_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error deleting task with ID {task_id}: {e}")
-            tasks_ns.abort(500, "An error occurred while deleting the task.")
\ No newline at end of file
+        # Call the service to delete the task
+        task = delete_task(task_id, version=if_match_version())
+        if not task:
+            # Return a 404 error if task does not exist
+            tasks_ns.abort(404, f"task with ID {task_id} not found.")
+        return '', 204  # Return no content with status code 204
\ No newline at end of file
@@ -1,31 +1,57 @@
 import logging
-from flask_restx import Namespace, Resource
-from werkzeug.exceptions import HTTPException
+from flask_restx import Resource, fields
+from errors.errors import handle_errors
 from services.vehicle_service import (
     get_all_vehicles,
     get_vehicle,
     create_vehicle,
     update_vehicle,
-    delete_vehicle
+    patch_vehicle,
+    delete_vehicle,
+    get_vehicle_history
 )
-from utils.utils import generate_swagger_model
-from models.vehicle import Vehicle
+from utils.utils import ApiNamespace, generate_swagger_model, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from utils.response_cache import cached
+from models.task import Task
+from models.vehicle import Vehicle as VehicleModel
+from models.work import Work
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for managing vehicles
-vehicles_ns = Namespace('vehicle', description='CRUD operations for managing vehicles')
+vehicles_ns = ApiNamespace('vehicle', description='CRUD operations for managing vehicles')
 
 # Generate the Swagger model for the vehicle resource
 vehicle_model = generate_swagger_model(
     api=vehicles_ns,        # Namespace to associate with the model
-    model=Vehicle,          # SQLAlchemy model representing the vehicle resource
+    model=VehicleModel,          # SQLAlchemy model representing the vehicle resource
     exclude_fields=[],     # No excluded fields in this model
-    readonly_fields=['vehicle_id']  # Fields that cannot be modified
+    readonly_fields=['vehicle_id', 'last_work_at', 'open_work_count']  # Fields that cannot be modified
 )
 
+# Swagger models for the service history: works with their tasks
+HISTORY_EXCLUDED_FIELDS = ['version', 'updated_at']  # Not read by the history query
+history_task_model = generate_swagger_model(vehicles_ns, Task, exclude_fields=HISTORY_EXCLUDED_FIELDS, name='HistoryTask')
+history_work_model = vehicles_ns.inherit('HistoryWork', generate_swagger_model(
+    vehicles_ns, Work, exclude_fields=HISTORY_EXCLUDED_FIELDS, name='HistoryWorkBase'), {
+    'tasks': fields.List(fields.Nested(history_task_model), description='Tasks of the work, oldest first'),
+})
+history_model = vehicles_ns.model('VehicleHistory', {
+    'vehicle_id': fields.Integer(description='Vehicle ID'),
+    'license_plate': fields.String(description='License plate'),
+    'brand': fields.String(description='Vehicle brand'),
+    'model': fields.String(description='Vehicle model'),
+    'last_work_at': fields.DateTime(description='Start of the latest work that was not cancelled'),
+    'open_work_count': fields.Integer(description='Pending and in-progress works'),
+    'works': fields.List(fields.Nested(history_work_model), description='Works of the vehicle, oldest first'),
+})
+
+# Body of the batch read
+ids_model = vehicles_ns.model('Ids', IDS_FIELDS)
+
+
 @vehicles_ns.route('/')
 class VehicleList(Resource):
     """
@@ -33,50 +59,66 @@ class VehicleList(Resource):
     Supports retrieving all vehicles (GET) and creating new vehicles (POST).
     """
 
-    @vehicles_ns.doc('get_all_vehicles')
+    @cached('vehicle')
+    @vehicles_ns.doc('get_all_vehicles', params={
+        'updated_since': 'Only return vehicles changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the vehicles with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @vehicles_ns.marshal_list_with(vehicle_model)
+    @handle_errors("An error occurred while retrieving the vehicles.")
     def get(self):
         """
         Retrieve all vehicles.
         :return: List of all vehicles
         """
-        try:
-            # Fetch all vehicles from the service layer
-            return get_all_vehicles()
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while retrieving vehicles: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving vehicles: {e}")
-            vehicles_ns.abort(500, "An error occurred while retrieving the vehicles.")
-
-    @vehicles_ns.doc('create_vehicle')
+        # Fetch all vehicles from the service layer
+        ids = parse_ids()
+        vehicles = get_all_vehicles(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
+            return vehicles
+        return vehicles, 200, missing_ids_header(vehicles, ids, 'vehicle_id')
+
+    @vehicles_ns.doc('create_vehicle', params=IDEMPOTENCY_KEY_PARAM)
+    @vehicles_ns.response(422, 'Idempotency-Key already used for a different request')
     @vehicles_ns.expect(vehicle_model, validate=True)
+    @idempotent
     @vehicles_ns.marshal_with(vehicle_model, code=201)
+    @handle_errors("An error occurred while creating the vehicle.")
     def post(self):
         """
         Create a new vehicle.
         :return: The newly created vehicle
         """
-        try:
-            # Parse the request payload and create a new vehicle
-            payload = vehicles_ns.payload
-            brand = payload.get('brand')
-            client_id = payload.get('client_id')
-            license_plate = payload.get('license_plate')
-            model = payload.get('model')
-            year = payload.get('year')
-            return create_vehicle(brand, client_id, license_plate, model, year), 201
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while creating a vehicle: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error creating a vehicle: {e}")
-            vehicles_ns.abort(500, "An error occurred while creating the vehicle.")
+        # Parse the request payload and create a new vehicle
+        payload = vehicles_ns.payload
+        brand = payload.get('brand')
+        client_id = payload.get('client_id')
+        license_plate = payload.get('license_plate')
+        model = payload.get('model')
+        year = payload.get('year')
+        return create_vehicle(brand, client_id, license_plate, model, year), 201
+
+
+@vehicles_ns.route('/batch')
+class VehicleBatch(Resource):
+    """
+    Resource for reading many vehicles by ID in one request, for ID lists too long for a query string.
+    """
+    @vehicles_ns.doc('get_vehicles_by_ids')
+    @vehicles_ns.expect(ids_model, validate=True)
+    @vehicles_ns.marshal_list_with(vehicle_model)
+    @vehicles_ns.response(400, 'Invalid IDs')
+    @handle_errors("An error occurred while retrieving the vehicles.")
+    def post(self):
+        """
+        Retrieve the vehicles with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the vehicles found
+        """
+        ids = parse_ids(vehicles_ns.payload['ids'])
+        vehicles = get_all_vehicles(ids=ids)
+        return vehicles, 200, missing_ids_header(vehicles, ids, 'vehicle_id')
+
 
 @vehicles_ns.route('/<int:vehicle_id>')
 @vehicles_ns.param('vehicle_id', 'The ID of the vehicle')
@@ -86,72 +128,102 @@ class Vehicle(Resource):
     Supports retrieving (GET), updating (PUT), and deleting (DELETE) a vehicle.
     """
 
+    @cached('vehicle')
     @vehicles_ns.doc('get_vehicle')
     @vehicles_ns.marshal_with(vehicle_model)
+    @handle_errors("An error occurred while retrieving the vehicle.")
     def get(self, vehicle_id):
         """
         Retrieve a vehicle by ID.
         :param vehicle_id: The ID of the vehicle to retrieve.
         :return: The vehicle with the specified ID
         """
-        try:
-            # Fetch the vehicle with the specified ID
-            vehicle = get_vehicle(vehicle_id)
-            if vehicle is None:
-                vehicles_ns.abort(404, f"Vehicle with ID {vehicle_id} not found")
-            return vehicle
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while retrieving vehicle {vehicle_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving vehicle {vehicle_id}: {e}")
-            vehicles_ns.abort(500, "An error occurred while retrieving the vehicle.")
+        # Fetch the vehicle with the specified ID
+        vehicle = get_vehicle(vehicle_id)
+        if vehicle is None:
+            vehicles_ns.abort(404, f"Vehicle with ID {vehicle_id} not found")
+        return vehicle, 200, etag_header(vehicle)
 
     @vehicles_ns.doc('update_vehicle')
+    @vehicles_ns.response(412, 'The If-Match version is outdated')
     @vehicles_ns.expect(vehicle_model, validate=True)
     @vehicles_ns.marshal_with(vehicle_model)
+    @handle_errors("An error occurred while updating the vehicle.")
     def put(self, vehicle_id):
         """
         Update a vehicle by ID.
         :param vehicle_id: The ID of the vehicle to update.
         :return: The updated vehicle
         """
+        # Parse the request payload and update the vehicle
+        payload = vehicles_ns.payload
+        brand = payload.get('brand')
+        client_id = payload.get('client_id')
+        license_plate = payload.get('license_plate')
+        model = payload.get('model')
+        year = payload.get('year')
+        vehicle = update_vehicle(vehicle_id, brand, client_id, license_plate, model, year, version=if_match_version())
+        if vehicle is None:
+            vehicles_ns.abort(404, f"Vehicle with ID {vehicle_id} not found")
+        return vehicle, 200, etag_header(vehicle)
+
+    @vehicles_ns.doc('patch_vehicle')
+    @vehicles_ns.response(412, 'The If-Match version is outdated')
+    @vehicles_ns.expect(vehicle_model)
+    @vehicles_ns.marshal_with(vehicle_model)
+    @vehicles_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the vehicle.")
+    def patch(self, vehicle_id):
+        """
+        Partially update a vehicle by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param vehicle_id: The ID of the vehicle
+        :return: The updated vehicle details or 404 if not found
+        """
         try:
-            # Parse the request payload and update the vehicle
-            payload = vehicles_ns.payload
-            brand = payload.get('brand')
-            client_id = payload.get('client_id')
-            license_plate = payload.get('license_plate')
-            model = payload.get('model')
-            year = payload.get('year')
-            return update_vehicle(vehicle_id, brand, client_id, license_plate, model, year)
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while updating vehicle {vehicle_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error updating vehicle {vehicle_id}: {e}")
-            vehicles_ns.abort(500, "An error occurred while updating the vehicle.")
+            changes = parse_patch(VehicleModel, vehicles_ns.payload, vehicle_model)
+        except ValueError as e:
+            vehicles_ns.abort(400, str(e))
+        vehicle = patch_vehicle(vehicle_id, changes, version=if_match_version())
+        if vehicle is None:
+            vehicles_ns.abort(404, f"Vehicle with ID {vehicle_id} not found")
+        return vehicle, 200, etag_header(vehicle)
+
     @vehicles_ns.doc('delete_vehicle')
+    @vehicles_ns.response(412, 'The If-Match version is outdated')
     @vehicles_ns.response(204, 'Vehicle deleted successfully')
+    @handle_errors("An error occurred while deleting the vehicle.")
     def delete(self, vehicle_id):
         """
         Delete a vehicle by ID.
         :param vehicle_id: The ID of the vehicle to delete.
         :return: 204 No Content
         """
-        try:
-            # Delete the vehicle with the specified ID
-            delete_vehicle(vehicle_id)
-            return '', 204
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while deleting vehicle {vehicle_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error deleting vehicle {vehicle_id}: {e}")
-            vehicles_ns.abort(500, "An error occurred while deleting the vehicle.")
\ No newline at end of file
+        # Delete the vehicle with the specified ID
+        if delete_vehicle(vehicle_id, version=if_match_version()) is None:
+            vehicles_ns.abort(404, f"Vehicle with ID {vehicle_id} not found")
+        return '', 204
+
+
+@vehicles_ns.route('/<int:vehicle_id>/history')
+@vehicles_ns.param('vehicle_id', 'The ID of the vehicle')
+class VehicleHistory(Resource):
+    """
+    Service history of a vehicle.
+    """
+
+    @cached('vehicle', 'work', 'task')
+    @vehicles_ns.doc('get_vehicle_history')
+    @vehicles_ns.marshal_with(history_model)
+    @vehicles_ns.response(404, 'Vehicle not found')
+    @handle_errors("An error occurred while retrieving the vehicle history.")
+    def get(self, vehicle_id):
+        """
+        Retrieve the works of a vehicle with their tasks, in chronological order.
+        :param vehicle_id: The ID of the vehicle.
+        :return: The vehicle summary and its works
+        """
+        history = get_vehicle_history(vehicle_id)
+        if history is None:
+            vehicles_ns.abort(404, f"Vehicle with ID {vehicle_id} not found")
+        return history
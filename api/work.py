@@ -1,31 +1,55 @@
 import logging
-from flask_restx import Namespace, Resource
-from werkzeug.exceptions import HTTPException
+from flask_restx import Resource, fields
+from errors.errors import handle_errors
 from services.work_service import (
     get_all_works,
     get_work,
     create_work,
     update_work,
-    delete_work
+    patch_work,
+    delete_work,
+    create_work_with_tasks
 )
-from utils.utils import generate_swagger_model
-from models.work import Work
+from utils.utils import ApiNamespace, generate_swagger_model, parse_patch, etag_header, if_match_version, parse_updated_since, parse_ids, missing_ids_header, IDS_FIELDS
+from utils.idempotency import IDEMPOTENCY_KEY_PARAM, idempotent
+from models.task import Task
+from models.work import Work as WorkModel
 
-# Initialize logging
-logging.basicConfig(level=logging.INFO)
+# Module logger (logging itself is configured once by create_app)
 logger = logging.getLogger(__name__)
 
 # Namespace for managing works
-works_ns = Namespace('work', description='CRUD operations for managing works')
+works_ns = ApiNamespace('work', description='CRUD operations for managing works')
 
 # Generate the Swagger model for the work resource
 work_model = generate_swagger_model(
     api=works_ns,        # Namespace to associate with the model
-    model=Work,          # SQLAlchemy model representing the work resource
+    model=WorkModel,          # SQLAlchemy model representing the work resource
     exclude_fields=[],   # No excluded fields in this model
     readonly_fields=['work_id']  # Fields that cannot be modified
 )
 
+# Tasks of a job card: the work ID is assigned by the server
+work_task_model = generate_swagger_model(
+    api=works_ns,
+    model=Task,
+    readonly_fields=['task_id', 'created_at', 'work_id'],
+    name='WorkTask'  # Distinct from the Task model of the task namespace
+)
+
+# A work together with its tasks (POST /work/with-tasks)
+work_with_tasks_model = works_ns.inherit('WorkWithTasks', work_model, {
+    'tasks': fields.List(fields.Nested(work_task_model), required=True, description='Tasks of the work'),
+})
+
+# Fields that must be present in the payload of a job card
+WORK_REQUIRED_FIELDS = ['cost', 'description', 'status', 'vehicle_id']
+TASK_REQUIRED_FIELDS = ['description', 'employee_id', 'start_date', 'status']
+
+# Body of the batch read
+ids_model = works_ns.model('Ids', IDS_FIELDS)
+
+
 @works_ns.route('/')
 class WorkList(Resource):
     """
@@ -33,47 +57,94 @@ class WorkList(Resource):
     Supports retrieving all works (GET) and creating new works (POST).
     """
 
-    @works_ns.doc('get_all_works')
+    @works_ns.doc('get_all_works', params={
+        'updated_since': 'Only return works changed at or after this date-time (ISO 8601, inclusive)',
+        'ids': 'Only return the works with these IDs (comma-separated), in this order; IDs not found are listed in the X-Missing-Ids header',
+    })
     @works_ns.marshal_list_with(work_model)
+    @handle_errors("An error occurred while retrieving the works.")
     def get(self):
         """
         Retrieve all works.
         :return: List of all works
         """
-        try:
-            # Fetch all works from the service layer
-            return get_all_works()
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while retrieving works: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving works: {e}")
-            works_ns.abort(500, "An error occurred while retrieving the works.")
-
-    @works_ns.doc('create_work')
+        # Fetch all works from the service layer
+        ids = parse_ids()
+        works = get_all_works(updated_since=parse_updated_since(), ids=ids)
+        if ids is None:
+            return works
+        return works, 200, missing_ids_header(works, ids, 'work_id')
+
+    @works_ns.doc('create_work', params=IDEMPOTENCY_KEY_PARAM)
+    @works_ns.response(422, 'Idempotency-Key already used for a different request')
     @works_ns.expect(work_model, validate=True)
+    @idempotent
     @works_ns.marshal_with(work_model, code=201)
+    @handle_errors("An error occurred while creating the work.")
     def post(self):
         """
         Create a new work.
         :return: The created work
         """
-        try:
-            # Parse the input data
-            data = works_ns.payload
-            # Create a new work using the service layer
-            new_work = create_work(data)
-            return new_work, 201
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while creating work: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error creating work: {e}")
-            works_ns.abort(500, "An error occurred while creating the work.")
+        # Parse the input data
+        data = works_ns.payload
+        # Create a new work using the service layer
+        new_work = create_work(
+            cost=data['cost'],
+            description=data['description'],
+            status=data['status'],
+            vehicle_id=data['vehicle_id'],
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date')
+        )
+        return new_work, 201
+
+@works_ns.route('/with-tasks')
+class WorkWithTasks(Resource):
+    """
+    Creates a work and its tasks (a job card) in a single request and transaction.
+    """
+
+    @works_ns.doc('create_work_with_tasks', params=IDEMPOTENCY_KEY_PARAM)
+    @works_ns.response(422, 'Idempotency-Key already used for a different request')
+    @works_ns.expect(work_with_tasks_model, validate=True)
+    @idempotent
+    @works_ns.marshal_with(work_with_tasks_model, code=201)
+    @handle_errors("An error occurred while creating the work and its tasks.")
+    def post(self):
+        """
+        Create a work and its tasks.
+        :return: The created work with its tasks
+        """
+        data = works_ns.payload
+        missing = [field for field in WORK_REQUIRED_FIELDS if data.get(field) is None]
+        for index, task in enumerate(data['tasks']):
+            missing += [f"tasks[{index}].{field}" for field in TASK_REQUIRED_FIELDS if task.get(field) is None]
+        if missing:
+            works_ns.abort(400, f"Missing required fields: {', '.join(missing)}.")
+        return create_work_with_tasks(data, data['tasks']), 201
+
+
+@works_ns.route('/batch')
+class WorkBatch(Resource):
+    """
+    Resource for reading many works by ID in one request, for ID lists too long for a query string.
+    """
+    @works_ns.doc('get_works_by_ids')
+    @works_ns.expect(ids_model, validate=True)
+    @works_ns.marshal_list_with(work_model)
+    @works_ns.response(400, 'Invalid IDs')
+    @handle_errors("An error occurred while retrieving the works.")
+    def post(self):
+        """
+        Retrieve the works with the given IDs, in the order of the IDs (one IN query).
+        IDs not found are listed in the X-Missing-Ids header.
+        :return: List of the works found
+        """
+        ids = parse_ids(works_ns.payload['ids'])
+        works = get_all_works(ids=ids)
+        return works, 200, missing_ids_header(works, ids, 'work_id')
+
 
 @works_ns.route('/<int:work_id>')
 @works_ns.param('work_id', 'The ID of the work')
@@ -85,76 +156,81 @@ class Work(Resource):
 
     @works_ns.doc('get_work')
     @works_ns.marshal_with(work_model)
+    @handle_errors("An error occurred while retrieving the work.")
     def get(self, work_id):
         """
         Retrieve a work by ID.
         :param work_id: The ID of the work to retrieve.
         :return: The work with the specified ID
         """
-        try:
-            # Fetch the work by ID from the service layer
-            work = get_work(work_id)
-            if not work:
-                # Return a 404 status code if the work is not found
-                works_ns.abort(404, f"Work {work_id} not found.")
-            return work
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while retrieving work {work_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error retrieving work {work_id}: {e}")
-            works_ns.abort(500, "An error occurred while retrieving the work.")
+        # Fetch the work by ID from the service layer
+        work = get_work(work_id)
+        if not work:
+            # Return a 404 status code if the work is not found
+            works_ns.abort(404, f"Work {work_id} not found.")
+        return work, 200, etag_header(work)
 
     @works_ns.doc('update_work')
+    @works_ns.response(412, 'The If-Match version is outdated')
     @works_ns.expect(work_model, validate=True)
     @works_ns.marshal_with(work_model)
+    @handle_errors("An error occurred while updating the work.")
     def put(self, work_id):
         """
         Update a work by ID.
         :param work_id: The ID of the work to update.
         :return: The updated work
         """
+        # Extract the request body
+        data = works_ns.payload
+        # Update the work using the service layer
+        work = update_work(
+            work_id=work_id,
+            cost=data['cost'],
+            description=data['description'],
+            status=data['status'],
+            vehicle_id=data['vehicle_id'],
+            start_date=data.get('start_date'),
+            end_date=data.get('end_date'),
+            version=if_match_version(),
+        )
+        if work is None:
+            works_ns.abort(404, f"Work {work_id} not found.")
+        return work, 200, etag_header(work)
+
+    @works_ns.doc('patch_work')
+    @works_ns.response(412, 'The If-Match version is outdated')
+    @works_ns.expect(work_model)
+    @works_ns.marshal_with(work_model)
+    @works_ns.response(400, 'Invalid or read-only field')
+    @handle_errors("An error occurred while updating the work.")
+    def patch(self, work_id):
+        """
+        Partially update a work by ID.
+        Only the fields present in the body are changed; an explicit null or 0 is written.
+        :param work_id: The ID of the work
+        :return: The updated work details or 404 if not found
+        """
         try:
-            # Extract the request body
-            data = works_ns.payload
-            # Update the work using the service layer
-            return update_work(
-                work_id=work_id,
-                cost=data['cost'],
-                description=data['description'],
-                status=data['status'],
-                vehicle_id=data['vehicle_id'],
-                start_date=data.get('start_date'),
-                end_date=data.get('end_date')
-            )
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while updating work {work_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error updating work {work_id}: {e}")
-            works_ns.abort(500, "An error occurred while updating the work.")
+            changes = parse_patch(WorkModel, works_ns.payload, work_model)
+        except ValueError as e:
+            works_ns.abort(400, str(e))
+        work = patch_work(work_id, changes, version=if_match_version())
+        if work is None:
+            works_ns.abort(404, f"Work {work_id} not found.")
+        return work, 200, etag_header(work)
 
     @works_ns.doc('delete_work')
+    @works_ns.response(412, 'The If-Match version is outdated')
     @works_ns.response(204, 'Work successfully deleted')
+    @handle_errors("An error occurred while deleting the work.")
     def delete(self, work_id):
         """
         Delete a work by ID.
         :param work_id: The ID of the work to delete.
         :return: HTTP 204 status code if deleted successfully
         """
-        try:
-            # Delete the work using the service layer
-            delete_work(work_id)
-            return '', 204
-        except HTTPException as http_err:
-            # Allow HTTP exceptions to propagate their status codes and messages
-            logger.error(f"HTTP error while deleting work {work_id}: {http_err}")
-            raise http_err
-        except Exception as e:
-            # Log error and return a 500 status code
-            logger.error(f"Error deleting work {work_id}: {e}")
-            works_ns.abort(500, "An error occurred while deleting the work.")
\ No newline at end of file
+        # Delete the work using the service layer
+        if delete_work(work_id, version=if_match_version()) is None:
+            works_ns.abort(404, f"Work {work_id} not found.")
+        return '', 204
\ No newline at end of file
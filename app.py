@@ -1,11 +1,15 @@
 from flask import Flask
-from sqlalchemy import false
 
-from api import api_bp  # Import the API blueprint
+from api import api_bp, register_namespaces  # Import the API blueprint
+from api.spec import export_spec_command  # Import the `flask export-spec` command
 from config import Config  # Import the configuration class
-from utils.database import db  # Import the SQLAlchemy database instance
-from utils.utils import configure_logging  # Import the logging configuration function
+from utils.database import db, init_unit_of_work  # Import the SQLAlchemy database instance
+from utils.log import configure_logging, init_request_logging  # Import the logging configuration functions
 from errors.errors import register_error_handlers
+from utils.events import broker  # Import the change event broker
+from utils.migrations import migrate_command  # Import the `flask migrate` command
+from utils.response_cache import init_response_cache  # Import the GET response cache setup
+from utils.table_versions import table_versions  # Import the shared table version counters
 
 
 def create_app():
@@ -18,9 +22,27 @@ def create_app():
     try:
         app = Flask(__name__)
         app.config.from_object(Config)  # Load configuration from the Config class
+        configure_logging(  # Configure logging once
+            level=app.config['LOG_LEVEL'],
+            log_file=app.config['LOG_FILE'],
+            log_format=app.config['LOG_FORMAT'],
+            rate_limit_burst=app.config['LOG_RATE_LIMIT_BURST'],
+            rate_limit_interval=app.config['LOG_RATE_LIMIT_INTERVAL'],
+            queue_size=app.config['LOG_QUEUE_SIZE'],
+            sample_rate=app.config['LOG_INFO_SAMPLE_RATE'],
+            sample_high_water=app.config['LOG_SAMPLE_HIGH_WATER'],
+        )
+        init_request_logging(app)  # Request ids and per-request timing
         register_error_handlers(app)  # Register error handlers for 404 and 500 errors
         db.init_app(app) # Initialize extensions (e.g., SQLAlchemy)
+        init_unit_of_work(app)  # Commit once per request when UNIT_OF_WORK is enabled
+        broker.init_app(app)  # Fan out change events to /api/events streams
+        table_versions.init_app(app)  # Map the table version counters shared by the workers
+        init_response_cache(app)  # Size the GET response cache
+        app.cli.add_command(migrate_command)  # Register the migration command
+        app.cli.add_command(export_spec_command)  # Register the Swagger export command
         # Register blueprints (e.g., API routes)
+        register_namespaces()  # Load the API namespaces before the blueprint is registered
         app.register_blueprint(api_bp)
         return app
 
@@ -28,14 +50,14 @@ def create_app():
         # Log the error and re-raise it to ensure it doesn't get silently ignored
         import logging
         logger = logging.getLogger(__name__)
-        logger.error(f"Error during app creation: {e}")
+        logger.error("Error during app creation: %s", e)
         raise
 
 
 if __name__ == "__main__":
-    # Create the Flask application instance and run it in debug mode
+    # Create the Flask application instance and run it with the development server.
+    # For production use the WSGI entry point instead: `gunicorn wsgi:app`
     try:
-        #configure_logging()  # Configure the logging system
         app = create_app()
         app.run(debug=False)  # Running in debug mode for development
         #app.run(ERROR_INCLUDE_MESSAGE=False)
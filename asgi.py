@@ -0,0 +1,173 @@
+# ASGI entry point serving the read-only endpoints asynchronously.
+# A single process can keep thousands of slow or idle clients (e.g. polling
+# dashboards) connected, since waiting on the network or the database does not
+# block a worker thread. Writes stay on the Flask application (wsgi.py).
+#
+# Run with: uvicorn asgi:app --port 8001
+import json
+import logging
+from urllib.parse import parse_qs
+
+from config import Config
+from models.client import Client
+from models.employee import Employee
+from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+from models.setting import Setting
+from models.task import Task
+from models.vehicle import Vehicle
+from models.work import Work
+from services.async_read_service import fetch_all, fetch_one
+from utils.async_database import dispose_engine
+from utils.utils import check_ids, etag_header, missing_ids_header, parse_datetime, split_ids
+from werkzeug.http import parse_etags
+
+logger = logging.getLogger(__name__)
+
+# URL segment (same paths as the Flask-RESTx namespaces) to model and display name
+RESOURCES = {
+    'client': (Client, 'Client'),
+    'employee': (Employee, 'Employee'),
+    'task': (Task, 'Task'),
+    'setting': (Setting, 'Setting'),
+    'work': (Work, 'Work'),
+    'vehicle': (Vehicle, 'Vehicle'),
+    'invoice': (Invoice, 'Invoice'),
+    'invoice_items': (InvoiceItem, 'Invoice item'),
+}
+
+
+async def send_json(send, status, body, headers=None, head=False):
+    """
+    Send a complete JSON response.
+    :param send: ASGI send callable.
+    :param status: HTTP status code.
+    :param body: JSON-serializable response body.
+    :param headers: Optional list of extra (name, value) byte tuples.
+    :param head: Whether the request is a HEAD request (the headers are sent without the body).
+    """
+    payload = (json.dumps(body) + '\n').encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(payload)).encode('ascii')),
+        ] + (headers or []),
+    })
+    await send({'type': 'http.response.body', 'body': b'' if head else payload})
+
+
+def encode_headers(headers):
+    """
+    :param headers: dict: Header name -> value, as returned by the utils.utils helpers.
+    :return: list: ASGI (name, value) byte tuples.
+    """
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+
+
+def is_not_modified(scope, etag):
+    """
+    Whether the If-None-Match header of a request holds an ETag (weak comparison,
+    like Flask's make_conditional).
+    :param scope: ASGI connection scope.
+    :param etag: Quoted ETag of the resource.
+    """
+    for name, value in scope['headers']:
+        if name == b'if-none-match':
+            return parse_etags(value.decode('latin-1')).contains_weak(etag.strip('"'))
+    return False
+
+
+def parse_list_args(scope):
+    """
+    The updated_since and ids query parameters of a list request, parsed like
+    the Flask endpoints do.
+    :param scope: ASGI connection scope.
+    :return: tuple: (updated_since datetime or None, list of IDs or None)
+    :raises ValueError: If a parameter is invalid (the message is returned to the client).
+    """
+    args = parse_qs(scope['query_string'].decode('latin-1'), keep_blank_values=True)
+    updated_since = args.get('updated_since', [''])[0]
+    if updated_since:
+        try:
+            updated_since = parse_datetime(updated_since)
+        except ValueError:
+            raise ValueError("updated_since must be an ISO 8601 date or date-time.")
+    ids = None
+    if 'ids' in args:
+        ids = check_ids(split_ids(args['ids'][0]), Config.BATCH_MAX_IDS)
+    return updated_since or None, ids
+
+
+async def lifespan(receive, send):
+    """
+    Handle the ASGI lifespan protocol (engine disposal on shutdown).
+    """
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await dispose_engine()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """
+    ASGI application serving GET /api/<resource>/ and GET /api/<resource>/<id>.
+    The list accepts the updated_since and ids query parameters of the Flask
+    endpoints; a single resource is sent with its ETag (304 Not Modified when
+    If-None-Match holds it). HEAD requests get the headers of the GET response
+    without its body.
+    """
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    # Split /api/<resource>/<id> into its segments
+    parts = scope['path'].strip('/').split('/')
+    head = scope['method'] == 'HEAD'
+    if len(parts) not in (2, 3) or parts[0] != 'api' or parts[1] not in RESOURCES:
+        await send_json(send, 404, {"message": "Resource not found."}, head=head)
+        return
+    if scope['method'] not in ('GET', 'HEAD'):
+        await send_json(send, 405, {"message": "Only read operations are served asynchronously."}, [(b'allow', b'GET, HEAD')])
+        return
+
+    model, name = RESOURCES[parts[1]]
+    try:
+        if len(parts) == 2 or parts[2] == '':
+            try:
+                updated_since, ids = parse_list_args(scope)
+            except ValueError as e:
+                await send_json(send, 400, {"message": str(e)}, head=head)
+                return
+            rows = await fetch_all(model, updated_since=updated_since, ids=ids)
+            headers = []
+            if ids is not None:
+                id_field = model.__table__.primary_key.columns.values()[0].name
+                headers = encode_headers(missing_ids_header(rows, ids, id_field))
+            await send_json(send, 200, rows, headers, head=head)
+            return
+        if not parts[2].isdigit():
+            await send_json(send, 404, {"message": "Resource not found."}, head=head)
+            return
+        row_id = int(parts[2])
+        row = await fetch_one(model, row_id)
+        if row is None:
+            await send_json(send, 404, {"message": f"{name} with ID {row_id} not found."}, head=head)
+            return
+        # Same ETag as the Flask resources, so If-None-Match works on either server
+        etag = etag_header(row)
+        if is_not_modified(scope, etag['ETag']):
+            await send({'type': 'http.response.start', 'status': 304, 'headers': encode_headers(etag)})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await send_json(send, 200, row, encode_headers(etag), head=head)
+    except Exception as e:
+        logger.error("Error serving %s: %s", scope['path'], e)
+        await send_json(send, 500, {"message": "An unexpected error occurred."}, head=head)
@@ -0,0 +1,118 @@
+"""
+Commits per request with and without the unit of work.
+
+Counts the COMMIT statements sent to the database and the elapsed time for:
+  - a mix of API requests (reads, creates, updates, deletes), served by an
+    app with UNIT_OF_WORK disabled (one commit per service call) and by one
+    with it enabled (one commit per request);
+  - a multi-entity operation (a work and three tasks) done with separate
+    service calls, and inside one transaction() block.
+
+The script writes to the database: point DATABASE_URI at a copy.
+
+Usage:
+    cp instance/app.db /tmp/bench.db
+    DATABASE_URI=sqlite:////tmp/bench.db flask --app app migrate
+    DATABASE_URI=sqlite:////tmp/bench.db python benchmarks/commits.py --rounds 50
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_FILE', os.devnull)
+
+from sqlalchemy import event  # noqa: E402
+from app import create_app  # noqa: E402
+from config import Config  # noqa: E402
+from services.task_service import create_task  # noqa: E402
+from services.work_service import create_work  # noqa: E402
+from utils.database import db, transaction  # noqa: E402
+
+WORK = {'cost': 100.0, 'description': 'Benchmark work', 'status': 'pending', 'vehicle_id': 1,
+        'start_date': '2025-01-06T09:00:00'}
+TASK = {'description': 'Benchmark task', 'employee_id': 1, 'start_date': '2025-01-06T09:00:00',
+        'end_date': None, 'status': 'pending'}
+
+
+class CommitCounter:
+    """
+    Count the COMMIT statements sent through the attached engines.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def attach(self, engine):
+        event.listen(engine, 'commit', self._on_commit)
+
+    def _on_commit(self, connection):
+        self.count += 1
+
+
+def api_round(client):
+    """
+    One round of API calls: 3 reads and 3 writes.
+    :return: int: Number of requests issued.
+    """
+    client.get('/api/work/')
+    client.get('/api/task/1')
+    work = client.post('/api/work/', json=WORK).json
+    client.put(f"/api/work/{work['work_id']}", json={**WORK, 'status': 'completed'})
+    client.get(f"/api/work/{work['work_id']}")
+    client.delete(f"/api/work/{work['work_id']}")
+    return 6
+
+
+def work_with_tasks(in_transaction):
+    """
+    Create a work and three tasks through the services.
+    :param in_transaction: Run the four calls in one transaction() block.
+    """
+    if in_transaction:
+        with transaction():
+            work = create_work(**WORK)
+            for _ in range(3):
+                create_task(work_id=work['work_id'], **TASK)
+    else:
+        work = create_work(**WORK)
+        for _ in range(3):
+            create_task(work_id=work['work_id'], **TASK)
+
+
+def measure(app, counter, rounds, operation):
+    """
+    Run an operation `rounds` times and report commits and time per round.
+    """
+    with app.app_context():
+        before = counter.count
+        started = time.perf_counter()
+        for _ in range(rounds):
+            operation()
+        elapsed = time.perf_counter() - started
+    return (counter.count - before) / rounds, elapsed / rounds * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Commits per request of the Garage API')
+    parser.add_argument('--rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    apps, counter = {}, CommitCounter()
+    for unit_of_work in (False, True):
+        Config.UNIT_OF_WORK = unit_of_work
+        apps[unit_of_work] = create_app()
+        with apps[unit_of_work].app_context():
+            counter.attach(db.engine)  # Each app has its own engine
+
+    for unit_of_work, app in apps.items():
+        client = app.test_client()
+        commits, ms = measure(app, counter, args.rounds, lambda: api_round(client))
+        print(f"API round (6 requests), UNIT_OF_WORK={unit_of_work}: "
+              f"{commits:.1f} commits/round ({commits / 6:.2f} per request), {ms:.1f} ms/round")
+
+    for in_transaction in (False, True):
+        commits, ms = measure(apps[False], counter, args.rounds, lambda: work_with_tasks(in_transaction))
+        label = 'one transaction()' if in_transaction else 'separate commits '
+        print(f"Work + 3 tasks, {label}: {commits:.1f} commits, {ms:.1f} ms")
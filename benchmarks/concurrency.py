@@ -0,0 +1,110 @@
+"""
+Concurrency benchmark with many slow, mostly idle clients.
+
+Each client opens a persistent connection, waits a "think time" between
+requests (like a polling dashboard) and records request latency. It compares
+how many clients each server keeps served without errors or long queues.
+
+Usage:
+    python benchmarks/concurrency.py --url http://127.0.0.1:8001 --clients 1000 --duration 20
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def client(host, port, path, think_time, deadline, latencies, errors):
+    """
+    Poll a path over one keep-alive connection until the deadline.
+    """
+    # Spread the first requests so all clients don't connect in the same instant
+    await asyncio.sleep(random.uniform(0, think_time))
+    reader = writer = None
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('ascii')
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            # Servers close idle keep-alive connections; like a real client,
+            # retry once on a fresh connection when a reused one went stale.
+            for attempt in range(2):
+                reused = writer is not None
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=30)
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=30)
+                    break
+                except (OSError, asyncio.IncompleteReadError):
+                    writer.close()
+                    writer = None
+                    if not reused:
+                        raise
+            status = int(head.split(b' ', 2)[1])
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            if status >= 500:
+                errors.append(status)
+            latencies.append(time.perf_counter() - start)
+            if b'connection: close' in head.lower():
+                writer.close()
+                writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(repr(e))
+            if writer is not None:
+                writer.close()
+            writer = None
+        await asyncio.sleep(think_time)
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, clients, duration, think_time, path):
+    """
+    Run all clients concurrently and return a summary dictionary.
+    """
+    parts = urlsplit(url)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        client(parts.hostname, parts.port or 80, path, think_time, deadline, latencies, errors)
+        for _ in range(clients)
+    ])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Slow-client concurrency benchmark for the Garage API')
+    parser.add_argument('--url', default='http://127.0.0.1:8001')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--think-time', type=float, default=2.0, help='Seconds each client idles between requests')
+    parser.add_argument('--path', default='/api/task/')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.clients, args.duration, args.think_time, args.path))
+    print(
+        f"clients={args.clients} requests={result['requests']} errors={result['errors']} "
+        f"rps={result['rps']:.1f} mean={result['mean_ms']:.1f}ms "
+        f"p50={result['p50_ms']:.1f}ms p99={result['p99_ms']:.1f}ms"
+    )
@@ -0,0 +1,53 @@
+"""
+Throughput of the error paths, measured in-process with the Flask test client.
+
+Scanners and broken clients mostly produce 404s (unknown ids or routes) and
+400s (invalid payloads), so these paths should cost no more than a normal
+read. Each scenario is repeated for a fixed number of requests and the
+requests per second are printed next to a successful GET for reference.
+Log records go to os.devnull, so their formatting cost is measured without
+filling the terminal.
+
+Usage:
+    DATABASE_URI=sqlite:///app.db python benchmarks/errors.py --requests 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_FILE', os.devnull)
+
+from app import create_app  # noqa: E402
+
+SCENARIOS = [
+    ('200 task by id', 'GET', '/api/task/1', None),
+    ('404 unknown task id', 'GET', '/api/task/999999', None),
+    ('404 unknown employee id', 'GET', '/api/employee/999999', None),
+    ('404 unknown route', 'GET', '/api/unknown', None),
+    ('400 invalid task payload', 'POST', '/api/task/', {'description': 1}),
+]
+
+
+def run(client, method, path, payload, requests):
+    """
+    Issue the same request repeatedly.
+    :return: tuple: (status code of the last response, requests per second)
+    """
+    response = client.open(path, method=method, json=payload)  # Warm-up
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.open(path, method=method, json=payload)
+    return response.status_code, requests / (time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Error path throughput of the Garage API')
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    client = create_app().test_client()
+    for name, method, path, payload in SCENARIOS:
+        status, rps = run(client, method, path, payload, args.requests)
+        print(f"{name:<26} status={status} rps={rps:.0f}")
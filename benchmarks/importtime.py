@@ -0,0 +1,107 @@
+"""
+Cold-start check for the Flask application.
+
+Starts fresh interpreters that import the application and call create_app(),
+like a newly spawned worker does, and compares the median time with a budget.
+One extra run under `python -X importtime` gives the import profile: the
+slowest modules overall and the time spent in the project's own modules.
+
+The process exits with status 1 when a budget is exceeded, so it can be run
+as a regression check after changes to imports or module-level code.
+
+Usage:
+    python benchmarks/importtime.py --runs 5 --budget-ms 800 --project-budget-ms 100
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages and modules belonging to this repository
+PROJECT_MODULES = {'app', 'api', 'config', 'errors', 'models', 'services', 'utils', 'wsgi'}
+
+# Code executed by each child interpreter; prints the elapsed time in seconds
+COLD_START = (
+    "import time; started = time.perf_counter()\n"
+    "from app import create_app; create_app()\n"
+    "print(time.perf_counter() - started)\n"
+)
+
+
+def run_child(*options):
+    """
+    Run the cold start code in a new interpreter, stopping on failure.
+    :param options: Extra interpreter options (e.g. '-X', 'importtime').
+    :return: subprocess.CompletedProcess: The finished child process.
+    """
+    child = subprocess.run([sys.executable, *options, '-c', COLD_START], cwd=ROOT, capture_output=True, text=True)
+    if child.returncode != 0:
+        # Usually a missing DATABASE_URI; show the child's traceback
+        sys.exit(f"create_app() failed:\n{child.stderr}")
+    return child
+
+
+def cold_start():
+    """
+    Import the application and call create_app() in a new interpreter.
+    :return: float: Elapsed time in milliseconds, measured in the child.
+    """
+    output = run_child().stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def import_profile():
+    """
+    Run the cold start under `python -X importtime` and parse its report.
+    :return: list: (module, self_us, cumulative_us) tuples in import order.
+    """
+    stderr = run_child('-X', 'importtime').stderr
+    profile = []
+    for line in stderr.splitlines():
+        # Lines look like "import time:   self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        profile.append((module.strip(), int(self_us), int(cumulative_us)))
+    return profile
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cold-start budget check for the Garage API')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('COLD_START_BUDGET_MS', 800)),
+                        help='Budget for importing the app and calling create_app()')
+    parser.add_argument('--project-budget-ms', type=float, default=float(os.getenv('PROJECT_IMPORT_BUDGET_MS', 100)),
+                        help="Budget for the self time of the project's own modules")
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest modules to list')
+    args = parser.parse_args()
+
+    profile = import_profile()
+    project = [entry for entry in profile if entry[0].split('.')[0] in PROJECT_MODULES]
+    project_ms = sum(self_us for _, self_us, _ in project) / 1000
+
+    print("slowest imports (cumulative):")
+    for module, self_us, cumulative_us in sorted(profile, key=lambda entry: -entry[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {module}")
+    print("slowest project modules (self):")
+    for module, self_us, cumulative_us in sorted(project, key=lambda entry: -entry[1])[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms  {module}")
+
+    timings = [cold_start() for _ in range(args.runs)]
+    median_ms = statistics.median(timings)
+    print(
+        f"cold start: median={median_ms:.1f}ms min={min(timings):.1f}ms max={max(timings):.1f}ms "
+        f"(budget {args.budget_ms:.0f}ms); project modules={project_ms:.1f}ms (budget {args.project_budget_ms:.0f}ms)"
+    )
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL: cold start exceeds its budget by {median_ms - args.budget_ms:.1f}ms")
+        failed = True
+    if project_ms > args.project_budget_ms:
+        print(f"FAIL: project modules exceed their budget by {project_ms - args.project_budget_ms:.1f}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
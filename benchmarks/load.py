@@ -0,0 +1,103 @@
+"""
+Simple HTTP load generator used to compare server setups.
+
+Each worker thread keeps one persistent HTTP/1.1 connection open and issues
+GET requests in a loop for the given duration, cycling over the paths.
+
+Usage:
+    python benchmarks/load.py --url http://127.0.0.1:8000 --concurrency 16 --duration 20
+"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = ['/api/client/', '/api/vehicle/', '/api/work/', '/api/task/', '/api/task/1']
+
+
+def worker(host, port, paths, deadline, latencies, errors, lock):
+    """
+    Issue requests until the deadline and record the latency of each one.
+    :param host: Target host.
+    :param port: Target port.
+    :param paths: List of paths to request in round-robin order.
+    :param deadline: time.perf_counter() value at which to stop.
+    :param latencies: Shared list receiving latencies in seconds.
+    :param errors: Shared list receiving error descriptions.
+    :param lock: Lock protecting the shared lists.
+    """
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    local_latencies = []
+    local_errors = []
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                local_errors.append(response.status)
+            local_latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException) as e:
+            local_errors.append(repr(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.extend(local_errors)
+
+
+def run(url, concurrency, duration, paths):
+    """
+    Run the load test and return a summary dictionary.
+    """
+    parts = urlsplit(url)
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(parts.hostname, parts.port or 80, paths, deadline, latencies, errors, lock))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HTTP load generator for the Garage API')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable)')
+    args = parser.parse_args()
+
+    result = run(args.url, args.concurrency, args.duration, args.paths or DEFAULT_PATHS)
+    print(
+        f"requests={result['requests']} errors={result['errors']} rps={result['rps']:.1f} "
+        f"mean={result['mean_ms']:.1f}ms p50={result['p50_ms']:.1f}ms "
+        f"p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms"
+    )
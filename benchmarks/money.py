@@ -0,0 +1,70 @@
+"""
+Exactness and cost of invoice totals with integer-cents storage.
+
+Adds a number of items with awkward costs (0.10, 0.20, 19.99, ...) to a new
+invoice through the service layer, then compares:
+  - the invoice total computed by the server (SQL SUM over integer cents);
+  - the exact sum of the invoice's item costs, added up with Decimal;
+  - the same sum done with Python floats, as when the columns were REAL.
+It also times the grouped SUM query used to recompute invoice totals.
+
+The script writes to the database: point DATABASE_URI at a migrated copy.
+
+Usage:
+    cp instance/app.db /tmp/bench.db
+    DATABASE_URI=sqlite:////tmp/bench.db flask --app app migrate
+    DATABASE_URI=sqlite:////tmp/bench.db python benchmarks/money.py --items 5000
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_FILE', os.devnull)
+
+from sqlalchemy import func, select  # noqa: E402
+from app import create_app  # noqa: E402
+from models.invoice_item import InvoiceItem  # noqa: E402
+from services.invoice_item_service import create_invoice_item  # noqa: E402
+from services.invoice_service import create_invoice, get_invoice  # noqa: E402
+from utils.database import db, transaction  # noqa: E402
+from utils.money import add_iva  # noqa: E402
+
+COSTS = ['0.10', '0.20', '19.99', '0.33', '1234.56', '0.07']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Invoice total exactness of the Garage API')
+    parser.add_argument('--items', type=int, default=5000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        invoice = create_invoice(client_id=1)
+        costs = list(itertools.islice(itertools.cycle(COSTS), args.items))
+        with transaction():  # One commit for all the items
+            for cost in costs:
+                create_invoice_item('Benchmark item', float(cost), invoice['invoice_id'], 1)
+        server = get_invoice(invoice['invoice_id'])
+
+        # Every item of the invoice, including seed items already pointing at its ID
+        stored = db.session.scalars(select(InvoiceItem.cost).where(InvoiceItem.invoice_id == invoice['invoice_id'])).all()
+        exact = sum(stored, Decimal('0.00'))
+        floats = sum(float(cost) for cost in stored)
+        print(f"{args.items} items added ({len(stored)} on the invoice)")
+        print(f"  server total:          {server['total']}  with IVA {server['total_with_iva']}")
+        print(f"  exact (Decimal) total: {exact}  with IVA {add_iva(exact, server['iva'])}")
+        print(f"  float total:           {floats!r}  (error {abs(Decimal(floats) - exact):.2E})")
+
+        query = (
+            select(InvoiceItem.invoice_id, func.sum(InvoiceItem.cost))
+            .where(InvoiceItem.invoice_id == invoice['invoice_id'])
+            .group_by(InvoiceItem.invoice_id)
+        )
+        started = time.perf_counter()
+        for _ in range(100):
+            db.session.execute(query).all()
+        print(f"  grouped SUM query:     {(time.perf_counter() - started) * 10:.2f} ms")
@@ -0,0 +1,100 @@
+"""
+Statement-count check for the create endpoints.
+
+Each create should cost one INSERT for its row: the generated ID and the
+server defaults (created_at, updated_at) come back through RETURNING, and
+the response is built before the commit, so nothing is read back afterwards.
+The other statements of a create are its change_log entries and the
+documented side effects (vehicle summary, invoice totals).
+
+Every create endpoint is called through the Flask test client while the SQL
+statements sent to the database are recorded. The script prints them per
+endpoint and exits with status 1 when an endpoint exceeds its budget of
+statements or of SELECTs, so it can be run as a regression check.
+
+The script writes to the database: point DATABASE_URI at a copy.
+
+Usage:
+    cp instance/app.db /tmp/bench.db
+    DATABASE_URI=sqlite:////tmp/bench.db flask --app app migrate
+    DATABASE_URI=sqlite:////tmp/bench.db python benchmarks/queries.py --verbose
+"""
+import argparse
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('LOG_FILE', os.devnull)
+
+from sqlalchemy import event  # noqa: E402
+from app import create_app  # noqa: E402
+from utils.database import db  # noqa: E402
+
+UNIQUE = uuid.uuid4().hex[:8]  # Unique values for columns with UNIQUE constraints
+
+TASK = {'description': 'Check', 'employee_id': 1, 'start_date': '2025-01-06T09:00:00', 'status': 'pending'}
+
+# (path, payload, statement budget, SELECT budget, what the statements are)
+CREATES = [
+    ('/api/client/', {'name': 'Check', 'email': f'{UNIQUE}@example.com', 'phone': '1', 'address': 'A'},
+     2, 0, 'INSERT RETURNING, change_log'),
+    ('/api/employee/', {'name': 'Check', 'email': f'{UNIQUE}@example.com', 'phone': '1', 'role': 'mechanic',
+                        'hired_date': '2024-01-01'},
+     2, 0, 'INSERT RETURNING, change_log'),
+    ('/api/vehicle/', {'brand': 'A', 'client_id': 1, 'license_plate': UNIQUE, 'model': 'B', 'year': 2020},
+     2, 0, 'INSERT RETURNING, change_log'),
+    ('/api/setting/', {'key_name': UNIQUE, 'value': 'v'},
+     2, 0, 'INSERT RETURNING, change_log'),
+    ('/api/task/', {**TASK, 'work_id': 1},
+     2, 0, 'INSERT RETURNING, change_log'),
+    ('/api/work/', {'cost': 1, 'description': 'Check', 'status': 'pending', 'vehicle_id': 1,
+                    'start_date': '2025-01-06T09:00:00'},
+     4, 0, 'INSERT RETURNING, change_log, vehicle summary UPDATE, change_log'),
+    ('/api/work/with-tasks', {'cost': 1, 'description': 'Check', 'status': 'pending', 'vehicle_id': 1,
+                              'start_date': '2025-01-06T09:00:00', 'tasks': [TASK, TASK, TASK]},
+     8, 0, 'work INSERT, change_log, one task INSERT, 3 change_log, vehicle summary UPDATE, change_log'),
+    ('/api/invoice/', {'client_id': 1},
+     3, 1, 'iva setting SELECT, INSERT, change_log'),
+    ('/api/invoice_items/', {'description': 'Check', 'cost': 1, 'invoice_id': 1, 'task_id': 1},
+     5, 1, 'INSERT, change_log, invoice and item total SELECT, change_log, invoice UPDATE'),
+]
+
+
+def record_statements(engine):
+    """
+    Record the SQL statements sent through an engine.
+    :return: list: Filled with the statements as they are executed.
+    """
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(' '.join(statement.split())))
+    return statements
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Statements per create request of the Garage API')
+    parser.add_argument('--verbose', action='store_true', help='Print every statement')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        statements = record_statements(db.engine)
+
+    failures = []
+    for path, payload, budget, select_budget, expected in CREATES:
+        statements.clear()
+        response = client.post(path, json=payload)
+        selects = sum(statement.startswith('SELECT') for statement in statements)
+        ok = response.status_code == 201 and len(statements) <= budget and selects <= select_budget
+        print(f"{'ok  ' if ok else 'FAIL'} POST {path:<22} status={response.status_code} "
+              f"statements={len(statements)}/{budget} selects={selects}/{select_budget}  ({expected})")
+        if args.verbose or not ok:
+            for statement in statements:
+                print(f"       {statement[:120]}")
+        if not ok:
+            failures.append(path)
+
+    if failures:
+        sys.exit(f"Over budget: {', '.join(failures)}")
@@ -6,4 +6,52 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URI")
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Commit once per request (after the handler) instead of once per service call
+    UNIT_OF_WORK = os.getenv("UNIT_OF_WORK", "true").lower() in ("1", "true", "yes")
+    RESTX_ERROR_404_HELP = False  # No "did you mean" route suggestions (difflib) on every 404
+    # Logging, configured once by create_app
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # Minimum level of the logged messages
+    LOG_FILE = os.getenv("LOG_FILE")  # Log to this file instead of the console when set
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # 'json' (one object per line) or 'text'
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))  # Records waiting for the writer thread
+    LOG_INFO_SAMPLE_RATE = float(os.getenv("LOG_INFO_SAMPLE_RATE", 1.0))  # Fraction of INFO records kept under load
+    LOG_SAMPLE_HIGH_WATER = int(os.getenv("LOG_SAMPLE_HIGH_WATER", 1000))  # Queued records from which INFO is sampled
+    LOG_RATE_LIMIT_BURST = int(os.getenv("LOG_RATE_LIMIT_BURST", 10))  # Warnings/errors per message template and interval
+    LOG_RATE_LIMIT_INTERVAL = float(os.getenv("LOG_RATE_LIMIT_INTERVAL", 60))  # Rate limiting interval in seconds
+    # Database URI for the async read-only application (asgi.py).
+    # Derived from DATABASE_URI (aiosqlite/asyncpg driver) when not set.
+    ASYNC_DATABASE_URI = os.getenv("ASYNC_DATABASE_URI")
+    # Swagger documentation
+    SWAGGER_UI_ENABLED = os.getenv("SWAGGER_UI_ENABLED", "true").lower() in ("1", "true", "yes")  # Serve /api/docs
+    SWAGGER_SPEC_FILE = os.getenv("SWAGGER_SPEC_FILE")  # swagger.json generated by `flask export-spec`
+    SWAGGER_SPEC_MAX_AGE = int(os.getenv("SWAGGER_SPEC_MAX_AGE", 86400))  # Cache lifetime of swagger.json in seconds
+    # Employee workloads (/api/employee/workload)
+    WORKLOAD_CACHE_TTL = float(os.getenv("WORKLOAD_CACHE_TTL", 30))  # Seconds a workload is cached (0 disables)
+    # Server-sent events (/api/events)
+    EVENTS_ENTITIES = ['work', 'task']  # Entities streamed to clients
+    EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", 1.0))  # Seconds between change log reads
+    EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", 15.0))  # Seconds between keep-alive comments
+    EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", 3000))  # Client reconnection delay
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 1000))  # Pending events per client
+    # Incremental synchronization (/api/changes)
+    CHANGES_DEFAULT_LIMIT = int(os.getenv("CHANGES_DEFAULT_LIMIT", 100))  # Changes per page by default
+    CHANGES_MAX_LIMIT = int(os.getenv("CHANGES_MAX_LIMIT", 1000))  # Upper bound for the limit parameter
+    # Idempotency-Key header of the create endpoints
+    IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 86400))  # Seconds a stored response can be replayed
+    IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", 600))  # Seconds between purges of expired keys
+    # Batch reads (GET /api/<resource>/?ids=... and POST /api/<resource>/batch)
+    BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 1000))  # IDs per request (one IN query)
+    BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 50))  # Sub-requests per POST /api/batch
+    # Coalescing of concurrent identical GET requests (per worker)
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+    SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", 10))  # Seconds to wait for the identical request
+    # Cache of GET responses, invalidated by per-table version counters shared by the workers
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))  # Per worker
+    TABLE_VERSIONS_FILE = os.getenv("TABLE_VERSIONS_FILE")  # Defaults to instance/table_versions
+    # Read-only GraphQL endpoint (/api/graphql), requires graphql-core
+    GRAPHQL_ENABLED = os.getenv("GRAPHQL_ENABLED", "false").lower() in ("1", "true", "yes")
+    GRAPHQL_MAX_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", 10))  # Nesting levels of the fields
+    GRAPHQL_MAX_COST = int(os.getenv("GRAPHQL_MAX_COST", 10000))  # Estimated fields returned (see measure())
+    GRAPHQL_LIST_SIZE_TTL = float(os.getenv("GRAPHQL_LIST_SIZE_TTL", 300))  # Seconds the average relation sizes are reused
@@ -1,5 +1,109 @@
-from flask import jsonify
-from werkzeug.exceptions import HTTPException
+import json
+import logging
+from functools import wraps
+from flask import Response, request
+from flask_restx import abort
+from sqlalchemy.exc import IntegrityError
+from utils.database import VersionConflict
+from werkzeug.exceptions import HTTPException, default_exceptions
+
+
+def error_body(message, **details):
+    """
+    Serialize an error message in the format returned by the error handlers.
+    :param message: Human-readable error message.
+    :param details: Other members of the document (e.g. the validation errors of a payload).
+    :return: bytes: JSON document {"message": ..., "status": "error"}.
+    """
+    return (json.dumps({"message": message, **details, "status": "error"}, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+# Constraint violations caused by an invalid value in the request (400) rather
+# than by a conflict with the rows already stored (UNIQUE, FOREIGN KEY: 409)
+INVALID_VALUE_CONSTRAINTS = ('SQLITE_CONSTRAINT_CHECK', 'SQLITE_CONSTRAINT_NOTNULL')
+
+# Error bodies serialized once: only errors with a custom message are encoded per response
+NOT_FOUND_BODY = error_body("Resource not found.")
+INTERNAL_ERROR_BODY = error_body("An unexpected error occurred.")
+HTTP_ERROR_BODIES = {
+    code: (exception.description, error_body(exception.description))
+    for code, exception in default_exceptions.items()
+}
+
+
+def error_response(code, body):
+    """
+    Build a JSON error response from a serialized body.
+    :param code: HTTP status code.
+    :param body: Serialized body (see error_body).
+    :return: Response: The error response.
+    """
+    return Response(body, status=code, mimetype='application/json')
+
+
+def http_error_response(e):
+    """
+    Build the JSON error response of an HTTP exception.
+    The body is one of HTTP_ERROR_BODIES when the exception carries the default
+    description of its status code; a custom message (abort(404, "...")) and
+    the details added by Flask-RESTx (e.data, e.g. payload validation errors)
+    are serialized for the response. Headers of the exception such as Allow
+    are kept.
+    :param e: HTTPException.
+    :return: Response: The error response.
+    """
+    data = getattr(e, 'data', None) or {}
+    message = data.get('message', e.description)
+    details = {name: value for name, value in data.items() if name not in ('message', 'status')}
+    description, body = HTTP_ERROR_BODIES.get(e.code, (None, None))
+    if message != description or details:
+        body = error_body(message, **details)
+    response = error_response(e.code, body)
+    for name, value in e.get_headers():
+        if name != 'Content-Type':
+            response.headers[name] = value
+    return response
+
+
+def handle_errors(message, code=500):
+    """
+    Decorator handling unexpected exceptions of a resource method.
+    HTTP exceptions (abort(404), payload validation, ...) propagate unchanged
+    and are not logged, so that bad ids and bad payloads stay cheap. Any other
+    exception is logged once, without a traceback, and turned into an HTTP
+    error with the given message. Constraint violations raised by the database
+    become 400 Bad Request for CHECK and NOT NULL constraints (an invalid
+    value) and 409 Conflict for the others (a duplicate UNIQUE value, or a
+    reference to a missing row), and a write whose If-Match version is
+    outdated becomes 412 Precondition Failed.
+    :param message: Message returned to the client when the method fails.
+    :param code: HTTP status code returned when the method fails (default 500).
+    """
+    def decorator(func):
+        logger = logging.getLogger(func.__module__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except HTTPException:
+                raise
+            except VersionConflict as e:
+                logger.info("%s %s: %s", request.method, request.path, e)
+                abort(412, "The resource was modified since it was read: fetch it again and retry with its new ETag.")
+            except IntegrityError as e:
+                if getattr(e.orig, 'sqlite_errorname', None) in INVALID_VALUE_CONSTRAINTS:
+                    logger.info("%s %s has an invalid value: %s", request.method, request.path, e.orig)
+                    abort(400, "The request contains an invalid value.")
+                logger.warning("%s %s conflicts with existing data: %s", request.method, request.path, e.orig)
+                abort(409, "The request conflicts with existing data.")
+            except Exception as e:
+                # Lazy formatting: the message is only built if the record is emitted
+                logger.error("%s %s failed: %r", request.method, request.path, e)
+                abort(code, message)
+        return wrapper
+    return decorator
+
 
 def register_error_handlers(app):
     """
@@ -11,24 +115,18 @@ def register_error_handlers(app):
         """
         Handle HTTP exceptions with custom responses.
         """
-        response = jsonify({"status": "error", "message": e.description})
-        response.status_code = e.code
-        return response
+        return http_error_response(e)
 
     @app.errorhandler(Exception)
     def handle_general_exception(e):
         """
         Handle general exceptions (non-HTTP).
         """
-        response = jsonify({"status": "error", "message": "An unexpected error occurred."})
-        response.status_code = 500
-        return response
+        return error_response(500, INTERNAL_ERROR_BODY)
 
     @app.errorhandler(404)
     def handle_not_found(e):
         """
         Custom 404 error handler.
         """
-        response = jsonify({"status": "error", "message": "Resource not found."})
-        response.status_code = 404
-        return response
\ No newline at end of file
+        return error_response(404, NOT_FOUND_BODY)
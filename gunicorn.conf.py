@@ -0,0 +1,77 @@
+# Gunicorn configuration for the Garage API.
+# Gunicorn loads this file automatically when started from the project root:
+#   gunicorn wsgi:app
+# The worker model is selected with GUNICORN_PRESET (sync, gthread or gevent)
+# and every value can be overridden with the matching GUNICORN_* variable.
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+# Worker presets
+# - sync: one request per process, best for short CPU-bound requests.
+# - gthread: a few processes with a thread pool each, good default for
+#   SQLite/PostgreSQL backed requests that spend time waiting on the database.
+# - gevent: cooperative greenlets, for many slow or idle clients
+#   (requires `pip install gevent`).
+PRESETS = {
+    'sync': {
+        'worker_class': 'sync',
+        'workers': cpu_count * 2 + 1,
+        'threads': 1,
+    },
+    'gthread': {
+        'worker_class': 'gthread',
+        'workers': cpu_count + 1,
+        'threads': 4,
+    },
+    'gevent': {
+        'worker_class': 'gevent',
+        'workers': cpu_count + 1,
+        'threads': 1,
+        'worker_connections': 1000,
+    },
+}
+
+preset_name = os.getenv('GUNICORN_PRESET', 'gthread')
+if preset_name not in PRESETS:
+    raise ValueError(f"Unknown GUNICORN_PRESET '{preset_name}', expected one of {sorted(PRESETS)}")
+preset = PRESETS[preset_name]
+
+# Server socket
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+
+# Worker model
+worker_class = preset['worker_class']
+workers = int(os.getenv('GUNICORN_WORKERS', preset['workers']))
+threads = int(os.getenv('GUNICORN_THREADS', preset['threads']))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', preset.get('worker_connections', 1000)))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Load the application once in the master process; workers are forked from it
+# and share the imported modules and Swagger models via copy-on-write.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Recycle workers after N requests (with jitter so they don't restart together)
+# to bound memory growth from fragmentation or leaks.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# Logging
+accesslog = os.getenv('GUNICORN_ACCESSLOG')  # Disabled unless a path or '-' is given
+errorlog = os.getenv('GUNICORN_ERRORLOG', '-')
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """
+    Drop database connections inherited from the master process.
+    With preload_app the engine is created before forking; pooled connections
+    must never be shared between processes.
+    """
+    from wsgi import app
+    from utils.database import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
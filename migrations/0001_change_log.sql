@@ -0,0 +1,12 @@
+-- Append-only change log, written in the same transaction as each change.
+-- Used to fan out task and work events across workers (/api/events).
+CREATE TABLE change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entity TEXT NOT NULL,
+    entity_id INTEGER NOT NULL,
+    op TEXT CHECK (op IN ('create', 'update', 'delete')) NOT NULL,
+    payload TEXT,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP)
+);
+
+CREATE INDEX ix_change_log_entity_seq ON change_log (entity, seq);
@@ -0,0 +1,11 @@
+-- Per-row version of each change (1 for the first change of an entity row)
+ALTER TABLE change_log ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+
+UPDATE change_log SET version = (
+    SELECT COUNT(*) FROM change_log AS previous
+    WHERE previous.entity = change_log.entity
+      AND previous.entity_id = change_log.entity_id
+      AND previous.seq <= change_log.seq
+);
+
+CREATE INDEX ix_change_log_entity_row ON change_log (entity, entity_id, version);
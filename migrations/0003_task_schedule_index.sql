@@ -0,0 +1,3 @@
+-- Schedule lookups: tasks of an employee by start date, with the end date in the index
+-- so that overlap checks (start < :to AND end > :from) never read the table rows
+CREATE INDEX ix_task_employee_schedule ON task (employee_id, start_date, end_date);
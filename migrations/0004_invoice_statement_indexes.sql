@@ -0,0 +1,4 @@
+-- Client statements: invoices of a client by issue date, and the items of each invoice
+CREATE INDEX ix_invoice_client_issued ON invoice (client_id, issued_at);
+
+CREATE INDEX ix_invoice_item_invoice ON invoice_item (invoice_id, item_id);
@@ -0,0 +1,18 @@
+-- Denormalized work summary of each vehicle, maintained by the work service
+ALTER TABLE vehicle ADD COLUMN last_work_at DATETIME;
+ALTER TABLE vehicle ADD COLUMN open_work_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE vehicle SET
+    last_work_at = (
+        SELECT MAX(work.start_date) FROM work
+        WHERE work.vehicle_id = vehicle.vehicle_id AND work.status != 'cancelled'
+    ),
+    open_work_count = (
+        SELECT COUNT(*) FROM work
+        WHERE work.vehicle_id = vehicle.vehicle_id AND work.status IN ('pending', 'in_progress')
+    );
+
+-- Service history: works of a vehicle by date, and the tasks of each work
+CREATE INDEX ix_work_vehicle_start ON work (vehicle_id, start_date);
+
+CREATE INDEX ix_task_work_start ON task (work_id, start_date);
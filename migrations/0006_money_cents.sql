@@ -0,0 +1,23 @@
+-- Money amounts as integer cents instead of REAL euros.
+-- Each column is converted in place (add, backfill, drop, rename) rather than
+-- rebuilding the tables, so no table referenced by foreign keys is dropped.
+-- ROUND happens on the euro value first: 123.615 is stored as 12362 cents.
+ALTER TABLE invoice ADD COLUMN total_cents INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE invoice ADD COLUMN total_with_iva_cents INTEGER NOT NULL DEFAULT 0;
+UPDATE invoice SET
+    total_cents = CAST(ROUND(total * 100 + 1e-9) AS INTEGER),
+    total_with_iva_cents = CAST(ROUND(total_with_iva * 100 + 1e-9) AS INTEGER);
+ALTER TABLE invoice DROP COLUMN total;
+ALTER TABLE invoice DROP COLUMN total_with_iva;
+ALTER TABLE invoice RENAME COLUMN total_cents TO total;
+ALTER TABLE invoice RENAME COLUMN total_with_iva_cents TO total_with_iva;
+
+ALTER TABLE invoice_item ADD COLUMN cost_cents INTEGER NOT NULL DEFAULT 0;
+UPDATE invoice_item SET cost_cents = CAST(ROUND(cost * 100 + 1e-9) AS INTEGER);
+ALTER TABLE invoice_item DROP COLUMN cost;
+ALTER TABLE invoice_item RENAME COLUMN cost_cents TO cost;
+
+ALTER TABLE work ADD COLUMN cost_cents INTEGER;
+UPDATE work SET cost_cents = CAST(ROUND(cost * 100 + 1e-9) AS INTEGER) WHERE cost IS NOT NULL;
+ALTER TABLE work DROP COLUMN cost;
+ALTER TABLE work RENAME COLUMN cost_cents TO cost;
@@ -0,0 +1,86 @@
+-- Record every deleted row in the change log from the database itself.
+-- Deletes are single DELETE statements that rely on ON DELETE CASCADE (foreign
+-- keys are enabled on every connection), so the rows removed by a cascade
+-- (e.g. the tasks and invoice items of a deleted work) never reach the
+-- application; these triggers log them like the services log creates and
+-- updates: same entity names, per-row version and {"<id column>": id} payload.
+
+CREATE TRIGGER trg_client_change_log_delete AFTER DELETE ON client
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'client', OLD.client_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'client' AND entity_id = OLD.client_id),
+        json_object('client_id', OLD.client_id)
+    );
+END;
+
+CREATE TRIGGER trg_employee_change_log_delete AFTER DELETE ON employee
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'employee', OLD.employee_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'employee' AND entity_id = OLD.employee_id),
+        json_object('employee_id', OLD.employee_id)
+    );
+END;
+
+CREATE TRIGGER trg_vehicle_change_log_delete AFTER DELETE ON vehicle
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'vehicle', OLD.vehicle_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'vehicle' AND entity_id = OLD.vehicle_id),
+        json_object('vehicle_id', OLD.vehicle_id)
+    );
+END;
+
+CREATE TRIGGER trg_work_change_log_delete AFTER DELETE ON work
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'work', OLD.work_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'work' AND entity_id = OLD.work_id),
+        json_object('work_id', OLD.work_id)
+    );
+END;
+
+CREATE TRIGGER trg_task_change_log_delete AFTER DELETE ON task
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'task', OLD.task_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'task' AND entity_id = OLD.task_id),
+        json_object('task_id', OLD.task_id)
+    );
+END;
+
+CREATE TRIGGER trg_invoice_change_log_delete AFTER DELETE ON invoice
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'invoice', OLD.invoice_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'invoice' AND entity_id = OLD.invoice_id),
+        json_object('invoice_id', OLD.invoice_id)
+    );
+END;
+
+CREATE TRIGGER trg_invoice_item_change_log_delete AFTER DELETE ON invoice_item
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'invoice_item', OLD.item_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'invoice_item' AND entity_id = OLD.item_id),
+        json_object('item_id', OLD.item_id)
+    );
+END;
+
+CREATE TRIGGER trg_setting_change_log_delete AFTER DELETE ON setting
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES (
+        'setting', OLD.setting_id, 'delete',
+        (SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE entity = 'setting' AND entity_id = OLD.setting_id),
+        json_object('setting_id', OLD.setting_id)
+    );
+END;
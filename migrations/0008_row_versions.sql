@@ -0,0 +1,46 @@
+-- Row versions for optimistic concurrency control and incremental listing.
+-- Every table gets an integer version (bumped by each UPDATE, compared by
+-- UPDATE ... WHERE id = ? AND version = ? for If-Match) and an updated_at
+-- timestamp (set by each INSERT and UPDATE, filtered by ?updated_since=).
+-- SQLite cannot add a column with a CURRENT_TIMESTAMP default, so updated_at
+-- is filled by the application and backfilled here from the creation date
+-- (the issue date for invoices, now for invoice items, which have neither).
+-- setting already has updated_at.
+
+ALTER TABLE client ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE client ADD COLUMN updated_at DATETIME;
+UPDATE client SET updated_at = COALESCE(datetime(created_at), CURRENT_TIMESTAMP);
+CREATE INDEX ix_client_updated_at ON client (updated_at);
+
+ALTER TABLE employee ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE employee ADD COLUMN updated_at DATETIME;
+UPDATE employee SET updated_at = COALESCE(datetime(created_at), CURRENT_TIMESTAMP);
+CREATE INDEX ix_employee_updated_at ON employee (updated_at);
+
+ALTER TABLE vehicle ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE vehicle ADD COLUMN updated_at DATETIME;
+UPDATE vehicle SET updated_at = COALESCE(datetime(created_at), CURRENT_TIMESTAMP);
+CREATE INDEX ix_vehicle_updated_at ON vehicle (updated_at);
+
+ALTER TABLE work ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE work ADD COLUMN updated_at DATETIME;
+UPDATE work SET updated_at = COALESCE(datetime(created_at), CURRENT_TIMESTAMP);
+CREATE INDEX ix_work_updated_at ON work (updated_at);
+
+ALTER TABLE task ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE task ADD COLUMN updated_at DATETIME;
+UPDATE task SET updated_at = COALESCE(datetime(created_at), CURRENT_TIMESTAMP);
+CREATE INDEX ix_task_updated_at ON task (updated_at);
+
+ALTER TABLE invoice ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE invoice ADD COLUMN updated_at DATETIME;
+UPDATE invoice SET updated_at = COALESCE(datetime(issued_at), CURRENT_TIMESTAMP);
+CREATE INDEX ix_invoice_updated_at ON invoice (updated_at);
+
+ALTER TABLE invoice_item ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE invoice_item ADD COLUMN updated_at DATETIME;
+UPDATE invoice_item SET updated_at = CURRENT_TIMESTAMP;
+CREATE INDEX ix_invoice_item_updated_at ON invoice_item (updated_at);
+
+ALTER TABLE setting ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+CREATE INDEX ix_setting_updated_at ON setting (updated_at);
@@ -0,0 +1,15 @@
+-- Responses of the create requests sent with an Idempotency-Key header.
+-- A retried request with the same key is answered from this table instead of
+-- creating the row again. The key is the primary key of a WITHOUT ROWID
+-- table, so a lookup is a single B-tree search and no rowid is stored; the
+-- request hash is the raw 32-byte SHA-256 digest. Rows older than
+-- IDEMPOTENCY_KEY_TTL are purged through the created_at index.
+CREATE TABLE idempotency_key (
+    key TEXT PRIMARY KEY,
+    request_hash BLOB NOT NULL,
+    status INTEGER,
+    body TEXT,
+    created_at DATETIME NOT NULL DEFAULT (CURRENT_TIMESTAMP)
+) WITHOUT ROWID;
+
+CREATE INDEX ix_idempotency_key_created_at ON idempotency_key (created_at);
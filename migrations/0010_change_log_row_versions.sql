@@ -0,0 +1,61 @@
+-- Log deletes with the row version instead of counting the previous changes.
+-- The services record the version of the row returned by INSERT/UPDATE ...
+-- RETURNING (the one sent in its ETag); a delete is logged with the version
+-- that follows the last one of the row, so the versions of a row in the
+-- change log keep increasing and always agree with its ETags.
+
+DROP TRIGGER trg_client_change_log_delete;
+CREATE TRIGGER trg_client_change_log_delete AFTER DELETE ON client
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('client', OLD.client_id, 'delete', OLD.version + 1, json_object('client_id', OLD.client_id));
+END;
+
+DROP TRIGGER trg_employee_change_log_delete;
+CREATE TRIGGER trg_employee_change_log_delete AFTER DELETE ON employee
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('employee', OLD.employee_id, 'delete', OLD.version + 1, json_object('employee_id', OLD.employee_id));
+END;
+
+DROP TRIGGER trg_vehicle_change_log_delete;
+CREATE TRIGGER trg_vehicle_change_log_delete AFTER DELETE ON vehicle
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('vehicle', OLD.vehicle_id, 'delete', OLD.version + 1, json_object('vehicle_id', OLD.vehicle_id));
+END;
+
+DROP TRIGGER trg_work_change_log_delete;
+CREATE TRIGGER trg_work_change_log_delete AFTER DELETE ON work
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('work', OLD.work_id, 'delete', OLD.version + 1, json_object('work_id', OLD.work_id));
+END;
+
+DROP TRIGGER trg_task_change_log_delete;
+CREATE TRIGGER trg_task_change_log_delete AFTER DELETE ON task
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('task', OLD.task_id, 'delete', OLD.version + 1, json_object('task_id', OLD.task_id));
+END;
+
+DROP TRIGGER trg_invoice_change_log_delete;
+CREATE TRIGGER trg_invoice_change_log_delete AFTER DELETE ON invoice
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('invoice', OLD.invoice_id, 'delete', OLD.version + 1, json_object('invoice_id', OLD.invoice_id));
+END;
+
+DROP TRIGGER trg_invoice_item_change_log_delete;
+CREATE TRIGGER trg_invoice_item_change_log_delete AFTER DELETE ON invoice_item
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('invoice_item', OLD.item_id, 'delete', OLD.version + 1, json_object('item_id', OLD.item_id));
+END;
+
+DROP TRIGGER trg_setting_change_log_delete;
+CREATE TRIGGER trg_setting_change_log_delete AFTER DELETE ON setting
+BEGIN
+    INSERT INTO change_log (entity, entity_id, op, version, payload)
+    VALUES ('setting', OLD.setting_id, 'delete', OLD.version + 1, json_object('setting_id', OLD.setting_id));
+END;
@@ -0,0 +1,5 @@
+-- Invoice items of invoices that no longer exist, left in the sample data by
+-- deletes that ran without foreign key enforcement. SQLite reuses the IDs of
+-- deleted invoices, so a new invoice would take over these items and count
+-- them in its totals. The delete triggers log them in the change log.
+DELETE FROM invoice_item WHERE invoice_id NOT IN (SELECT invoice_id FROM invoice);
@@ -0,0 +1,42 @@
+from utils.database import db
+
+
+# Model definition for the 'change_log' table
+class ChangeLog(db.Model):
+    """
+    Append-only log of changes made through the service layer.
+    Rows are written in the same transaction as the change they describe.
+    They are read by the event stream to fan out changes across workers and
+    by /api/changes for incremental synchronization.
+
+    Attributes:
+        seq (int): Monotonic sequence number (never reused).
+        entity (str): Name of the changed entity (e.g. 'task', 'work').
+        entity_id (int): Primary key of the changed row.
+        op (str): Operation performed: 'create', 'update' or 'delete'.
+        version (int): Version of the entity row after the change (its ETag; for a delete, the one following its last version).
+        payload (text): JSON snapshot of the row after the change.
+        created_at (datetime): Timestamp when the change was recorded.
+    """
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        db.Index('ix_change_log_entity_seq', 'entity', 'seq'),  # Changes of an entity, in order
+        db.Index('ix_change_log_entity_row', 'entity', 'entity_id', 'version'),  # Changes of a row
+        {'sqlite_autoincrement': True},
+    )
+
+    # Define columns for the table
+    seq = db.Column(db.Integer, primary_key=True)  # Sequence number, also used as event id
+    entity = db.Column(db.String(50), nullable=False)  # Changed entity
+    entity_id = db.Column(db.Integer, nullable=False)  # Changed row ID
+    op = db.Column(db.String(10), nullable=False)  # create, update or delete
+    version = db.Column(db.Integer, nullable=False, default=1)  # Row version after the change
+    payload = db.Column(db.Text)  # JSON snapshot of the row
+    created_at = db.Column(db.DateTime, server_default=db.func.now())  # Auto-generated timestamp
+
+    def __repr__(self):
+        """
+        String representation of the ChangeLog object.
+        Useful for debugging and logging purposes.
+        """
+        return f"<ChangeLog {self.seq} {self.op} {self.entity} {self.entity_id}>"
@@ -1,8 +1,8 @@
-from utils.database import db
+from utils.database import db, Versioned
 
 
 # Model definition for the 'Client' table
-class Client(db.Model):
+class Client(Versioned, db.Model):
     """
     Represents a client in the database.
 
@@ -13,6 +13,8 @@ class Client(db.Model):
         phone (str): The phone number of the client. Cannot be null.
         address (str): The address of the client. Cannot be null.
         created_at (datetime): Timestamp when the client was created. Defaults to the current time.
+        version (int): Row version, incremented by every update (see Versioned).
+        updated_at (datetime): Timestamp of the last change. Set by every insert and update.
     """
 
     # Define columns for the table
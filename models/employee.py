@@ -1,7 +1,7 @@
-from utils.database import db
+from utils.database import db, Versioned
 
 
-class Employee(db.Model):
+class Employee(Versioned, db.Model):
     """
     Employee model: This class represents the 'Employee' table in the database.
 
@@ -13,6 +13,8 @@ class Employee(db.Model):
         role (str): Role of the employee (e.g., 'mechanic', 'manager'). Default is 'mechanic'.
         hired_date (date): Date when the employee was hired.
         created_at (datetime): Timestamp indicating when the record was created. Auto-generated by the database.
+        version (int): Row version, incremented by every update (see Versioned).
+        updated_at (datetime): Timestamp of the last change. Set by every insert and update.
     """
     # Primary key column
     employee_id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,36 @@
+from utils.database import db
+
+
+# Model definition for the 'idempotency_key' table
+class IdempotencyKey(db.Model):
+    """
+    Stored response of a create request sent with an Idempotency-Key header.
+    The row is written in the same transaction as the rows the request
+    creates, so a retry either finds the response or finds nothing was created.
+
+    Attributes:
+        key (str): The Idempotency-Key header sent by the client.
+        request_hash (bytes): SHA-256 digest of the method, path and JSON body of the request.
+        status (int): HTTP status code of the stored response.
+        body (text): JSON body of the stored response.
+        created_at (datetime): Timestamp when the key was first used. Keys expire after IDEMPOTENCY_KEY_TTL.
+    """
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (
+        db.Index('ix_idempotency_key_created_at', 'created_at'),  # Purge of expired keys
+        {'sqlite_with_rowid': False},
+    )
+
+    # Define columns for the table
+    key = db.Column(db.String(255), primary_key=True)  # Client-chosen key
+    request_hash = db.Column(db.LargeBinary, nullable=False)  # Raw SHA-256 digest
+    status = db.Column(db.Integer)  # Stored status code
+    body = db.Column(db.Text)  # Stored JSON body
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())  # Auto-generated timestamp
+
+    def __repr__(self):
+        """
+        String representation of the IdempotencyKey object.
+        Useful for debugging and logging purposes.
+        """
+        return f"<IdempotencyKey {self.key} {self.status}>"
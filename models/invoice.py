@@ -1,16 +1,19 @@
-from utils.database import db
+from utils.database import db, Versioned
+from utils.money import Money, Rate
 from datetime import datetime 
 
 
-class Invoice(db.Model):
+class Invoice(Versioned, db.Model):
+    # Client statements (migrations/0004_invoice_statement_indexes.sql)
+    __table_args__ = (db.Index('ix_invoice_client_issued', 'client_id', 'issued_at'),)
 
     invoice_id = db.Column(db.Integer, primary_key=True)
 
     client_id = db.Column(db.Integer, nullable=False)
     issued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    iva = db.Column(db.Float, nullable=False)
-    total = db.Column(db.Float, nullable=False)
-    total_with_iva = db.Column(db.Float, nullable=False)
+    iva = db.Column(Rate, nullable=False)  # IVA rate (e.g. 0.23)
+    total = db.Column(Money, nullable=False)  # Sum of the items, in integer cents
+    total_with_iva = db.Column(Money, nullable=False)  # total plus IVA, in integer cents
      
     items = db.relationship('InvoiceItem', backref='invoice', cascade="all, delete-orphan", lazy=True)
 
@@ -1,11 +1,14 @@
-from utils.database import db
+from utils.database import db, Versioned
+from utils.money import Money
+
+class InvoiceItem(Versioned, db.Model):
+    # Items of an invoice (migrations/0004_invoice_statement_indexes.sql)
+    __table_args__ = (db.Index('ix_invoice_item_invoice', 'invoice_id', 'item_id'),)
 
-class InvoiceItem(db.Model):
-   
     item_id = db.Column(db.Integer, primary_key=True)
     
     description = db.Column(db.Text, nullable=False)
-    cost = db.Column(db.Float, nullable=False)
+    cost = db.Column(Money, nullable=False)  # Euros, stored as integer cents
     task_id = db.Column(db.Integer, nullable=False)
 
     invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.invoice_id'), nullable=False)
@@ -1,22 +1,23 @@
-from utils.database import db
+from utils.database import db, Versioned
 
 
 # Model definition for the 'Setting' table
-class Setting(db.Model):
+class Setting(Versioned, db.Model):
     """
     Represents a setting in the database.
 
     Attributes:
         setting_id (int): The primary key for the setting table.
         key_name (str): The name of the setting. Must be unique and cannot be null.
-        updated_at (datetime): Timestamp when the setting was created. Defaults to the current time.
+        updated_at (datetime): Timestamp of the last change. Set by every insert and update.
         value (str): The value of the setting. Cannot be null.
+        version (int): Row version, incremented by every update (see Versioned).
     """
 
     # Define columns for the table
     setting_id = db.Column(db.Integer, primary_key=True)  # Unique identifier for each setting
     key_name = db.Column(db.String(80), unique=True, nullable=False)  # setting name, must be unique
-    updated_at = db.Column(db.DateTime, server_default=db.func.now())  # Auto-generated timestamp
+    updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now(), index=True)  # Last change
     value = db.Column(db.String(200), nullable=False)  # setting value
     
     def __repr__(self):
@@ -1,8 +1,8 @@
-from utils.database import db
+from utils.database import db, Versioned
 from datetime import datetime
 
 # Model definition for the 'Task' table
-class Task(db.Model):
+class Task(Versioned, db.Model):
     """
     Represents a task in the database.
 
@@ -15,8 +15,16 @@ class Task(db.Model):
         start_date (date): The start date of the task. Cannot be null.
         status (str): The status of the task.
         work_id (int): Must be unique and cannot be null.
+        version (int): Row version, incremented by every update (see Versioned).
+        updated_at (datetime): Timestamp of the last change. Set by every insert and update.
     """
 
+    # Schedule lookups by employee and period (migrations/0003_task_schedule_index.sql)
+    __table_args__ = (
+        db.Index('ix_task_employee_schedule', 'employee_id', 'start_date', 'end_date'),
+        db.Index('ix_task_work_start', 'work_id', 'start_date'),  # Tasks of a work (0005_vehicle_work_summary.sql)
+    )
+
     # Define columns for the table
     task_id = db.Column(db.Integer, primary_key=True)  # Unique identifier for each task
     created_at = db.Column(db.DateTime, server_default=db.func.now())  # Auto-generated timestamp
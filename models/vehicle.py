@@ -1,7 +1,7 @@
-from utils.database import db
+from utils.database import db, Versioned
 
 # Model definition for the 'Vehicle' table
-class Vehicle(db.Model):
+class Vehicle(Versioned, db.Model):
     """
     Represents a vehicle in the database.
 
@@ -13,16 +13,22 @@ class Vehicle(db.Model):
         license_plate (TEXT): The license plate of the vehicle. Cannot be null.
         model (TEXT): The model of the vehicle. Cannot be null.
         year (int): The year of the vehicle. Cannot be null.
+        last_work_at (datetime): Start date of the most recent work that was not cancelled. Maintained by the work service.
+        open_work_count (int): Number of pending and in-progress works. Maintained by the work service.
+        version (int): Row version, incremented by every update (see Versioned).
+        updated_at (datetime): Timestamp of the last change. Set by every insert and update.
     """
 
     # Define columns for the table
     vehicle_id = db.Column(db.Integer, primary_key=True)  # Unique identifier for each vehicle
     brand = db.Column(db.Text, nullable=False)  # Vehicle brand
-    client_id = db.Column(db.Integer, db.ForeignKey('client'), nullable=False)  # Client ID who owns the vehicle
+    client_id = db.Column(db.Integer, db.ForeignKey('client.client_id'), nullable=False)  # Client ID who owns the vehicle
     created_at = db.Column(db.DateTime, server_default=db.func.now())  # Auto-generated timestamp
     license_plate = db.Column(db.Text, nullable=False)  # Vehicle license plate
     model = db.Column(db.Text, nullable=False)  # Vehicle model
     year = db.Column(db.Integer, nullable=False)  # Vehicle year
+    last_work_at = db.Column(db.DateTime)  # Start of the latest work (denormalized)
+    open_work_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Open works (denormalized)
     def __repr__(self):
         """
         String representation of the Vehicle object.
@@ -1,25 +1,30 @@
-from utils.database import db
+from utils.database import db, Versioned
+from utils.money import Money
 
 # Model definition for the 'Work' table
 
-class Work(db.Model):
+class Work(Versioned, db.Model):
     """
     Represents a work in the database.
 
     Attributes:
         work_id (int): The primary key for the work table.
-        cost (float): The cost of the work. Cannot be null.
+        cost (Decimal): The cost of the work, stored as integer cents. Cannot be null.
         created_at (datetime): Timestamp when the work was created. Defaults to the current time.
         description (text): The description of the work. Cannot be null.
         end_date (datetime): The end date of the work.
         start_date (datetime): The start date of the work
         status (text): The status of the work. Cannot be null.
         vehicle_id (int): The foreign key to the vehicle table.
+        version (int): Row version, incremented by every update (see Versioned).
+        updated_at (datetime): Timestamp of the last change. Set by every insert and update.
     """
+    # Works of a vehicle by start date (migrations/0005_vehicle_work_summary.sql)
+    __table_args__ = (db.Index('ix_work_vehicle_start', 'vehicle_id', 'start_date'),)
 
     # Define columns for the table
     work_id = db.Column(db.Integer, primary_key=True)  # Unique identifier for each work
-    cost = db.Column(db.Float, nullable=False)  # Work cost    
+    cost = db.Column(Money, nullable=False)  # Work cost (euros, stored as integer cents)
     created_at = db.Column(db.DateTime, server_default=db.func.now())  # Auto-generated timestamp
     description = db.Column(db.Text, nullable=False)  # Work description
     end_date = db.Column(db.Date)  # Work end date
@@ -0,0 +1,71 @@
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import DateTime, select
+
+from utils.async_database import get_session
+from utils.database import changed_since
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_row(table, row):
+    """
+    Convert a database row into a JSON-ready dictionary.
+    Values are formatted the same way as the Flask-RESTx models of the sync API
+    (ISO 8601 dates, DateTime columns always rendered with a time part).
+    :param table: SQLAlchemy Table the row was selected from.
+    :param row: Row mapping returned by the query.
+    :return: dict: Column name to JSON-compatible value.
+    """
+    data = {}
+    for column in table.columns:
+        value = row[column.name]
+        if isinstance(value, (date, datetime)):
+            if isinstance(column.type, DateTime) and not isinstance(value, datetime):
+                value = datetime(value.year, value.month, value.day)
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)  # Money and rates, as numbers like fields.Float
+        data[column.name] = value
+    return data
+
+
+async def fetch_all(model, updated_since=None, ids=None):
+    """
+    Retrieve all rows of a model's table.
+    :param model: SQLAlchemy model class from models/.
+    :param updated_since: Only return the rows changed at or after this datetime (optional).
+    :param ids: Only return the rows with these primary keys, in this order (optional, one IN query).
+    :return: list: A list of dictionaries, one per row.
+    """
+    table = model.__table__
+    primary_key = table.primary_key.columns.values()[0]
+    query = select(table)
+    if updated_since:
+        query = query.where(changed_since(model, updated_since))
+    if ids is not None:
+        query = query.where(primary_key.in_(ids))
+    async with get_session() as session:
+        result = await session.execute(query)
+        rows = [serialize_row(table, row) for row in result.mappings()]
+    if ids is not None:
+        position = {row_id: index for index, row_id in enumerate(ids)}
+        rows.sort(key=lambda row: position[row[primary_key.name]])
+    return rows
+
+
+async def fetch_one(model, row_id):
+    """
+    Retrieve a single row of a model's table by primary key.
+    :param model: SQLAlchemy model class from models/.
+    :param row_id: The primary key value.
+    :return: dict: The row as a dictionary or None if not found.
+    """
+    table = model.__table__
+    primary_key = table.primary_key.columns.values()[0]
+    async with get_session() as session:
+        result = await session.execute(select(table).where(primary_key == row_id))
+        row = result.mappings().first()
+        return serialize_row(table, row) if row else None
@@ -0,0 +1,24 @@
+import logging
+from utils.events import fetch_changes
+
+logger = logging.getLogger(__name__)
+
+def get_changes(since, limit, entities=None):
+    """
+    Retrieve the changes recorded after a sequence number.
+    The cost is proportional to the number of changes returned, not to the
+    size of the tables, since change_log is read by its primary key.
+    :param since: Sequence number of the last change already processed by the consumer.
+    :param limit: Maximum number of changes to return.
+    :param entities: Optional list of entity names to filter on.
+    :return: dict: The changes, the sequence number to resume from and whether more changes are pending.
+    """
+    # Read one extra row to know whether another page follows
+    changes = fetch_changes(since, entities, limit + 1)
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        "changes": changes,
+        "last_seq": changes[-1]["seq"] if changes else since,
+        "has_more": has_more,
+    }
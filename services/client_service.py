@@ -1,52 +1,68 @@
 import logging
-from utils.database import db
+from sqlalchemy import func, select
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
 from models.client import Client
+from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+from models.task import Task
+from models.vehicle import Vehicle
+from models.work import Work
+from services.invoice_service import delete_task_items
+from utils.events import notify_changes, record_change
 
 logger = logging.getLogger(__name__)
 
-def get_all_clients():
+# Rows fetched from the database at a time while streaming a statement
+STATEMENT_BATCH_SIZE = 200
+
+def get_all_clients(updated_since=None, ids=None):
     """
     Retrieve all clients.
+    :param updated_since: Only return the clients changed at or after this datetime (optional).
+    :param ids: Only return the clients with these IDs, in this order (optional, one IN query).
     :return: list: A list of dictionaries containing information about all clients.
     """
-    try:
-        clients = Client.query.all()  # Retrieve all clients from the database
-        return [
-            {
-                "client_id": client.client_id,
-                "name": client.name,
-                "email": client.email,
-                "phone": client.phone,
-                "address": client.address,
-                "created_at": client.created_at,
-            }
-            for client in clients
-        ]
-    except Exception as e:
-        logger.error(f"Error fetching all clients: {e}")
-        return {"error": "Internal Server Error"}
-
-def get_client(client_id):
-    """
-    Retrieve a client by ID.
-    :param client_id: The ID of the client to retrieve.
-    :return: dict: A dictionary containing the client's information or an error message.
-    """
-    try:
-        client = Client.query.get(client_id)
-        if not client:
-            return None
-        return {
+    query = Client.query
+    if updated_since:
+        query = query.filter(changed_since(Client, updated_since))
+    if ids is not None:
+        query = query.filter(Client.client_id.in_(ids))
+    clients = query.all()  # Retrieve all clients from the database
+    if ids is not None:
+        clients = in_id_order(clients, ids)
+    return [
+        {
             "client_id": client.client_id,
             "name": client.name,
             "email": client.email,
             "phone": client.phone,
             "address": client.address,
             "created_at": client.created_at,
+            "updated_at": client.updated_at,
+            "version": client.version,
         }
-    except Exception as e:
-        logger.error(f"Error fetching client {client_id}: {e}")
-        return {"error": "Internal Server Error"}
+        for client in clients
+    ]
+
+def get_client(client_id):
+    """
+    Retrieve a client by ID.
+    :param client_id: The ID of the client to retrieve.
+    :return: dict: A dictionary containing the client's information or None if not found.
+    """
+    client = Client.query.get(client_id)
+    if not client:
+        return None
+    return {
+        "client_id": client.client_id,
+        "name": client.name,
+        "email": client.email,
+        "phone": client.phone,
+        "address": client.address,
+        "created_at": client.created_at,
+        "updated_at": client.updated_at,
+        "version": client.version,
+    }
 
 def create_client(name, email, phone, address):
     """
@@ -60,74 +76,169 @@ def create_client(name, email, phone, address):
     try:
         client = Client(name=name, email=email, phone=phone, address=address)
         db.session.add(client)  # Save the new client to the database
-        db.session.commit() # Save the new client to the database
-        return {
+        db.session.flush()  # Assign the client ID before recording the change
+        data = {
             "client_id": client.client_id,
             "name": client.name,
             "email": client.email,
             "phone": client.phone,
             "address": client.address,
             "created_at": client.created_at,
+            "updated_at": client.updated_at,
+            "version": client.version,
         }
+        record_change('client', client.client_id, 'create', data)
+        commit() # Save the new client to the database
+        return data
     except Exception as e:
-        logger.error(f"Error creating client: {e}")
-        return {"error": "Internal Server Error"}
+        rollback()
+        logger.error("Error creating client: %s", e)
+        raise
 
 
-def update_client(client_id, name, email, phone, address):
+def update_client(client_id, name, email, phone, address, version=None):
     """
-    Update an existing client.
+    Update an existing client with a single UPDATE ... RETURNING.
     :param client_id: The ID of the client to update.
     :param name: The new name of the client.
     :param email: The new email of the client.
     :param phone: The new phone number of the client.
     :param address: The new address of the client.
-    :return: tuple: A dictionary containing the updated client's information or an error message and the HTTP status code.
+    :param version: Version the client must still have (If-Match), or None.
+    :return: dict: The updated client's information, or None if the client does not exist.
     """
     try:
-        # Find the client by ID
-        client = Client.query.get(client_id)
-
-        if not client:
+        # Only the fields with a new value are updated (they can be optional)
+        values = {
+            column: value
+            for column, value in (("name", name), ("email", email), ("phone", phone), ("address", address))
+            if value
+        }
+        data = update_row(Client, client_id, values, version=version)
+        if data is None:
             return None
-
-        # Update the fields if new values are provided (they can be optional)
-        client.name = name if name else client.name
-        client.email = email if email else client.email
-        client.phone = phone if phone else client.phone
-        client.address = address if address else client.address
-
+        record_change('client', client_id, 'update', data)
         # Commit the changes to the database
-        db.session.commit()
+        commit()
         # Return updated client information
-        return {
-            "client_id": client.client_id,
-            "name": client.name,
-            "email": client.email,
-            "phone": client.phone,
-            "address": client.address,
-            "created_at": client.created_at,
-        }
+        return data
     except Exception as e:
         # If an error occurs, rollback the transaction
-        db.session.rollback()
-        logger.error(f"Error updating client {client_id}: {e}")
-        return {"error": "Internal Server Error"}
-def delete_client(client_id):
+        rollback()
+        logger.error("Error updating client %s: %s", client_id, e)
+        raise
+
+def patch_client(client_id, changes, version=None):
+    """
+    Partially update a client with a single UPDATE ... RETURNING of the supplied columns only.
+    :param client_id: The ID of the client to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the client must still have (If-Match), or None.
+    :return: dict: The updated client's information, or None if the client does not exist.
     """
-    Delete a client.
+    try:
+        data = update_row(Client, client_id, changes, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('client', client_id, 'update', data)
+        commit()
+        return data
+    except Exception as e:
+        rollback()
+        logger.error("Error patching client %s: %s", client_id, e)
+        raise
+
+def delete_client(client_id, version=None):
+    """
+    Delete a client with a single DELETE.
+    Its vehicles (with their works and tasks) and invoices are removed by the
+    database (ON DELETE CASCADE) and logged by the delete triggers. The
+    invoice items of its tasks are deleted first so that the totals of the
+    invoices they belonged to are recomputed.
     :param client_id: The ID of the client to delete.
-    :return: tuple: A message confirming deletion or an error message and the HTTP status code.
+    :param version: Version the client must still have (If-Match), or None.
+    :return: bool: True if the client was deleted, None if it does not exist.
     """
     try:
-        client = Client.query.get(client_id)
-        if not client:
+        delete_task_items(
+            select(Task.task_id)
+            .join(Work, Work.work_id == Task.work_id)
+            .join(Vehicle, Vehicle.vehicle_id == Work.vehicle_id)
+            .where(Vehicle.client_id == client_id)
+        )
+        if delete_row(Client, client_id, version=version) is None:
             return None
-        # Delete the client
-        db.session.delete(client)
+        notify_changes('client')
         # Commit the deletion
-        db.session.commit()
-        return client
+        commit()
+        return True
     except Exception as e:
-        logger.error(f"Error deleting client {client_id}: {e}")
-        return {"error": "Internal Server Error"}
\ No newline at end of file
+        rollback()
+        logger.error("Error deleting client %s: %s", client_id, e)
+        raise
+
+
+def iter_client_statement(client_id, start=None, end=None):
+    """
+    Yield the invoices of a client issued in [start, end), oldest first, with their items.
+    A single query joins the invoices and their items; the running totals are
+    computed by the database with window functions over the invoices (before
+    the join, so invoices with several items are counted once). Rows are read
+    as they are consumed, so long statements are never held in memory.
+    :param client_id: The ID of the client.
+    :param start: Optional start of the period (naive datetime, inclusive).
+    :param end: Optional end of the period (naive datetime, exclusive).
+    :return: generator: Invoice dictionaries with their items and running totals.
+    """
+    conditions = [Invoice.client_id == client_id]
+    if start is not None:
+        conditions.append(Invoice.issued_at >= start)
+    if end is not None:
+        conditions.append(Invoice.issued_at < end)
+    # Served by the (client_id, issued_at) index, in the order of the window
+    order = (Invoice.issued_at, Invoice.invoice_id)
+    invoices = (
+        select(
+            Invoice.invoice_id,
+            Invoice.issued_at,
+            Invoice.total,
+            Invoice.iva,
+            Invoice.total_with_iva,
+            func.sum(Invoice.total).over(order_by=order, rows=(None, 0)).label('running_total'),
+            func.sum(Invoice.total_with_iva).over(order_by=order, rows=(None, 0)).label('running_total_with_iva'),
+        )
+        .where(*conditions)
+        .cte('statement_invoices')
+    )
+    query = (
+        select(invoices, InvoiceItem.item_id, InvoiceItem.description, InvoiceItem.cost, InvoiceItem.task_id)
+        .outerjoin(InvoiceItem, InvoiceItem.invoice_id == invoices.c.invoice_id)
+        .order_by(invoices.c.issued_at, invoices.c.invoice_id, InvoiceItem.item_id)
+        .execution_options(yield_per=STATEMENT_BATCH_SIZE)
+    )
+
+    invoice = None
+    for row in db.session.execute(query):
+        if invoice is None or invoice['invoice_id'] != row.invoice_id:
+            if invoice is not None:
+                yield invoice
+            invoice = {
+                "invoice_id": row.invoice_id,
+                "issued_at": row.issued_at,
+                "total": row.total,
+                "iva": row.iva,
+                "total_with_iva": row.total_with_iva,
+                "running_total": row.running_total,
+                "running_total_with_iva": row.running_total_with_iva,
+                "items": [],
+            }
+        if row.item_id is not None:  # Invoices without items come with NULL item columns
+            invoice["items"].append({
+                "item_id": row.item_id,
+                "description": row.description,
+                "cost": row.cost,
+                "task_id": row.task_id,
+            })
+    if invoice is not None:
+        yield invoice
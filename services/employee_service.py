@@ -1,21 +1,40 @@
 import logging
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import and_, case, func, select
 from models.employee import Employee
-from utils.database import db
+from models.task import Task
+from utils.cache import TTLCache
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
+from utils.events import notify_changes, record_change
+from utils.schedule import schedule
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-def get_all_employees():
+
+class EmployeeHasTasks(Exception):
+    """
+    Raised when deleting an employee who still has tasks assigned.
+    """
+
+
+def get_all_employees(updated_since=None, ids=None):
     """
     Retrieve all employees.
+    :param updated_since: Only return the employees changed at or after this datetime (optional).
+    :param ids: Only return the employees with these IDs, in this order (optional, one IN query).
     :return: dict: A list of dictionaries containing employee information.
     """
-    try:
-        employees = Employee.query.all()
-        return [{"employee_id": employee.employee_id, "name": employee.name, "email": employee.email, "phone": employee.phone, "role": employee.role, "hired_date": employee.hired_date, "created_at": employee.created_at} for employee in employees]
-    except Exception as e:
-        logger.error(f"Error fetching all employees: {e}")
-        return {"error": "Internal Server Error"}
+    query = Employee.query
+    if updated_since:
+        query = query.filter(changed_since(Employee, updated_since))
+    if ids is not None:
+        query = query.filter(Employee.employee_id.in_(ids))
+    employees = query.all()
+    if ids is not None:
+        employees = in_id_order(employees, ids)
+    return [{"employee_id": employee.employee_id, "name": employee.name, "email": employee.email, "phone": employee.phone, "role": employee.role, "hired_date": employee.hired_date, "created_at": employee.created_at, "updated_at": employee.updated_at, "version": employee.version} for employee in employees]
 
 def get_employee(employee_id):
     """
@@ -23,24 +42,22 @@ def get_employee(employee_id):
     :param employee_id: The ID of the employee to retrieve.
     :return: dict: A dictionary containing the employee's information or None if not found.
     """
-    try:
-        # Query the database for the employee by ID
-        employee = Employee.query.get(employee_id)
-        if not employee:
-            return None  # Return None if the employee is not found
-        # Return employee data as a dictionary
-        return {
-            "employee_id": employee.employee_id,
-            "name": employee.name,
-            "email": employee.email,
-            "phone": employee.phone,
-            "role": employee.role,
-            "hired_date": employee.hired_date,
-            "created_at": employee.created_at,
-        }
-    except Exception as e:
-        logger.error(f"Error fetching employee {employee_id}: {e}")
-        raise  # Raise the exception to let the API layer handle it
+    # Query the database for the employee by ID
+    employee = Employee.query.get(employee_id)
+    if not employee:
+        return None  # Return None if the employee is not found
+    # Return employee data as a dictionary
+    return {
+        "employee_id": employee.employee_id,
+        "name": employee.name,
+        "email": employee.email,
+        "phone": employee.phone,
+        "role": employee.role,
+        "hired_date": employee.hired_date,
+        "created_at": employee.created_at,
+        "updated_at": employee.updated_at,
+        "version": employee.version,
+    }
 
 def create_employee(name, email, phone, role, hired_date):
     """
@@ -57,46 +74,116 @@ def create_employee(name, email, phone, role, hired_date):
         hired_date_obj = datetime.strptime(hired_date, "%Y-%m-%d").date()
         employee = Employee(name=name, email=email, phone=phone, role=role, hired_date=hired_date_obj)
         db.session.add(employee)  # Save the new employee to the database
-        db.session.commit()
-        return {"employee_id": employee.employee_id, "name": employee.name, "email": employee.email, "phone": employee.phone, "role": employee.role, "hired_date": employee.hired_date, "created_at": employee.created_at}
+        db.session.flush()  # Assign the employee ID before recording the change
+        data = {"employee_id": employee.employee_id, "name": employee.name, "email": employee.email, "phone": employee.phone, "role": employee.role, "hired_date": employee.hired_date, "created_at": employee.created_at, "updated_at": employee.updated_at, "version": employee.version}
+        record_change('employee', employee.employee_id, 'create', data)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error creating employee: {e}")
-        return {"error": "Internal Server Error"}
+        rollback()
+        logger.error("Error creating employee: %s", e)
+        raise
 
 
 from datetime import datetime
 
 
-def update_employee(employee_id, name, email, phone, role, hired_date):
+def update_employee(employee_id, name, email, phone, role, hired_date, version=None):
     """
-    Update an existing employee.
+    Update an existing employee with a single UPDATE ... RETURNING.
     :param employee_id: The ID of the employee to update.
     :param name: The new name of the employee.
     :param email: The new email of the employee.
     :param phone: The new phone number of the employee.
     :param role: The new role of the employee (mechanic, manager, admin).
     :param hired_date: The new hired date of the employee.
-    :return: tuple: A dictionary containing the updated employee's information or an error message and the HTTP status code.
+    :param version: Version the employee must still have (If-Match), or None.
+    :return: dict: The updated employee's information, or None if the employee does not exist.
     """
     try:
         # Convert hired_date string to datetime.date object
         hired_date_obj = datetime.strptime(hired_date, "%Y-%m-%d").date()
 
-        # Get the employee from the database
-        employee = Employee.query.get(employee_id)
-        if not employee:
-            return {"error": f"Employee with ID {employee_id} not found."}, 404
-
         # Update the employee's attributes
-        employee.name = name
-        employee.email = email
-        employee.phone = phone
-        employee.role = role
-        employee.hired_date = hired_date_obj  # Update hired date
+        data = update_row(Employee, employee_id, {
+            "name": name,
+            "email": email,
+            "phone": phone,
+            "role": role,
+            "hired_date": hired_date_obj,
+        }, version=version)
+        if data is None:
+            return None
+        record_change('employee', employee_id, 'update', data)
+        commit()  # Commit the transaction
 
-        db.session.commit()  # Commit the transaction
+        return data
 
-        return {
+    except Exception as e:
+        rollback()  # Rollback on error
+        logger.error("Error updating employee %s: %s", employee_id, e)
+        raise
+
+def patch_employee(employee_id, changes, version=None):
+    """
+    Partially update a employee with a single UPDATE ... RETURNING of the supplied columns only.
+    :param employee_id: The ID of the employee to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the employee must still have (If-Match), or None.
+    :return: dict: The updated employee's information, or None if the employee does not exist.
+    """
+    try:
+        data = update_row(Employee, employee_id, changes, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('employee', employee_id, 'update', data)
+        commit()
+        return data
+    except Exception as e:
+        rollback()
+        logger.error("Error patching employee %s: %s", employee_id, e)
+        raise
+
+def delete_employee(employee_id, version=None):
+    """
+    Delete an employee with a single DELETE.
+    Employees who still have tasks cannot be deleted: task.employee_id is
+    required, so their tasks must be reassigned or deleted first.
+    :param employee_id: The ID of the employee to delete.
+    :param version: Version the employee must still have (If-Match), or None.
+    :return: bool: True if the employee was deleted, None if it does not exist.
+    :raises EmployeeHasTasks: If tasks are still assigned to the employee.
+    """
+    # Served by ix_task_employee_schedule
+    if db.session.scalar(select(Task.task_id).where(Task.employee_id == employee_id).limit(1)) is not None:
+        raise EmployeeHasTasks(f"Employee with ID {employee_id} still has tasks: reassign or delete them first.")
+    try:
+        if delete_row(Employee, employee_id, version=version) is None:
+            return None
+        notify_changes('employee')
+        commit()
+        return True
+    except Exception as e:
+        rollback()
+        logger.error("Error deleting employee %s: %s", employee_id, e)
+        raise
+
+def get_available_employees(start, end, role=None):
+    """
+    Retrieve the employees without any task overlapping a time window.
+    :param start: Start of the window (naive datetime).
+    :param end: End of the window (naive datetime).
+    :param role: Optional role to filter on (e.g. 'mechanic').
+    :return: list: Dictionaries of the available employees, ordered by ID.
+    """
+    query = Employee.query
+    if role:
+        query = query.filter(Employee.role == role)
+    employees = query.order_by(Employee.employee_id).all()
+    busy = schedule.busy_employees([employee.employee_id for employee in employees], start, end)
+    return [
+        {
             "employee_id": employee.employee_id,
             "name": employee.name,
             "email": employee.email,
@@ -104,26 +191,78 @@ def update_employee(employee_id, name, email, phone, role, hired_date):
             "role": employee.role,
             "hired_date": employee.hired_date,
             "created_at": employee.created_at,
+            "updated_at": employee.updated_at,
+            "version": employee.version,
         }
+        for employee in employees if employee.employee_id not in busy
+    ]
+
+# Workloads are aggregated over all tasks; recomputed at most every WORKLOAD_CACHE_TTL seconds
+workload_cache = TTLCache()
+
+# Task states counted as open work
+OPEN_STATUSES = ('pending', 'in_progress')
 
-    except Exception as e:
-        db.session.rollback()  # Rollback on error
-        logger.error(f"Error updating employee {employee_id}: {e}")
-        return {"error": "Internal Server Error"}, 500
 
-def delete_employee(employee_id):
+def _workload_query(week_start):
     """
-    Delete an employee.
-    :param employee_id: The ID of the employee to delete.
-    :return: dict: A dictionary containing the deleted employee's information.
+    Build the aggregate query of the employees' workloads (one row per employee).
+    Durations use the same conventions as the schedule: an end date at
+    midnight covers that whole day.
+    :param week_start: Monday 00:00 of the week counted in completed_this_week.
     """
-    try:
-        employee = Employee.query.get(employee_id)
-        if not employee:
-            return None
-        employee.delete()  # Delete the employee from the database
-        return employee
-    except Exception as e:
-        logger.error(f"Error deleting employee {employee_id}: {e}")
-        return {"error": "Internal Server Error"}, 500
+    task_end = func.julianday(Task.end_date) + case((func.time(Task.end_date) == '00:00:00', 1), else_=0)
+    duration_hours = (task_end - func.julianday(Task.start_date)) * 24
+    completed_day = func.date(func.coalesce(Task.end_date, Task.start_date))
+    return (
+        select(
+            Employee.employee_id,
+            Employee.name,
+            Employee.role,
+            func.count(case((Task.status.in_(OPEN_STATUSES), 1))).label('open_tasks'),
+            func.count(case((and_(
+                Task.status == 'completed',
+                completed_day >= week_start.date().isoformat(),
+                completed_day < (week_start + timedelta(days=7)).date().isoformat(),
+            ), 1))).label('completed_this_week'),
+            func.avg(case((and_(Task.end_date.isnot(None), Task.status != 'cancelled'), duration_hours))).label('avg_task_hours'),
+        )
+        .outerjoin(Task, Task.employee_id == Employee.employee_id)
+        .group_by(Employee.employee_id)
+        .order_by(Employee.employee_id)
+    )
+
+
+def get_employee_workloads(employee_id=None, role=None):
+    """
+    Retrieve the workload of the employees: open tasks, tasks completed this
+    week and average task duration, aggregated in a single query.
+    Results are cached for WORKLOAD_CACHE_TTL seconds.
+    :param employee_id: Optional ID of a single employee.
+    :param role: Optional role to filter on.
+    :return: list: Workload dictionaries ordered by employee ID.
+    """
+    week_start = schedule.current_week()
+
+    def compute():
+        query = _workload_query(week_start)
+        if employee_id is not None:
+            query = query.where(Employee.employee_id == employee_id)
+        if role:
+            query = query.where(Employee.role == role)
+        return [
+            {
+                "employee_id": row.employee_id,
+                "name": row.name,
+                "role": row.role,
+                "open_tasks": row.open_tasks,
+                "completed_this_week": row.completed_this_week,
+                "avg_task_hours": round(row.avg_task_hours, 2) if row.avg_task_hours is not None else None,
+                "week_start": week_start.date(),
+            }
+            for row in db.session.execute(query)
+        ]
 
+    return workload_cache.get_or_compute(
+        ('workload', employee_id, role, week_start), compute, current_app.config['WORKLOAD_CACHE_TTL']
+    )
@@ -0,0 +1,417 @@
+"""
+Read-only GraphQL schema over the models.
+
+Object types are generated from the model columns; the relations between
+them are resolved by per-request batch loaders (see BatchLoader), so a query
+costs one SQL statement per relation level rather than one per row.
+Queries are limited in depth and estimated cost before they run, and parsed
+documents are kept by SHA-256 hash for persisted queries.
+
+Requires graphql-core (optional dependency, see GRAPHQL_ENABLED).
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+
+from graphql import (
+    FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLArgument, GraphQLError, GraphQLField,
+    GraphQLInt, GraphQLList, GraphQLNonNull, GraphQLObjectType, GraphQLScalarType, GraphQLSchema, GraphQLString,
+    OperationDefinitionNode, execute, get_named_type, get_nullable_type, parse, validate,
+)
+from graphql.execution.values import get_argument_values
+from sqlalchemy import Date, DateTime, Integer, distinct, func, select
+
+from models.client import Client
+from models.employee import Employee
+from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+from models.setting import Setting
+from models.task import Task
+from models.vehicle import Vehicle
+from models.work import Work
+from utils.cache import TTLCache
+from utils.database import changed_since, db, in_id_order
+from utils.money import Money, Rate
+from utils.utils import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Assumed number of rows of a root list field (without ids) when estimating the cost of a query
+LIST_SIZE_ESTIMATE = 10
+
+# Scalars for the column types without a GraphQL equivalent
+DateScalar = GraphQLScalarType('Date', description='ISO 8601 date', serialize=lambda value: value.isoformat())
+DateTimeScalar = GraphQLScalarType('DateTime', description='ISO 8601 date-time', serialize=lambda value: value.isoformat())
+MoneyScalar = GraphQLScalarType('Money', description='Amount in euros', serialize=float)
+RateScalar = GraphQLScalarType('Rate', description='Tax rate as a fraction (e.g. 0.23)', serialize=float)
+
+SCALARS = {Integer: GraphQLInt, Date: DateScalar, DateTime: DateTimeScalar, Money: MoneyScalar, Rate: RateScalar}
+
+
+class Relation:
+    """
+    Link from the rows of a model to the related rows of another model:
+    the children whose child_key equals the parent's parent_key.
+    """
+
+    def __init__(self, parent, name, child, parent_key, child_key, many):
+        """
+        :param parent: Model owning the field (e.g. Vehicle).
+        :param name: Name of the GraphQL field (e.g. 'works').
+        :param child: Related model (e.g. Work).
+        :param parent_key: Column of the parent matched (e.g. 'vehicle_id').
+        :param child_key: Column of the child matched (e.g. 'vehicle_id').
+        :param many: True for a list of children, False for a single row (or null).
+        """
+        self.parent = parent
+        self.name = name
+        self.child = child
+        self.parent_key = parent_key
+        self.child_key = child_key
+        self.many = many
+
+
+RELATIONS = [
+    Relation(Client, 'vehicles', Vehicle, 'client_id', 'client_id', many=True),
+    Relation(Client, 'invoices', Invoice, 'client_id', 'client_id', many=True),
+    Relation(Vehicle, 'client', Client, 'client_id', 'client_id', many=False),
+    Relation(Vehicle, 'works', Work, 'vehicle_id', 'vehicle_id', many=True),
+    Relation(Work, 'vehicle', Vehicle, 'vehicle_id', 'vehicle_id', many=False),
+    Relation(Work, 'tasks', Task, 'work_id', 'work_id', many=True),
+    Relation(Task, 'work', Work, 'work_id', 'work_id', many=False),
+    Relation(Task, 'employee', Employee, 'employee_id', 'employee_id', many=False),
+    Relation(Task, 'invoice_items', InvoiceItem, 'task_id', 'task_id', many=True),
+    Relation(Employee, 'tasks', Task, 'employee_id', 'employee_id', many=True),
+    Relation(Invoice, 'client', Client, 'client_id', 'client_id', many=False),
+    Relation(Invoice, 'items', InvoiceItem, 'invoice_id', 'invoice_id', many=True),
+    Relation(InvoiceItem, 'invoice', Invoice, 'invoice_id', 'invoice_id', many=False),
+    Relation(InvoiceItem, 'task', Task, 'task_id', 'task_id', many=False),
+]
+
+# Relation of each field of an object type: (type name, field name) -> Relation
+RELATION_FIELDS = {(relation.parent.__name__, relation.name): relation for relation in RELATIONS}
+
+# Root list fields: (field name, model)
+ROOTS = [
+    ('clients', Client), ('employees', Employee), ('invoices', Invoice), ('invoice_items', InvoiceItem),
+    ('settings', Setting), ('tasks', Task), ('vehicles', Vehicle), ('works', Work),
+]
+
+
+def selection_level(path):
+    """
+    Level of a field in the response: its path without the list indices
+    (e.g. ('vehicle', 'works', 'tasks') for vehicle.works[0].tasks).
+    :param path: graphql Path of the field (info.path).
+    :return: tuple
+    """
+    return tuple(key for key in path.as_list() if isinstance(key, str))
+
+
+class BatchLoader:
+    """
+    Per-request loader of the relations (the context of a GraphQL execution).
+
+    The rows returned by the query are recorded by selection level (see
+    selection_level). The first time a relation is resolved for a row, it is
+    loaded for all the rows of the same level with one WHERE <key> IN (...)
+    query, so sibling rows are served from the results instead of querying
+    again, while rows selected elsewhere in the query are not loaded with them.
+    """
+
+    def __init__(self):
+        self.rows = defaultdict(list)  # level -> rows returned at that level
+        self.results = defaultdict(dict)  # level -> {parent key: child row or list of rows}
+
+    def add(self, level, rows):
+        """
+        Record the rows returned at a level and return them.
+        """
+        self.rows[level].extend(rows)
+        return rows
+
+    def load(self, relation, parent, path):
+        """
+        :param relation: Relation to resolve.
+        :param parent: Row of relation.parent.
+        :param path: Path of the relation field (info.path).
+        :return: The related row (or None), or the list of related rows.
+        """
+        level = selection_level(path)
+        key = getattr(parent, relation.parent_key)
+        results = self.results[level]
+        if key not in results:
+            keys = {getattr(row, relation.parent_key) for row in self.rows[level[:-1]]}
+            keys = [k for k in keys | {key} if k is not None and k not in results]
+            column = getattr(relation.child, relation.child_key)
+            pk = relation.child.__mapper__.primary_key[0]
+            children = self.add(level, db.session.scalars(
+                select(relation.child).where(column.in_(keys)).order_by(pk)
+            ).all())
+            grouped = defaultdict(list)
+            for child in children:
+                grouped[getattr(child, relation.child_key)].append(child)
+            for k in keys:
+                results[k] = grouped.get(k, []) if relation.many else next(iter(grouped.get(k, [])), None)
+        return results.get(key, [] if relation.many else None)
+
+    def get(self, model, row_id, path):
+        """
+        :return: The row of a model with the given primary key, or None.
+        """
+        row = db.session.get(model, row_id)
+        return None if row is None else self.add(selection_level(path), [row])[0]
+
+    def all(self, model, path, ids=None, updated_since=None):
+        """
+        :return: list: The rows of a model, optionally filtered by IDs (in their order) or by change date.
+        """
+        pk = model.__mapper__.primary_key[0]
+        query = select(model).order_by(pk)
+        if ids is not None:
+            query = query.where(pk.in_(ids))
+        if updated_since is not None:
+            query = query.where(changed_since(model, updated_since))
+        rows = db.session.scalars(query).all()
+        return self.add(selection_level(path), in_id_order(rows, ids) if ids is not None else rows)
+
+
+def _column_fields(model):
+    """
+    GraphQL fields of the columns of a model (resolved from the row attributes).
+    """
+    fields = {}
+    for column in model.__table__.columns:
+        field_type = SCALARS.get(type(column.type), GraphQLString)
+        if column.primary_key:  # Older rows may hold NULLs the model no longer allows
+            field_type = GraphQLNonNull(field_type)
+        fields[column.name] = GraphQLField(field_type, description=column.comment)
+    return fields
+
+
+def _relation_field(relation, types):
+    """
+    GraphQL field resolving a relation through the request's BatchLoader.
+    """
+    child_type = types[relation.child]
+    field_type = GraphQLNonNull(GraphQLList(GraphQLNonNull(child_type))) if relation.many else child_type
+    return GraphQLField(field_type, resolve=lambda parent, info: info.context.load(relation, parent, info.path))
+
+
+def _root_fields(types):
+    """
+    Query fields: one row by ID and a list of rows per model.
+    """
+    def resolve_one(model):
+        return lambda root, info, id: info.context.get(model, id, info.path)
+
+    def resolve_all(model):
+        def resolve(root, info, ids=None, updated_since=None):
+            if updated_since is not None:
+                try:
+                    updated_since = parse_datetime(updated_since)
+                except ValueError:
+                    raise GraphQLError("updated_since must be an ISO 8601 date-time.")
+            return info.context.all(model, info.path, ids, updated_since)
+        return resolve
+
+    fields = {}
+    for name, model in ROOTS:
+        object_type = types[model]
+        fields[name] = GraphQLField(
+            GraphQLNonNull(GraphQLList(GraphQLNonNull(object_type))),
+            args={
+                'ids': GraphQLArgument(GraphQLList(GraphQLNonNull(GraphQLInt)), description='Only these IDs, in this order'),
+                'updated_since': GraphQLArgument(GraphQLString, description='Only rows changed at or after this ISO 8601 date-time'),
+            },
+            resolve=resolve_all(model),
+        )
+        fields[name[:-1]] = GraphQLField(
+            object_type, args={'id': GraphQLArgument(GraphQLNonNull(GraphQLInt))}, resolve=resolve_one(model),
+        )
+    return fields
+
+
+def build_schema():
+    """
+    :return: GraphQLSchema: Read-only schema over the models and their relations.
+    """
+    types = {}
+    for _, model in ROOTS:
+        relations = [relation for relation in RELATIONS if relation.parent is model]
+        types[model] = GraphQLObjectType(
+            model.__name__,
+            # Thunk: the related types are created in this same loop
+            lambda model=model, relations=relations: {
+                **_column_fields(model),
+                **{relation.name: _relation_field(relation, types) for relation in relations},
+            },
+        )
+    return GraphQLSchema(query=GraphQLObjectType('Query', lambda: _root_fields(types)))
+
+
+schema = build_schema()
+
+
+# Average list sizes of the relations, measured at most every GRAPHQL_LIST_SIZE_TTL seconds
+list_sizes_cache = TTLCache()
+
+
+def relation_list_sizes():
+    """
+    Average number of children per parent of every list relation (e.g. the
+    tasks of a work), rounded up, measured on the data in one query.
+    :return: dict: Relation -> int (at least 1).
+    """
+    relations = [relation for relation in RELATIONS if relation.many]
+    counts = []
+    for relation in relations:
+        column = getattr(relation.child, relation.child_key)
+        counts += [select(func.count(column)).scalar_subquery(), select(func.count(distinct(column))).scalar_subquery()]
+    row = db.session.execute(select(*counts)).one()
+    return {
+        relation: max(1, -(-children // parents) if parents else 1)  # Ceiling division
+        for relation, children, parents in zip(relations, row[::2], row[1::2])
+    }
+
+
+def measure(document, operation_name=None, variables=None, list_sizes=None):
+    """
+    Depth and estimated cost of the operation to run. Every field costs 1; the
+    fields below a list are counted once per row the list is expected to hold:
+    the average size of the relation (see relation_list_sizes), the number of
+    ids of a root list, or LIST_SIZE_ESTIMATE for a root list without ids.
+    Introspection fields are not counted.
+    :param document: Validated DocumentNode.
+    :param operation_name: Name of the operation to run, if the document has several.
+    :param variables: Values of the query variables (for the ids arguments).
+    :param list_sizes: dict: Relation -> expected list size; LIST_SIZE_ESTIMATE for the missing ones.
+    :return: tuple: (depth, cost)
+    """
+    list_sizes = list_sizes or {}
+    fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    operation = next((o for o in operations if o.name and o.name.value == operation_name), operations[0])
+
+    def walk(selection_set, parent_type, depth):
+        max_depth, cost = depth, 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                if selection.name.value.startswith('__'):
+                    continue
+                field = parent_type.fields[selection.name.value]
+                field_type = get_nullable_type(field.type)
+                cost += 1
+                if selection.selection_set:
+                    child_depth, child_cost = walk(selection.selection_set, get_named_type(field_type), depth + 1)
+                    max_depth = max(max_depth, child_depth)
+                    if isinstance(field_type, GraphQLList):
+                        child_cost *= list_size(parent_type, selection, field)
+                    cost += child_cost
+            else:
+                if isinstance(selection, FragmentSpreadNode):
+                    selection = fragments[selection.name.value]
+                child_depth, child_cost = walk(selection.selection_set, parent_type, depth)
+                max_depth, cost = max(max_depth, child_depth), cost + child_cost
+        return max_depth, cost
+
+    def list_size(parent_type, selection, field):
+        relation = RELATION_FIELDS.get((parent_type.name, selection.name.value))
+        if relation is not None:
+            return list_sizes.get(relation, LIST_SIZE_ESTIMATE)
+        try:
+            ids = get_argument_values(field, selection, variables).get('ids')
+        except GraphQLError:
+            return LIST_SIZE_ESTIMATE  # Invalid variables: reported by execute()
+        return LIST_SIZE_ESTIMATE if ids is None else len(ids)
+
+    return walk(operation.selection_set, schema.query_type, 1)
+
+
+class PersistedQueryNotFound(Exception):
+    """
+    Raised when a persisted query hash is not known (the client must send the query with it).
+    """
+
+
+class DocumentCache:
+    """
+    Thread-safe LRU cache of parsed and validated documents, keyed by the
+    SHA-256 hash of the query text. It is also the store of the automatic
+    persisted queries: clients send the hash instead of the query once it
+    has been registered. Each worker process has its own copy.
+    """
+
+    def __init__(self, maxsize=500):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            document = self._documents.get(digest)
+            if document is not None:
+                self._documents.move_to_end(digest)
+            return document
+
+    def put(self, digest, document):
+        with self._lock:
+            self._documents[digest] = document
+            self._documents.move_to_end(digest)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+
+documents = DocumentCache()
+
+
+def load_document(query, persisted_hash=None):
+    """
+    Parse and validate a query, or fetch it from the document cache.
+    :param query: Query text, or None to run a persisted query by hash only.
+    :param persisted_hash: SHA-256 hex digest sent by the client for a persisted query.
+    :return: DocumentNode
+    :raises PersistedQueryNotFound: If only a hash is sent and it is not known.
+    :raises GraphQLError: If the query is invalid or does not match its hash.
+    """
+    if query is None:
+        document = documents.get(persisted_hash) if persisted_hash else None
+        if document is None:
+            raise PersistedQueryNotFound()
+        return document
+    digest = hashlib.sha256(query.encode('utf-8')).hexdigest()
+    if persisted_hash is not None and persisted_hash != digest:
+        raise GraphQLError("The persisted query hash does not match the query.")
+    document = documents.get(digest)
+    if document is None:
+        document = parse(query)
+        errors = validate(schema, document)
+        if errors:
+            raise errors[0]
+        documents.put(digest, document)
+    return document
+
+
+def run_query(document, variables=None, operation_name=None, max_depth=10, max_cost=10000, list_size_ttl=300):
+    """
+    Execute a validated query, after checking its depth and estimated cost.
+    :param document: DocumentNode returned by load_document().
+    :param variables: Values of the query variables.
+    :param operation_name: Operation to run, if the document has several.
+    :param max_depth: Maximum nesting depth of the fields.
+    :param max_cost: Maximum estimated cost (see measure()).
+    :param list_size_ttl: Seconds the measured list sizes of the relations are reused.
+    :return: dict: The GraphQL response ({"data": ..., "errors": [...]}).
+    """
+    list_sizes = list_sizes_cache.get_or_compute('list_sizes', relation_list_sizes, list_size_ttl)
+    depth, cost = measure(document, operation_name, variables, list_sizes)
+    if depth > max_depth:
+        return {"errors": [{"message": f"Query depth {depth} exceeds the maximum of {max_depth}."}]}
+    if cost > max_cost:
+        return {"errors": [{"message": f"Query cost {cost} exceeds the maximum of {max_cost}."}]}
+    result = execute(schema, document, variable_values=variables, operation_name=operation_name,
+                     context_value=BatchLoader())
+    if result.errors:
+        logger.info("GraphQL query failed: %s", result.errors[0].message)
+    return result.formatted
@@ -1,29 +1,40 @@
 import logging
-from utils.database import db
+from sqlalchemy import select
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
 from models.invoice_item import InvoiceItem
+from services.invoice_service import recalculate_invoice_totals
+from utils.events import notify_changes, record_change
+from utils.money import to_decimal
 
 logger = logging.getLogger(__name__)
 
-def get_all_invoice_items():
+def get_all_invoice_items(updated_since=None, ids=None):
     """
     Retrieve all invoice items.
+    :param updated_since: Only return the invoice items changed at or after this datetime (optional).
+    :param ids: Only return the invoice items with these IDs, in this order (optional, one IN query).
     :return: list: A list of dictionaries containing information about all invoice items.
     """
-    try:
-        items = InvoiceItem.query.all()
-        return [
-            {
-                "item_id": item.item_id,
-                "description": item.description,
-                "cost": item.cost,
-                "invoice_id": item.invoice_id,
-                "task_id": item.task_id,
-            }
-            for item in items
-        ]
-    except Exception as e:
-        logger.error(f"Error fetching all invoice items: {e}")
-        return {"error": "Internal Server Error"}
+    query = InvoiceItem.query
+    if updated_since:
+        query = query.filter(changed_since(InvoiceItem, updated_since))
+    if ids is not None:
+        query = query.filter(InvoiceItem.item_id.in_(ids))
+    items = query.all()
+    if ids is not None:
+        items = in_id_order(items, ids)
+    return [
+        {
+            "item_id": item.item_id,
+            "description": item.description,
+            "cost": item.cost,
+            "invoice_id": item.invoice_id,
+            "updated_at": item.updated_at,
+            "version": item.version,
+            "task_id": item.task_id,
+        }
+        for item in items
+    ]
 
 def get_invoice_item(item_id):
     """
@@ -31,82 +42,122 @@ def get_invoice_item(item_id):
     :param item_id: The ID of the invoice item to retrieve.
     :return: dict: A dictionary containing the invoice item's information or None if not found.
     """
-    try:
-        item = InvoiceItem.query.get(item_id)
-        if not item:
-            return None
-        return {
-            "item_id": item.item_id,
-            "description": item.description,
-            "cost": item.cost,
-            "invoice_id": item.invoice_id,
-            "task_id": item.task_id,
-        }
-    except Exception as e:
-        logger.error(f"Error fetching invoice item {item_id}: {e}")
-        return {"error": "Internal Server Error"}
+    item = InvoiceItem.query.get(item_id)
+    if not item:
+        return None
+    return {
+        "item_id": item.item_id,
+        "description": item.description,
+        "cost": item.cost,
+        "invoice_id": item.invoice_id,
+        "updated_at": item.updated_at,
+        "version": item.version,
+        "task_id": item.task_id,
+    }
 
 def create_invoice_item(description, cost, invoice_id, task_id):
     """
-    Create a new invoice item.
+    Create a new invoice item and update the totals of its invoice.
     :return: dict: A dictionary containing the newly created invoice item's information.
     """
     try:
-        item = InvoiceItem(description=description, cost=cost, invoice_id=invoice_id, task_id=task_id)
+        item = InvoiceItem(description=description, cost=to_decimal(cost), invoice_id=invoice_id, task_id=task_id)
         db.session.add(item)
-        db.session.commit()
-        return {
+        db.session.flush()  # Assign the item ID before recording the change
+        data = {
             "item_id": item.item_id,
             "description": item.description,
             "cost": item.cost,
             "invoice_id": item.invoice_id,
+            "updated_at": item.updated_at,
+            "version": item.version,
             "task_id": item.task_id,
         }
+        record_change('invoice_item', item.item_id, 'create', data)
+        recalculate_invoice_totals(item.invoice_id)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error creating invoice item: {e}")
-        db.session.rollback()
-        return {"error": "Internal Server Error"}
+        logger.error("Error creating invoice item: %s", e)
+        rollback()
+        raise
 
-def update_invoice_item(item_id, description, cost, invoice_id, task_id):
+def update_invoice_item(item_id, description, cost, invoice_id, task_id, version=None):
     """
-    Update an existing invoice item.
+    Update an existing invoice item with a single UPDATE ... RETURNING, and
+    the totals of its invoice (both invoices when it moved).
+    :param version: Version the invoice item must still have (If-Match), or None.
     :return: dict: The updated invoice item's information or None if not found.
     """
     try:
-        item = InvoiceItem.query.get(item_id)
-        if not item:
+        values = {}
+        if description:
+            values["description"] = description
+        if cost is not None:  # A zero cost is valid
+            values["cost"] = to_decimal(cost)
+        if task_id:
+            values["task_id"] = task_id
+        previous_invoice_id = None
+        if invoice_id:
+            values["invoice_id"] = invoice_id
+            # RETURNING only gives the new invoice: read the current one, whose totals change too if the item moves
+            previous_invoice_id = db.session.scalar(select(InvoiceItem.invoice_id).where(InvoiceItem.item_id == item_id))
+        data = update_row(InvoiceItem, item_id, values, version=version)
+        if data is None:
             return None
-        item.description = description if description else item.description
-        item.cost = cost if cost else item.cost
-        item.invoice_id = invoice_id if invoice_id else item.invoice_id
-        item.task_id = task_id if task_id else item.task_id
+        record_change('invoice_item', item_id, 'update', data)
+        recalculate_invoice_totals(previous_invoice_id, data["invoice_id"])
+        commit()
+        return data
+    except Exception as e:
+        logger.error("Error updating invoice item %s: %s", item_id, e)
+        rollback()
+        raise
 
-        db.session.commit()
-        return {
-            "item_id": item.item_id,
-            "description": item.description,
-            "cost": item.cost,
-            "invoice_id": item.invoice_id,
-            "task_id": item.task_id,
-        }
+def patch_invoice_item(item_id, changes, version=None):
+    """
+    Partially update an invoice item with a single UPDATE ... RETURNING of the
+    supplied columns only. The invoice totals (both invoices when it moved)
+    are recomputed when the cost or the invoice changes.
+    :param item_id: The ID of the invoice item to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the invoice item must still have (If-Match), or None.
+    :return: dict: The updated invoice item's information, or None if not found.
+    """
+    try:
+        previous_invoice_id = None
+        if "invoice_id" in changes:
+            # RETURNING only gives the new invoice: read the current one, whose totals change too if the item moves
+            previous_invoice_id = db.session.scalar(select(InvoiceItem.invoice_id).where(InvoiceItem.item_id == item_id))
+        data = update_row(InvoiceItem, item_id, changes, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('invoice_item', item_id, 'update', data)
+        if changes.keys() & {"cost", "invoice_id"}:
+            recalculate_invoice_totals(previous_invoice_id, data["invoice_id"])
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error updating invoice item {item_id}: {e}")
-        db.session.rollback()
-        return {"error": "Internal Server Error"}
+        logger.error("Error patching invoice item %s: %s", item_id, e)
+        rollback()
+        raise
 
-def delete_invoice_item(item_id):
+def delete_invoice_item(item_id, version=None):
     """
-    Delete an invoice item.
-    :return: dict: The deleted invoice item's information or None if not found.
+    Delete an invoice item with a single DELETE ... RETURNING, and update the totals of its invoice.
+    :param version: Version the invoice item must still have (If-Match), or None.
+    :return: bool: True if the item was deleted, None if it does not exist.
     """
     try:
-        item = InvoiceItem.query.get(item_id)
-        if not item:
+        deleted = delete_row(InvoiceItem, item_id, InvoiceItem.invoice_id, version=version)
+        if deleted is None:
             return None
-        db.session.delete(item)
-        db.session.commit()
-        return item
+        notify_changes('invoice_item')
+        recalculate_invoice_totals(deleted.invoice_id)
+        commit()
+        return True
     except Exception as e:
-        logger.error(f"Error deleting invoice item {item_id}: {e}")
-        db.session.rollback()
-        return {"error": "Internal Server Error"}
+        logger.error("Error deleting invoice item %s: %s", item_id, e)
+        rollback()
+        raise
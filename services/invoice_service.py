@@ -1,124 +1,276 @@
 import logging
-from utils.database import db
+from datetime import datetime
+from sqlalchemy import Integer, case, delete, func, select, type_coerce
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
 from models.invoice import Invoice
+from models.invoice_item import InvoiceItem
+from models.setting import Setting
+from utils.events import notify_changes, record_change
+from utils.money import add_iva, check_rate, parse_rate
+from utils.utils import parse_datetime
 
 logger = logging.getLogger(__name__)
 
-def get_all_invoices():
+# Setting holding the IVA rate applied to new invoices (e.g. '0,23')
+IVA_SETTING = 'iva'
+
+
+def get_iva_rate():
     """
-    Retrieve all invoices.
-    :return: list: A list of dictionaries containing information about all invoices.
+    Read the current IVA rate from the settings.
+    :return: Decimal: The rate as a fraction (e.g. Decimal('0.23')).
+    :raises LookupError: If the setting does not exist.
     """
-    try:
-        invoices = Invoice.query.all()
-        return [
-            {
-                "invoice_id": invoice.invoice_id,
-                "client_id": invoice.client_id,
-                "issued_at": invoice.issued_at,
-                "iva": invoice.iva,
-                "total": invoice.total,
-                "total_with_iva": invoice.total_with_iva,
-            }
-            for invoice in invoices
-        ]
-    except Exception as e:
-        logger.error(f"Error fetching all invoices: {e}")
-        return {"error": "Internal Server Error"}
+    value = db.session.scalar(select(Setting.value).where(Setting.key_name == IVA_SETTING))
+    if value is None:
+        raise LookupError(f"Setting '{IVA_SETTING}' is not defined")
+    return parse_rate(value)
 
-def get_invoice(invoice_id):
+
+def recalculate_invoice_totals(*invoice_ids):
     """
-    Retrieve an invoice by ID.
-    :param invoice_id: The ID of the invoice to retrieve.
-    :return: dict: A dictionary containing the invoice information or None if not found.
+    Recompute total and total_with_iva of invoices from their items, in the current transaction.
+    The item costs are summed by the database over integer cents, in the same
+    query that loads the invoices; IVA is then applied once per invoice with
+    Decimal arithmetic, so totals are exact and never re-rounded.
+    The change of every recomputed invoice is recorded.
+    :param invoice_ids: IDs of the invoices whose items or rate changed.
+    :return: dict: invoice_id -> updated invoice information.
     """
-    try:
-        invoice = Invoice.query.get(invoice_id)
-        if not invoice:
-            return None
-        return {
+    invoice_ids = {invoice_id for invoice_id in invoice_ids if invoice_id is not None}
+    if not invoice_ids:
+        return {}
+    items_total = (
+        select(func.coalesce(func.sum(InvoiceItem.cost), 0))
+        .where(InvoiceItem.invoice_id == Invoice.invoice_id)
+        .scalar_subquery()
+    )
+    updated = {}
+    # Invoices already in the session keep their pending changes (e.g. a new IVA rate)
+    invoices = []
+    for invoice, total in db.session.execute(select(Invoice, items_total).where(Invoice.invoice_id.in_(invoice_ids))):
+        invoice.total = total
+        invoice.total_with_iva = add_iva(invoice.total, invoice.iva)
+        invoices.append(invoice)
+    db.session.flush()  # Write the changed totals, which bumps and returns their versions
+    for invoice in invoices:
+        data = {
             "invoice_id": invoice.invoice_id,
             "client_id": invoice.client_id,
             "issued_at": invoice.issued_at,
             "iva": invoice.iva,
             "total": invoice.total,
             "total_with_iva": invoice.total_with_iva,
+            "updated_at": invoice.updated_at,
+            "version": invoice.version,
         }
-    except Exception as e:
-        logger.error(f"Error fetching invoice {invoice_id}: {e}")
-        return {"error": "Internal Server Error"}
+        record_change('invoice', invoice.invoice_id, 'update', data)
+        updated[invoice.invoice_id] = data
+    return updated
+
+
+def totals_values(rate):
+    """
+    Values of total and total_with_iva for an UPDATE that sets the IVA rate of
+    an invoice, computed by the database in the same statement: the item costs
+    are summed over integer cents by a correlated subquery, and IVA is applied
+    in integer arithmetic with the exact rate (numerator / denominator),
+    rounded half-up like add_iva. The row is written, and its version bumped, once.
+    :param rate: The new IVA rate as a fraction (Decimal).
+    :return: dict: Column name -> SQL expression, for update_row.
+    """
+    cents = type_coerce(
+        select(func.coalesce(func.sum(InvoiceItem.cost), 0))
+        .where(InvoiceItem.invoice_id == Invoice.invoice_id)
+        .scalar_subquery(),
+        Integer,  # Raw cents: the Money conversion only applies to the returned values
+    )
+    numerator, denominator = rate.as_integer_ratio()
+    # Half-up (away from zero) rounding of cents * rate; SQLite integer division truncates
+    iva_cents = case(
+        (cents < 0, -((-cents * 2 * numerator + denominator) // (2 * denominator))),
+        else_=(cents * 2 * numerator + denominator) // (2 * denominator),
+    )
+    return {"total": cents, "total_with_iva": cents + iva_cents}
+
+
+def get_all_invoices(updated_since=None, ids=None):
+    """
+    Retrieve all invoices.
+    :param updated_since: Only return the invoices changed at or after this datetime (optional).
+    :param ids: Only return the invoices with these IDs, in this order (optional, one IN query).
+    :return: list: A list of dictionaries containing information about all invoices.
+    """
+    query = Invoice.query
+    if updated_since:
+        query = query.filter(changed_since(Invoice, updated_since))
+    if ids is not None:
+        query = query.filter(Invoice.invoice_id.in_(ids))
+    invoices = query.all()
+    if ids is not None:
+        invoices = in_id_order(invoices, ids)
+    return [
+        {
+            "invoice_id": invoice.invoice_id,
+            "client_id": invoice.client_id,
+            "issued_at": invoice.issued_at,
+            "iva": invoice.iva,
+            "total": invoice.total,
+            "total_with_iva": invoice.total_with_iva,
+            "updated_at": invoice.updated_at,
+            "version": invoice.version,
+        }
+        for invoice in invoices
+    ]
+
+def get_invoice(invoice_id):
+    """
+    Retrieve an invoice by ID.
+    :param invoice_id: The ID of the invoice to retrieve.
+    :return: dict: A dictionary containing the invoice information or None if not found.
+    """
+    invoice = Invoice.query.get(invoice_id)
+    if not invoice:
+        return None
+    return {
+        "invoice_id": invoice.invoice_id,
+        "client_id": invoice.client_id,
+        "issued_at": invoice.issued_at,
+        "iva": invoice.iva,
+        "total": invoice.total,
+        "total_with_iva": invoice.total_with_iva,
+        "updated_at": invoice.updated_at,
+        "version": invoice.version,
+    }
 
-def create_invoice(client_id, issued_at, iva, total, total_with_iva):
+def create_invoice(client_id, issued_at=None, iva=None):
     """
-    Create a new invoice.
+    Create a new invoice, without items.
+    The totals are computed by the server from the items as they are added.
     :param client_id: The client associated with the invoice.
-    :param issued_at: The issue date of the invoice.
-    :param iva: The IVA applied.
-    :param total: The total amount before IVA.
-    :param total_with_iva: The total amount including IVA.
+    :param issued_at: The issue date of the invoice (optional, defaults to now).
+    :param iva: The IVA rate, as a fraction in [0, 1) (optional, defaults to the 'iva' setting).
     :return: dict: A dictionary containing the newly created invoice's information.
+    :raises ValueError: If the IVA rate is not a fraction in [0, 1).
     """
+    if iva is not None:
+        iva = check_rate(iva)
     try:
-        invoice = Invoice(client_id=client_id, issued_at=issued_at, iva=iva, total=total, total_with_iva=total_with_iva)
+        invoice = Invoice(
+            client_id=client_id,
+            issued_at=parse_datetime(issued_at) or datetime.utcnow(),  # Same default as the model
+            iva=iva if iva is not None else get_iva_rate(),
+            total=0,
+            total_with_iva=0,
+        )
         db.session.add(invoice)
-        db.session.commit()
-        return {
+        db.session.flush()  # Assign the invoice ID before recording the change
+        data = {
             "invoice_id": invoice.invoice_id,
             "client_id": invoice.client_id,
             "issued_at": invoice.issued_at,
             "iva": invoice.iva,
             "total": invoice.total,
             "total_with_iva": invoice.total_with_iva,
+            "updated_at": invoice.updated_at,
+            "version": invoice.version,
         }
+        record_change('invoice', invoice.invoice_id, 'create', data)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error creating invoice: {e}")
-        db.session.rollback()
-        return {"error": "Internal Server Error"}
+        logger.error("Error creating invoice: %s", e)
+        rollback()
+        raise
 
-def update_invoice(invoice_id, client_id, issued_at, iva, total, total_with_iva):
+def update_invoice(invoice_id, client_id, issued_at, iva, version=None):
     """
-    Update an existing invoice.
+    Update an existing invoice with a single UPDATE ... RETURNING.
+    When the IVA rate is supplied the totals are recomputed in the same statement (see totals_values).
     :param invoice_id: The ID of the invoice to update.
+    :param iva: The new IVA rate, as a fraction in [0, 1), or None to keep it.
+    :param version: Version the invoice must still have (If-Match), or None.
     :return: dict: A dictionary containing the updated invoice's information or None if not found.
+    :raises ValueError: If the IVA rate is not a fraction in [0, 1).
     """
+    if iva is not None:
+        iva = check_rate(iva)
     try:
-        invoice = Invoice.query.get(invoice_id)
-        if not invoice:
+        values = {}
+        if client_id:
+            values["client_id"] = client_id
+        if issued_at:
+            values["issued_at"] = parse_datetime(issued_at)
+        if iva is not None:  # 0 is a valid rate (exempt)
+            values["iva"] = iva
+            values.update(totals_values(values["iva"]))
+        data = update_row(Invoice, invoice_id, values, version=version)
+        if data is None:
             return None
-        invoice.client_id = client_id if client_id else invoice.client_id
-        invoice.issued_at = issued_at if issued_at else invoice.issued_at
-        invoice.iva = iva if iva else invoice.iva
-        invoice.total = total if total else invoice.total
-        invoice.total_with_iva = total_with_iva if total_with_iva else invoice.total_with_iva
-
-        db.session.commit()
-        return {
-            "invoice_id": invoice.invoice_id,
-            "client_id": invoice.client_id,
-            "issued_at": invoice.issued_at,
-            "iva": invoice.iva,
-            "total": invoice.total,
-            "total_with_iva": invoice.total_with_iva,
-        }
+        record_change('invoice', invoice_id, 'update', data)
+        commit()
+        return data
+    except Exception as e:
+        logger.error("Error updating invoice %s: %s", invoice_id, e)
+        rollback()
+        raise
+
+def patch_invoice(invoice_id, changes, version=None):
+    """
+    Partially update an invoice with a single UPDATE ... RETURNING of the supplied columns only.
+    The totals are recomputed in the same statement when the IVA rate changes (0 is a valid, exempt rate).
+    :param invoice_id: The ID of the invoice to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the invoice must still have (If-Match), or None.
+    :return: dict: The updated invoice's information, or None if the invoice does not exist.
+    """
+    try:
+        values = dict(changes)
+        if "iva" in values:
+            values.update(totals_values(values["iva"]))
+        data = update_row(Invoice, invoice_id, values, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('invoice', invoice_id, 'update', data)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error updating invoice {invoice_id}: {e}")
-        db.session.rollback()
-        return {"error": "Internal Server Error"}
+        logger.error("Error patching invoice %s: %s", invoice_id, e)
+        rollback()
+        raise
 
-def delete_invoice(invoice_id):
+def delete_invoice(invoice_id, version=None):
     """
-    Delete an invoice.
+    Delete an invoice with a single DELETE.
+    Its items are removed by the database (ON DELETE CASCADE) without being
+    loaded, and logged with the invoice by the delete triggers.
     :param invoice_id: The ID of the invoice to delete.
-    :return: dict: The deleted invoice's information or None if not found.
+    :param version: Version the invoice must still have (If-Match), or None.
+    :return: bool: True if the invoice was deleted, None if it does not exist.
     """
     try:
-        invoice = Invoice.query.get(invoice_id)
-        if not invoice:
+        if delete_row(Invoice, invoice_id, version=version) is None:
             return None
-        db.session.delete(invoice)
-        db.session.commit()
-        return invoice
+        notify_changes('invoice')
+        commit()
+        return True
     except Exception as e:
-        logger.error(f"Error deleting invoice {invoice_id}: {e}")
-        db.session.rollback()
-        return {"error": "Internal Server Error"}
+        logger.error("Error deleting invoice %s: %s", invoice_id, e)
+        rollback()
+        raise
+
+
+def delete_task_items(task_ids):
+    """
+    Delete the invoice items of tasks that are about to be deleted, and
+    recompute the totals of the invoices they belonged to.
+    ON DELETE CASCADE would remove these items with their tasks, but then the
+    invoice totals would not follow; deleting them first with DELETE ...
+    RETURNING gives the affected invoices without loading anything.
+    :param task_ids: List or SELECT of the IDs of the tasks.
+    """
+    invoice_ids = db.session.scalars(
+        delete(InvoiceItem).where(InvoiceItem.task_id.in_(task_ids)).returning(InvoiceItem.invoice_id)
+    ).all()
+    recalculate_invoice_totals(*invoice_ids)
@@ -1,48 +1,52 @@
 import logging
-from utils.database import db
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
 from models.setting import Setting
+from utils.events import notify_changes, record_change
 
 logger = logging.getLogger(__name__)
 
-def get_all_settings():
+def get_all_settings(updated_since=None, ids=None):
     """
     Retrieve all settings.
+    :param updated_since: Only return the settings changed at or after this datetime (optional).
+    :param ids: Only return the settings with these IDs, in this order (optional, one IN query).
     :return: list: A list of dictionaries containing information about all settings.
     """
-    try:
-        settings = Setting.query.all()  # Retrieve all settings from the database
-        return [
-            {
-                "setting_id": setting.setting_id,
-                "key_name": setting.key_name,
-                "updated_at": setting.updated_at,
-                "value": setting.value,
-            }
-            for setting in settings
-        ]
-    except Exception as e:
-        logger.error(f"Error fetching all settings: {e}")
-        return {"error": "Internal Server Error"}
+    query = Setting.query
+    if updated_since:
+        query = query.filter(changed_since(Setting, updated_since))
+    if ids is not None:
+        query = query.filter(Setting.setting_id.in_(ids))
+    settings = query.all()  # Retrieve all settings from the database
+    if ids is not None:
+        settings = in_id_order(settings, ids)
+    return [
+        {
+            "setting_id": setting.setting_id,
+            "key_name": setting.key_name,
+            "updated_at": setting.updated_at,
+            "version": setting.version,
+            "value": setting.value,
+        }
+        for setting in settings
+    ]
 
 def get_setting(setting_id):
     """
     Retrieve a setting by ID.
     :param setting_id: The ID of the setting to retrieve.
-    :return: dict: A dictionary containing the setting's information or an error message.
+    :return: dict: A dictionary containing the setting's information or None if not found.
     """
-    try:
-        setting = Setting.query.get(setting_id)
-        if not setting:
-            return None
-        return {
-            "setting_id": setting.setting_id,
-            "key_name": setting.key_name,
-            "updated_at": setting.updated_at,
-            "value": setting.value,
-        }
-    except Exception as e:
-        logger.error(f"Error fetching setting {setting_id}: {e}")
-        return {"error": "Internal Server Error"}
+    setting = Setting.query.get(setting_id)
+    if not setting:
+        return None
+    return {
+        "setting_id": setting.setting_id,
+        "key_name": setting.key_name,
+        "updated_at": setting.updated_at,
+        "version": setting.version,
+        "value": setting.value,
+    }
 
 def create_setting(key_name, value):
     """
@@ -54,66 +58,85 @@ def create_setting(key_name, value):
     try:
         setting = Setting(key_name=key_name, value=value)
         db.session.add(setting)  # Save the new setting to the database
-        db.session.commit() # Save the new setting to the database
-        return {
+        db.session.flush()  # Assign the setting ID before recording the change
+        data = {
             "setting_id": setting.setting_id,
             "key_name": setting.key_name,
             "updated_at": setting.updated_at,
+            "version": setting.version,
             "value": setting.value,
         }
+        record_change('setting', setting.setting_id, 'create', data)
+        commit() # Save the new setting to the database
+        return data
     except Exception as e:
-        logger.error(f"Error creating setting: {e}")
-        return {"error": "Internal Server Error"}
+        rollback()
+        logger.error("Error creating setting: %s", e)
+        raise
 
 
-def update_setting(setting_id, key_name, updated_at, value):
+def update_setting(setting_id, key_name, value, version=None):
     """
-    Update an existing setting.
+    Update an existing setting with a single UPDATE ... RETURNING.
     :param setting_id: The ID of the setting to update.
     :param key_name: The name of the setting.
     :param value: The value of the setting.
-    :return: tuple: A dictionary containing the updated setting's information or an error message and the HTTP status code.
+    :param version: Version the setting must still have (If-Match), or None.
+    :return: dict: The updated setting's information, or None if the setting does not exist.
     """
     try:
-        # Find the setting by ID
-        setting = Setting.query.get(setting_id)
-
-        if not setting:
+        # Only the fields with a new value are updated (they can be optional)
+        values = {column: value for column, value in (("key_name", key_name), ("value", value)) if value}
+        data = update_row(Setting, setting_id, values, version=version)
+        if data is None:
             return None
-
-        # Update the fields if new values are provided (they can be optional)
-        setting.key_name = key_name if key_name else setting.key_name
-        setting.value = value if value else setting.value
-
+        record_change('setting', setting_id, 'update', data)
         # Commit the changes to the database
-        db.session.commit()
+        commit()
         # Return updated setting information
-        return {
-            "setting_id": setting.setting_id,
-            "key_name": setting.key_name,
-            "updated_at": setting.updated_at,
-            "value": setting.value,
-        }
+        return data
     except Exception as e:
         # If an error occurs, rollback the transaction
-        db.session.rollback()
-        logger.error(f"Error updating setting {setting_id}: {e}")
-        return {"error": "Internal Server Error"}
-def delete_setting(setting_id):
+        rollback()
+        logger.error("Error updating setting %s: %s", setting_id, e)
+        raise
+
+def patch_setting(setting_id, changes, version=None):
+    """
+    Partially update a setting with a single UPDATE ... RETURNING of the supplied columns only.
+    :param setting_id: The ID of the setting to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the setting must still have (If-Match), or None.
+    :return: dict: The updated setting's information, or None if the setting does not exist.
+    """
+    try:
+        data = update_row(Setting, setting_id, changes, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('setting', setting_id, 'update', data)
+        commit()
+        return data
+    except Exception as e:
+        rollback()
+        logger.error("Error patching setting %s: %s", setting_id, e)
+        raise
+
+def delete_setting(setting_id, version=None):
     """
-    Delete a setting.
+    Delete a setting with a single DELETE (logged by the delete trigger).
     :param setting_id: The ID of the setting to delete.
-    :return: tuple: A message confirming deletion or an error message and the HTTP status code.
+    :param version: Version the setting must still have (If-Match), or None.
+    :return: bool: True if the setting was deleted, None if it does not exist.
     """
     try:
-        setting = Setting.query.get(setting_id)
-        if not setting:
+        if delete_row(Setting, setting_id, version=version) is None:
             return None
-        # Delete the setting
-        db.session.delete(setting)
+        notify_changes('setting')
         # Commit the deletion
-        db.session.commit()
-        return setting
+        commit()
+        return True
     except Exception as e:
-        logger.error(f"Error deleting setting {setting_id}: {e}")
-        return {"error": "Internal Server Error"}
\ No newline at end of file
+        rollback()
+        logger.error("Error deleting setting %s: %s", setting_id, e)
+        raise
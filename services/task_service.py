@@ -1,47 +1,34 @@
 import logging
-from utils.database import db
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
 from models.task import Task
+from services.invoice_service import delete_task_items
+from utils.events import notify_changes, record_change
+from utils.utils import parse_datetime
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-def get_all_tasks():
+def get_all_tasks(updated_since=None, ids=None):
     """
     Retrieve all tasks.
+    :param updated_since: Only return the tasks changed at or after this datetime (optional).
+    :param ids: Only return the tasks with these IDs, in this order (optional, one IN query).
     :return: list: A list of dictionaries containing information about all tasks.
     """
-    try:
-        tasks = Task.query.all()  # Retrieve all tasks from the database
-        return [
-            {
-                "task_id": task.task_id,
-                "created_at": task.created_at,
-                "description": task.description,
-                "employee_id": task.employee_id,
-                "end_date": task.end_date,
-                "start_date": task.start_date,
-                "status": task.status,
-                "work_id": task.work_id,
-            }
-            for task in tasks
-        ]
-    except Exception as e:
-        logger.error(f"Error fetching all tasks: {e}")
-        return {"error": "Internal Server Error"}
-
-def get_task(task_id):
-    """
-    Retrieve a task by ID.
-    :param task_id: The ID of the task to retrieve.
-    :return: dict: A dictionary containing the task's information or an error message.
-    """
-    try:
-        task = Task.query.get(task_id)
-        if not task:
-            return None
-        return {
+    query = Task.query
+    if updated_since:
+        query = query.filter(changed_since(Task, updated_since))
+    if ids is not None:
+        query = query.filter(Task.task_id.in_(ids))
+    tasks = query.all()  # Retrieve all tasks from the database
+    if ids is not None:
+        tasks = in_id_order(tasks, ids)
+    return [
+        {
             "task_id": task.task_id,
             "created_at": task.created_at,
+            "updated_at": task.updated_at,
+            "version": task.version,
             "description": task.description,
             "employee_id": task.employee_id,
             "end_date": task.end_date,
@@ -49,26 +36,51 @@ def get_task(task_id):
             "status": task.status,
             "work_id": task.work_id,
         }
-    except Exception as e:
-        logger.error(f"Error fetching task {task_id}: {e}")
-        return {"error": "Internal Server Error"}
+        for task in tasks
+    ]
 
-def create_task(description, end_date, start_date, status):
+def get_task(task_id):
+    """
+    Retrieve a task by ID.
+    :param task_id: The ID of the task to retrieve.
+    :return: dict: A dictionary containing the task's information or None if not found.
+    """
+    task = Task.query.get(task_id)
+    if not task:
+        return None
+    return {
+        "task_id": task.task_id,
+        "created_at": task.created_at,
+        "updated_at": task.updated_at,
+        "version": task.version,
+        "description": task.description,
+        "employee_id": task.employee_id,
+        "end_date": task.end_date,
+        "start_date": task.start_date,
+        "status": task.status,
+        "work_id": task.work_id,
+    }
+
+def create_task(description, employee_id, end_date, start_date, status, work_id):
     """
     Create a new task.
     :param description: The description of the task.
+    :param employee_id: The ID of the employee assigned to the task.
     :param end_date: The end_date of the task.
     :param start_date: The start_date of the task.
     :param status: The status of the task.
+    :param work_id: The ID of the work the task belongs to.
     :return: tuple: A dictionary containing the newly created task's information and the HTTP status code.
     """
     try:
-        task = Task(description=description, end_date=end_date, start_date=start_date, status=status)
+        task = Task(description=description, employee_id=employee_id, end_date=parse_datetime(end_date), start_date=parse_datetime(start_date), status=status, work_id=work_id)
         db.session.add(task)  # Save the new task to the database
-        db.session.commit() # Save the new task to the database
-        return {
+        db.session.flush()  # Assign the task ID before recording the event
+        data = {
             "task_id": task.task_id,
             "created_at": task.created_at,
+            "updated_at": task.updated_at,
+            "version": task.version,
             "description": task.description,
             "employee_id": task.employee_id,
             "end_date": task.end_date,
@@ -76,13 +88,17 @@ def create_task(description, end_date, start_date, status):
             "status": task.status,
             "work_id": task.work_id,
         }
+        record_change('task', task.task_id, 'create', data)
+        commit() # Save the new task and its event to the database
+        return data
     except Exception as e:
-        logger.error(f"Error creating task: {e}")
-        return {"error": "Internal Server Error"}
+        rollback()
+        logger.error("Error creating task: %s", e)
+        raise
 
-def update_task(task_id, description, employee_id, end_date, start_date, status, work_id):
+def update_task(task_id, description, employee_id, end_date, start_date, status, work_id, version=None):
     """
-    Update an existing task.
+    Update an existing task with a single UPDATE ... RETURNING.
     :param task_id: The ID of the task to update.
     :param description: The description of the task.
     :param employee_id: The ID of the employee to update.
@@ -90,57 +106,76 @@ def update_task(task_id, description, employee_id, end_date, start_date, status,
     :param start_date: The start_date of the task.
     :param status: The status of the task.
     :param work_id: The ID of the work to update.
-    :return: tuple: A dictionary containing the updated task's information or an error message and the HTTP status code.
+    :param version: Version the task must still have (If-Match), or None.
+    :return: dict: The updated task's information, or None if the task does not exist.
     """
     try:
-        # Find the task by ID
-        task = Task.query.get(task_id)
-
-        if not task:
+        # Only the fields with a new value are updated (they can be optional)
+        values = {
+            column: value
+            for column, value in (
+                ("description", description),
+                ("employee_id", employee_id),
+                ("end_date", parse_datetime(end_date) if end_date else None),
+                ("start_date", parse_datetime(start_date) if start_date else None),
+                ("status", status),
+                ("work_id", work_id),
+            )
+            if value
+        }
+        data = update_row(Task, task_id, values, version=version)
+        if data is None:
             return None
-
-        # Update the fields if new values are provided (they can be optional)
-        task.description = description if description else task.description
-        task.employee_id = employee_id if employee_id else task.employee_id
-        task.end_date = end_date if end_date else task.end_date
-        task.start_date = start_date if start_date else task.start_date
-        task.status = status if status else task.status
-        task.work_id = work_id if work_id else task.work_id
-
+        record_change('task', task_id, 'update', data)
         # Commit the changes to the database
-        db.session.commit()
+        commit()
         # Return updated task information
-        return {
-            "task_id": task.task_id,
-            "created_at": task.created_at,
-            "description": task.description,
-            "employee_id": task.employee_id,
-            "end_date": task.end_date,
-            "start_date": task.start_date,
-            "status": task.status,
-            "work_id": task.work_id,
-        }
+        return data
     except Exception as e:
         # If an error occurs, rollback the transaction
-        db.session.rollback()
-        logger.error(f"Error updating task {task_id}: {e}")
-        return {"error": "Internal Server Error"}
-    
-def delete_task(task_id):
+        rollback()
+        logger.error("Error updating task %s: %s", task_id, e)
+        raise
+
+def patch_task(task_id, changes, version=None):
+    """
+    Partially update a task with a single UPDATE ... RETURNING of the supplied columns only.
+    :param task_id: The ID of the task to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the task must still have (If-Match), or None.
+    :return: dict: The updated task's information, or None if the task does not exist.
+    """
+    try:
+        data = update_row(Task, task_id, changes, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('task', task_id, 'update', data)
+        commit()
+        return data
+    except Exception as e:
+        rollback()
+        logger.error("Error patching task %s: %s", task_id, e)
+        raise
+
+def delete_task(task_id, version=None):
     """
-    Delete a task.
+    Delete a task with a single DELETE.
+    Its invoice items are deleted first, so that the totals of their invoices
+    are recomputed; the task itself is logged by the delete trigger.
     :param task_id: The ID of the task to delete.
-    :return: tuple: A message confirming deletion or an error message and the HTTP status code.
+    :param version: Version the task must still have (If-Match), or None.
+    :return: bool: True if the task was deleted, None if it does not exist.
     """
     try:
-        task = Task.query.get(task_id)
-        if not task:
+        delete_task_items([task_id])
+        if delete_row(Task, task_id, version=version) is None:
             return None
-        # Delete the task
-        db.session.delete(task)
+        notify_changes('task')
         # Commit the deletion
-        db.session.commit()
-        return task
+        commit()
+        return True
     except Exception as e:
-        logger.error(f"Error deleting task {task_id}: {e}")
-        return {"error": "Internal Server Error"}
\ No newline at end of file
+        rollback()
+        logger.error("Error deleting task %s: %s", task_id, e)
+        raise
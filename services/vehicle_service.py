@@ -1,44 +1,31 @@
 import logging
-from utils.database import db
+from sqlalchemy import select
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
+from models.task import Task
 from models.vehicle import Vehicle
+from models.work import Work
+from services.invoice_service import delete_task_items
+from utils.events import notify_changes, record_change
 
 logger = logging.getLogger(__name__)
 
-def get_all_vehicles():
+def get_all_vehicles(updated_since=None, ids=None):
     """
     Retrieve all vehicles.
+    :param updated_since: Only return the vehicles changed at or after this datetime (optional).
+    :param ids: Only return the vehicles with these IDs, in this order (optional, one IN query).
     :return: list: A list of dictionaries containing information about all vehicles.
     """
-    try:
-        vehicles = Vehicle.query.all()  # Retrieve all vehicles from the database
-        return [
-            {
-                "vehicle_id": vehicle.vehicle_id,
-                "brand": vehicle.brand,
-                "client_id": vehicle.client_id,
-                "created_at": vehicle.created_at,
-                "license_plate": vehicle.license_plate,
-                "model": vehicle.model,
-                "year": vehicle.year,
-            }
-            for vehicle in vehicles
-        ]
-    except Exception as e:
-        logger.error(f"Error fetching all vehicles: {e}")
-        return {"error": "Internal Server Error"}
-    
-
-def get_vehicle(vehicle_id):
-    """
-    Retrieve a vehicle by ID.
-    :param vehicle_id: The ID of the vehicle to retrieve.
-    :return: dict: A dictionary containing the vehicle's information or an error message.
-    """
-    try:
-        vehicle = Vehicle.query.get(vehicle_id)
-        if not vehicle:
-            return None
-        return {
+    query = Vehicle.query
+    if updated_since:
+        query = query.filter(changed_since(Vehicle, updated_since))
+    if ids is not None:
+        query = query.filter(Vehicle.vehicle_id.in_(ids))
+    vehicles = query.all()  # Retrieve all vehicles from the database
+    if ids is not None:
+        vehicles = in_id_order(vehicles, ids)
+    return [
+        {
             "vehicle_id": vehicle.vehicle_id,
             "brand": vehicle.brand,
             "client_id": vehicle.client_id,
@@ -46,10 +33,37 @@ def get_vehicle(vehicle_id):
             "license_plate": vehicle.license_plate,
             "model": vehicle.model,
             "year": vehicle.year,
+            "last_work_at": vehicle.last_work_at,
+            "open_work_count": vehicle.open_work_count,
+            "updated_at": vehicle.updated_at,
+            "version": vehicle.version,
         }
-    except Exception as e:
-        logger.error(f"Error fetching vehicle {vehicle_id}: {e}")
-        return {"error": "Internal Server Error"}
+        for vehicle in vehicles
+    ]
+    
+
+def get_vehicle(vehicle_id):
+    """
+    Retrieve a vehicle by ID.
+    :param vehicle_id: The ID of the vehicle to retrieve.
+    :return: dict: A dictionary containing the vehicle's information or None if not found.
+    """
+    vehicle = Vehicle.query.get(vehicle_id)
+    if not vehicle:
+        return None
+    return {
+        "vehicle_id": vehicle.vehicle_id,
+        "brand": vehicle.brand,
+        "client_id": vehicle.client_id,
+        "created_at": vehicle.created_at,
+        "license_plate": vehicle.license_plate,
+        "model": vehicle.model,
+        "year": vehicle.year,
+        "last_work_at": vehicle.last_work_at,
+        "open_work_count": vehicle.open_work_count,
+        "updated_at": vehicle.updated_at,
+        "version": vehicle.version,
+    }
     
 def create_vehicle(brand, client_id, license_plate, model, year):
     """
@@ -64,8 +78,8 @@ def create_vehicle(brand, client_id, license_plate, model, year):
     try:
         vehicle = Vehicle(brand=brand, client_id=client_id, license_plate=license_plate, model=model, year=year)
         db.session.add(vehicle)
-        db.session.commit()
-        return {
+        db.session.flush()  # Assign the vehicle ID before recording the change
+        data = {
             "vehicle_id": vehicle.vehicle_id,
             "brand": vehicle.brand,
             "client_id": vehicle.client_id,
@@ -73,59 +87,157 @@ def create_vehicle(brand, client_id, license_plate, model, year):
             "license_plate": vehicle.license_plate,
             "model": vehicle.model,
             "year": vehicle.year,
-        }, 201
+            "last_work_at": vehicle.last_work_at,
+            "open_work_count": vehicle.open_work_count,
+            "updated_at": vehicle.updated_at,
+            "version": vehicle.version,
+        }
+        record_change('vehicle', vehicle.vehicle_id, 'create', data)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error creating vehicle: {e}")
-        return {"error": "Internal Server Error"}
+        rollback()
+        logger.error("Error creating vehicle: %s", e)
+        raise
     
-def update_vehicle(vehicle_id, brand, client_id, license_plate, model, year):
+def update_vehicle(vehicle_id, brand, client_id, license_plate, model, year, version=None):
     """
-    Update a vehicle.
+    Update a vehicle with a single UPDATE ... RETURNING.
+    The work summary (last_work_at, open_work_count) is maintained by the work service.
     :param vehicle_id: The ID of the vehicle to update.
     :param brand: The brand of the vehicle.
     :param client_id: The ID of the client who owns the vehicle.
     :param license_plate: The license plate of the vehicle.
     :param model: The model of the vehicle.
     :param year: The year of the vehicle.
-    :return: dict: A dictionary containing the updated vehicle's information or an error message.
+    :param version: Version the vehicle must still have (If-Match), or None.
+    :return: dict: The updated vehicle's information, or None if the vehicle does not exist.
     """
     try:
-        vehicle = Vehicle.query.get(vehicle_id)
-        if not vehicle:
+        data = update_row(Vehicle, vehicle_id, {
+            "brand": brand,
+            "client_id": client_id,
+            "license_plate": license_plate,
+            "model": model,
+            "year": year,
+        }, version=version)
+        if data is None:
             return None
-        vehicle.brand = brand
-        vehicle.client_id = client_id
-        vehicle.license_plate = license_plate
-        vehicle.model = model
-        vehicle.year = year
-        db.session.commit()
-        return {
-            "vehicle_id": vehicle.vehicle_id,
-            "brand": vehicle.brand,
-            "client_id": vehicle.client_id,
-            "created_at": vehicle.created_at,
-            "license_plate": vehicle.license_plate,
-            "model": vehicle.model,
-            "year": vehicle.year,
-        }
+        record_change('vehicle', vehicle_id, 'update', data)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error updating vehicle {vehicle_id}: {e}")
-        return {"error": "Internal Server Error"}
+        rollback()
+        logger.error("Error updating vehicle %s: %s", vehicle_id, e)
+        raise
 
-def delete_vehicle(vehicle_id):
+def patch_vehicle(vehicle_id, changes, version=None):
+    """
+    Partially update a vehicle with a single UPDATE ... RETURNING of the supplied columns only.
+    :param vehicle_id: The ID of the vehicle to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the vehicle must still have (If-Match), or None.
+    :return: dict: The updated vehicle's information, or None if the vehicle does not exist.
     """
-    Delete a vehicle.
+    try:
+        data = update_row(Vehicle, vehicle_id, changes, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('vehicle', vehicle_id, 'update', data)
+        commit()
+        return data
+    except Exception as e:
+        rollback()
+        logger.error("Error patching vehicle %s: %s", vehicle_id, e)
+        raise
+
+def delete_vehicle(vehicle_id, version=None):
+    """
+    Delete a vehicle with a single DELETE.
+    Its works and their tasks are removed by the database (ON DELETE CASCADE)
+    and logged by the delete triggers; the invoice items of these tasks are
+    deleted first so that the totals of their invoices are recomputed.
     :param vehicle_id: The ID of the vehicle to delete.
-    :return: dict: A message indicating success or an error message.
+    :param version: Version the vehicle must still have (If-Match), or None.
+    :return: bool: True if the vehicle was deleted, None if it does not exist.
     """
     try:
-        vehicle = Vehicle.query.get(vehicle_id)
-        if not vehicle:
+        delete_task_items(
+            select(Task.task_id).join(Work, Work.work_id == Task.work_id).where(Work.vehicle_id == vehicle_id)
+        )
+        if delete_row(Vehicle, vehicle_id, version=version) is None:
             return None
-        db.session.delete(vehicle)
-        db.session.commit()
-        return {"message": "Vehicle deleted successfully."}
+        notify_changes('vehicle')
+        commit()
+        return True
     except Exception as e:
-        logger.error(f"Error deleting vehicle {vehicle_id}: {e}")
-        return {"error": "Internal Server Error"}
-    
+        rollback()
+        logger.error("Error deleting vehicle %s: %s", vehicle_id, e)
+        raise
+
+
+def get_vehicle_history(vehicle_id):
+    """
+    Retrieve the service history of a vehicle: its works with their tasks, oldest first.
+    The vehicle, its works and their tasks are read with one joined query
+    (vehicle LEFT JOIN work LEFT JOIN task), served by the (vehicle_id,
+    start_date) index on work and the (work_id, start_date) index on task.
+    :param vehicle_id: The ID of the vehicle.
+    :return: dict: The vehicle summary with its works under "works", or None if the vehicle does not exist.
+    """
+    query = (
+        select(
+            Vehicle.vehicle_id, Vehicle.license_plate, Vehicle.brand, Vehicle.model,
+            Vehicle.last_work_at, Vehicle.open_work_count,
+            Work.work_id, Work.cost, Work.created_at, Work.description, Work.end_date,
+            Work.start_date, Work.status,
+            Task.task_id, Task.created_at.label('task_created_at'), Task.description.label('task_description'),
+            Task.employee_id, Task.end_date.label('task_end_date'), Task.start_date.label('task_start_date'),
+            Task.status.label('task_status'),
+        )
+        .outerjoin(Work, Work.vehicle_id == Vehicle.vehicle_id)
+        .outerjoin(Task, Task.work_id == Work.work_id)
+        .where(Vehicle.vehicle_id == vehicle_id)
+        .order_by(Work.start_date, Work.work_id, Task.start_date, Task.task_id)
+    )
+    history = None
+    work = None
+    for row in db.session.execute(query):
+        if history is None:
+            history = {
+                "vehicle_id": row.vehicle_id,
+                "license_plate": row.license_plate,
+                "brand": row.brand,
+                "model": row.model,
+                "last_work_at": row.last_work_at,
+                "open_work_count": row.open_work_count,
+                "works": [],
+            }
+        if row.work_id is None:
+            continue  # Vehicle without works: a single row with NULL work columns
+        if work is None or work["work_id"] != row.work_id:
+            work = {
+                "work_id": row.work_id,
+                "cost": row.cost,
+                "created_at": row.created_at,
+                "description": row.description,
+                "end_date": row.end_date,
+                "start_date": row.start_date,
+                "status": row.status,
+                "vehicle_id": row.vehicle_id,
+                "tasks": [],
+            }
+            history["works"].append(work)
+        if row.task_id is not None:
+            work["tasks"].append({
+                "task_id": row.task_id,
+                "created_at": row.task_created_at,
+                "description": row.task_description,
+                "employee_id": row.employee_id,
+                "end_date": row.task_end_date,
+                "start_date": row.task_start_date,
+                "status": row.task_status,
+                "work_id": row.work_id,
+            })
+    return history
@@ -1,57 +1,103 @@
 import logging
-from utils.database import db
+from sqlalchemy import func, insert, select, update
+from utils.database import db, commit, rollback, update_row, delete_row, changed_since, in_id_order
+from models.task import Task
+from models.vehicle import Vehicle
 from models.work import Work 
+from services.invoice_service import delete_task_items
+from utils.events import notify_changes, record_change
+from utils.money import to_decimal
+from utils.utils import parse_date, parse_datetime
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-def get_all_works():
+# Works counted in the open_work_count of their vehicle
+OPEN_WORK_STATUSES = ('pending', 'in_progress')
+
+
+def update_vehicle_summary(*vehicle_ids):
     """
-    Retrieve all works.
-    :return: list: A list of dictionaries containing information about all works.
+    Recompute the denormalized last_work_at and open_work_count of vehicles.
+    Runs one UPDATE with correlated subqueries in the caller's transaction,
+    after the work changes are flushed, so the summary can never drift from
+    the works it describes (even with concurrent writers). The UPDATE bumps
+    the version of the vehicles, so each of them is recorded as changed with
+    the row it returns.
+    :param vehicle_ids: IDs of the vehicles whose works changed.
     """
-    try:
-        works = Work.query.all()  # Retrieve all works from the database
-        return [
-            {
-                "work_id": work.work_id,
-                "cost": work.cost,
-                "created_at": work.created_at,
-                "description": work.description,
-                "end_date": work.end_date,
-                "start_date": work.start_date,
-                "status": work.status,
-                "vehicle_id": work.vehicle_id
-            }
-            for work in works
-        ]
-    except Exception as e:
-        logger.error(f"Error fetching all works: {e}")
-        return {"error": "Internal Server Error"}
+    last_work_at = (
+        select(func.max(Work.start_date))
+        .where(Work.vehicle_id == Vehicle.vehicle_id, Work.status != 'cancelled')
+        .scalar_subquery()
+    )
+    open_work_count = (
+        select(func.count())
+        .where(Work.vehicle_id == Vehicle.vehicle_id, Work.status.in_(OPEN_WORK_STATUSES))
+        .scalar_subquery()
+    )
+    vehicles = db.session.execute(
+        update(Vehicle)
+        .where(Vehicle.vehicle_id.in_(set(vehicle_ids)))
+        .values(last_work_at=last_work_at, open_work_count=open_work_count)
+        .returning(*Vehicle.__table__.columns)
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    for vehicle in vehicles:
+        record_change('vehicle', vehicle["vehicle_id"], 'update', dict(vehicle))
 
-def get_work(work_id):
+def get_all_works(updated_since=None, ids=None):
     """
-    Retrieve a work by ID.
-    :param work_id: The ID of the work to retrieve.
-    :return: dict: A dictionary containing the work's information or an error message.
+    Retrieve all works.
+    :param updated_since: Only return the works changed at or after this datetime (optional).
+    :param ids: Only return the works with these IDs, in this order (optional, one IN query).
+    :return: list: A list of dictionaries containing information about all works.
     """
-    try:
-        work = Work.query.get(work_id)
-        if not work:
-            return None
-        return {
+    query = Work.query
+    if updated_since:
+        query = query.filter(changed_since(Work, updated_since))
+    if ids is not None:
+        query = query.filter(Work.work_id.in_(ids))
+    works = query.all()  # Retrieve all works from the database
+    if ids is not None:
+        works = in_id_order(works, ids)
+    return [
+        {
             "work_id": work.work_id,
             "cost": work.cost,
             "created_at": work.created_at,
+            "updated_at": work.updated_at,
+            "version": work.version,
             "description": work.description,
             "end_date": work.end_date,
             "start_date": work.start_date,
             "status": work.status,
             "vehicle_id": work.vehicle_id
         }
-    except Exception as e:
-        logger.error(f"Error fetching work {work_id}: {e}")
-        return {"error": "Internal Server Error"}
+        for work in works
+    ]
+
+def get_work(work_id):
+    """
+    Retrieve a work by ID.
+    :param work_id: The ID of the work to retrieve.
+    :return: dict: A dictionary containing the work's information or None if not found.
+    """
+    work = Work.query.get(work_id)
+    if not work:
+        return None
+    return {
+        "work_id": work.work_id,
+        "cost": work.cost,
+        "created_at": work.created_at,
+        "updated_at": work.updated_at,
+        "version": work.version,
+        "description": work.description,
+        "end_date": work.end_date,
+        "start_date": work.start_date,
+        "status": work.status,
+        "vehicle_id": work.vehicle_id
+    }
 
 def create_work(cost, description, status, vehicle_id, start_date=None, end_date=None):
     """
@@ -65,28 +111,33 @@ def create_work(cost, description, status, vehicle_id, start_date=None, end_date
     :return: dict: A dictionary containing the newly created work's information.
     """
     try:
-        work = Work(cost=cost, description=description, status=status, vehicle_id=vehicle_id, start_date=start_date, end_date=end_date)
+        work = Work(cost=to_decimal(cost), description=description, status=status, vehicle_id=vehicle_id, start_date=parse_datetime(start_date), end_date=parse_date(end_date))
         db.session.add(work)  # Save the new work to the database
-        db.session.commit()
-        return {
+        db.session.flush()  # Assign the work ID before recording the event
+        data = {
             "work_id": work.work_id,
             "cost": work.cost,
             "created_at": work.created_at,
+            "updated_at": work.updated_at,
+            "version": work.version,
             "description": work.description,
             "end_date": work.end_date,
             "start_date": work.start_date,
             "status": work.status,
             "vehicle_id": work.vehicle_id
         }
+        record_change('work', work.work_id, 'create', data)
+        update_vehicle_summary(work.vehicle_id)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error creating work: {e}")
-        return {"error": "Internal Server Error"}
+        rollback()
+        logger.error("Error creating work: %s", e)
+        raise
 
-from datetime import datetime    
-
-def update_work(work_id, cost, description, status, vehicle_id, start_date=None, end_date=None):
+def update_work(work_id, cost, description, status, vehicle_id, start_date=None, end_date=None, version=None):
     """
-    Update an existing work.
+    Update an existing work with a single UPDATE ... RETURNING.
     :param work_id: The ID of the work to update.
     :param cost: The cost of the work.
     :param description: The description of the work.
@@ -94,46 +145,156 @@ def update_work(work_id, cost, description, status, vehicle_id, start_date=None,
     :param vehicle_id: The ID of the vehicle associated with the work.
     :param start_date: The start date of the work (optional).
     :param end_date: The end date of the work (optional).
-    :return: dict: A dictionary containing the updated work's information.
+    :param version: Version the work must still have (If-Match), or None.
+    :return: dict: The updated work's information, or None if the work does not exist.
+    """
+    try:
+        # RETURNING only gives the new vehicle: read the current one, whose summary changes too if the work moves
+        previous_vehicle_id = db.session.scalar(select(Work.vehicle_id).where(Work.work_id == work_id))
+        if previous_vehicle_id is None:
+            return None
+        data = update_row(Work, work_id, {
+            "cost": to_decimal(cost),
+            "description": description,
+            "status": status,
+            "vehicle_id": vehicle_id,
+            "start_date": parse_datetime(start_date),
+            "end_date": parse_date(end_date),
+        }, version=version)
+        if data is None:
+            return None  # Deleted concurrently
+        record_change('work', work_id, 'update', data)
+        update_vehicle_summary(previous_vehicle_id, data["vehicle_id"])  # Both vehicles when the work moved
+        commit()
+        return data
+    except Exception as e:
+        rollback()
+        logger.error("Error updating work %s: %s", work_id, e)
+        raise
+
+def patch_work(work_id, changes, version=None):
+    """
+    Partially update a work with a single UPDATE ... RETURNING of the supplied columns only.
+    The vehicle summary is refreshed when the vehicle, status or start date changes.
+    :param work_id: The ID of the work to update.
+    :param changes: dict: Column name -> new value, for the fields present in the request (see parse_patch).
+    :param version: Version the work must still have (If-Match), or None.
+    :return: dict: The updated work's information, or None if the work does not exist.
+    """
+    try:
+        previous_vehicle_id = None
+        if "vehicle_id" in changes:
+            # RETURNING only gives the new vehicle: read the current one, whose summary changes too if the work moves
+            previous_vehicle_id = db.session.scalar(select(Work.vehicle_id).where(Work.work_id == work_id))
+        data = update_row(Work, work_id, changes, version=version)
+        if data is None:
+            return None
+        if changes:
+            record_change('work', work_id, 'update', data)
+        if changes.keys() & {"vehicle_id", "status", "start_date"}:
+            update_vehicle_summary(*{previous_vehicle_id, data["vehicle_id"]} - {None})
+        commit()
+        return data
+    except Exception as e:
+        rollback()
+        logger.error("Error patching work %s: %s", work_id, e)
+        raise
+
+def delete_work(work_id, version=None):
+    """
+    Delete a work with a single DELETE ... RETURNING.
+    Its tasks are removed by the database (ON DELETE CASCADE) and logged by
+    the delete triggers; the invoice items of these tasks are deleted first so
+    that the totals of their invoices are recomputed.
+    :param work_id: The ID of the work to delete.
+    :param version: Version the work must still have (If-Match), or None.
+    :return: bool: True if the work was deleted, None if it does not exist.
     """
     try:
-        work = Work.query.get(work_id)
-        if not work:
+        delete_task_items(select(Task.task_id).where(Task.work_id == work_id))
+        deleted = delete_row(Work, work_id, Work.vehicle_id, version=version)
+        if deleted is None:
             return None
-        work.cost = cost
-        work.description = description
-        work.status = status
-        work.vehicle_id = vehicle_id
-        work.start_date = start_date
-        work.end_date = end_date
-        db.session.commit()
-        return {
+        notify_changes('work')
+        update_vehicle_summary(deleted.vehicle_id)
+        commit()
+        return True
+    except Exception as e:
+        rollback()
+        logger.error("Error deleting work %s: %s", work_id, e)
+        raise
+
+def create_work_with_tasks(work_data, tasks_data):
+    """
+    Create a work and its tasks in one transaction.
+    The tasks are inserted with a single multi-row INSERT ... RETURNING, so
+    the cost of a job card does not grow with one round trip per task.
+    :param work_data: dict: cost, description, status, vehicle_id and optional start_date/end_date of the work.
+    :param tasks_data: list: dicts with description, employee_id, start_date, status and optional end_date of each task.
+    :return: dict: The created work with its tasks under "tasks".
+    """
+    try:
+        work = Work(
+            cost=to_decimal(work_data['cost']),
+            description=work_data['description'],
+            status=work_data['status'],
+            vehicle_id=work_data['vehicle_id'],
+            start_date=parse_datetime(work_data.get('start_date')),
+            end_date=parse_date(work_data.get('end_date')),
+        )
+        db.session.add(work)
+        db.session.flush()  # Assign the work ID used by the tasks
+        data = {
             "work_id": work.work_id,
             "cost": work.cost,
             "created_at": work.created_at,
+            "updated_at": work.updated_at,
+            "version": work.version,
             "description": work.description,
             "end_date": work.end_date,
             "start_date": work.start_date,
             "status": work.status,
             "vehicle_id": work.vehicle_id
         }
-    except Exception as e:
-        logger.error(f"Error updating work {work_id}: {e}")
-        return {"error": "Internal Server Error"}
+        record_change('work', work.work_id, 'create', data)
 
-def delete_work(work_id):
-    """
-    Delete a work by ID.
-    :param work_id: The ID of the work to delete.
-    :return: dict: A dictionary containing the status of the deletion operation.
-    """
-    try:
-        work = Work.query.get(work_id)
-        if not work:
-            return None
-        db.session.delete(work)
-        db.session.commit()
-        return {"status": "success"}
+        tasks = []
+        if tasks_data:
+            # ORM bulk INSERT: one statement for all rows, returning them with their IDs and defaults
+            tasks = db.session.scalars(
+                insert(Task).returning(Task),
+                [
+                    {
+                        "description": task["description"],
+                        "employee_id": task["employee_id"],
+                        "end_date": parse_datetime(task.get("end_date")),
+                        "start_date": parse_datetime(task["start_date"]),
+                        "status": task["status"],
+                        "work_id": work.work_id,
+                    }
+                    for task in tasks_data
+                ],
+            ).all()
+        data["tasks"] = []
+        for task in tasks:
+            task_data = {
+                "task_id": task.task_id,
+                "created_at": task.created_at,
+                "updated_at": task.updated_at,
+                "version": task.version,
+                "description": task.description,
+                "employee_id": task.employee_id,
+                "end_date": task.end_date,
+                "start_date": task.start_date,
+                "status": task.status,
+                "work_id": task.work_id,
+            }
+            record_change('task', task.task_id, 'create', task_data)
+            data["tasks"].append(task_data)
+        update_vehicle_summary(work.vehicle_id)
+        commit()
+        return data
     except Exception as e:
-        logger.error(f"Error deleting work {work_id}: {e}")
-        return {"error": "Internal Server Error"}
\ No newline at end of file
+        rollback()
+        logger.error("Error creating work with %s tasks: %s", len(tasks_data), e)
+        raise
@@ -0,0 +1,72 @@
+"""
+Test configuration.
+
+The application runs against a copy of instance/app.db, upgraded with the
+migrations of the tree, in a temporary instance folder. The settings are read
+from the environment when config.py is first imported, so they are set here,
+before any test module imports the application.
+"""
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INSTANCE = tempfile.mkdtemp(prefix='garage-tests-')
+DATABASE = os.path.join(INSTANCE, 'app.db')
+shutil.copy(os.path.join(ROOT, 'instance', 'app.db'), DATABASE)
+
+os.environ.update(
+    DATABASE_URI=f'sqlite:///{DATABASE}',
+    TABLE_VERSIONS_FILE=os.path.join(INSTANCE, 'table_versions'),
+    LOG_FILE=os.devnull,
+    RESPONSE_CACHE_ENABLED='false',  # Every request reaches the database
+)
+
+
+@pytest.fixture(scope='session')
+def app():
+    """
+    Application bound to the migrated copy of the database.
+    """
+    from app import create_app
+    from utils.database import db
+    from utils.migrations import apply_migrations
+
+    app = create_app()
+    with app.app_context():
+        apply_migrations(db.engine)
+    yield app
+    shutil.rmtree(INSTANCE, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def create(client):
+    """
+    Create a resource through the API and return its JSON: create('/api/client/', {...}).
+    """
+    def create(path, payload):
+        response = client.post(path, json=payload)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return create
+
+
+@pytest.fixture
+def new_client(create):
+    """
+    Create a client with unique name and email: new_client() returns its JSON.
+    """
+    def new_client():
+        unique = uuid.uuid4().hex[:12]
+        return create('/api/client/', {'name': f'Client {unique}', 'email': f'{unique}@example.com',
+                                       'phone': '910000000', 'address': 'Rua A'})
+    return new_client
@@ -0,0 +1,74 @@
+"""
+Batch reads (?ids= and POST /batch) and multiplexed requests (/api/batch).
+"""
+import uuid
+
+MISSING_ID = 10 ** 9
+
+
+def client_payload():
+    unique = uuid.uuid4().hex[:12]
+    return {'name': f'Client {unique}', 'email': f'{unique}@example.com', 'phone': '910000000', 'address': 'Rua A'}
+
+
+def test_ids_query_keeps_the_order_and_lists_missing_ids(client, new_client):
+    first, second = new_client()['client_id'], new_client()['client_id']
+    response = client.get(f'/api/client/?ids={second},{MISSING_ID},{first}')
+    assert response.status_code == 200
+    assert [row['client_id'] for row in response.get_json()] == [second, first]
+    assert response.headers['X-Missing-Ids'] == str(MISSING_ID)
+
+
+def test_batch_read_keeps_the_order_and_lists_missing_ids(client, new_client):
+    first, second = new_client()['client_id'], new_client()['client_id']
+    response = client.post('/api/client/batch', json={'ids': [MISSING_ID, second, first]})
+    assert response.status_code == 200
+    assert [row['client_id'] for row in response.get_json()] == [second, first]
+    assert response.headers['X-Missing-Ids'] == str(MISSING_ID)
+
+    response = client.post('/api/client/batch', json={'ids': [first]})
+    assert 'X-Missing-Ids' not in response.headers
+
+
+def test_invalid_ids_are_rejected(client):
+    assert client.get('/api/client/?ids=1,a').status_code == 400
+    assert client.post('/api/client/batch', json={'ids': ['a']}).status_code == 400
+
+
+def test_batch_commits_each_request(client):
+    response = client.post('/api/batch', json={'requests': [
+        {'method': 'POST', 'path': '/api/client/', 'body': client_payload()},
+        {'method': 'GET', 'path': f'/api/client/{MISSING_ID}'},
+    ]})
+    assert response.status_code == 200
+    created, missing = response.get_json()['responses']
+    assert (created['status'], missing['status']) == (201, 404)
+    assert created['headers']['X-Request-ID'].endswith('.0')
+    assert client.get(f"/api/client/{created['body']['client_id']}").status_code == 200
+
+
+def test_atomic_batch_rolls_back_on_failure(client):
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/client/', 'body': client_payload()},
+        {'method': 'POST', 'path': '/api/client/', 'body': client_payload()},
+        {'method': 'PATCH', 'path': f'/api/client/{MISSING_ID}', 'body': {'phone': '1'}},
+        {'method': 'POST', 'path': '/api/client/', 'body': client_payload()},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['committed'] is False
+    assert [entry['status'] for entry in data['responses']] == [201, 201, 404, 424]
+    assert data['responses'][3]['body']['status'] == 'error'
+    for entry in data['responses'][:2]:
+        assert client.get(f"/api/client/{entry['body']['client_id']}").status_code == 404
+
+
+def test_atomic_batch_commits_when_all_succeed(client):
+    response = client.post('/api/batch', json={'atomic': True, 'requests': [
+        {'method': 'POST', 'path': '/api/client/', 'body': client_payload()},
+        {'method': 'POST', 'path': '/api/client/', 'body': client_payload()},
+    ]})
+    data = response.get_json()
+    assert data['committed'] is True
+    for entry in data['responses']:
+        assert client.get(f"/api/client/{entry['body']['client_id']}").status_code == 200
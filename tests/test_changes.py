@@ -0,0 +1,97 @@
+"""
+Change log: incremental sync (/api/changes) and the server-sent events stream
+(/api/events) resumed from Last-Event-ID.
+"""
+import json
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from models.change_log import ChangeLog
+from utils.database import db
+
+
+@pytest.fixture
+def last_seq(app):
+    """
+    Sequence number of the last change recorded before the test.
+    """
+    with app.app_context():
+        return db.session.scalar(select(func.coalesce(func.max(ChangeLog.seq), 0)))
+
+
+def test_changes_are_paged(client, new_client, last_seq):
+    created = [new_client()['client_id'] for _ in range(3)]
+
+    page = client.get(f'/api/changes?since={last_seq}&limit=2').get_json()
+    assert [(change['entity'], change['id'], change['op']) for change in page['changes']] == [
+        ('client', created[0], 'create'), ('client', created[1], 'create')]
+    assert page['has_more'] is True
+    assert page['last_seq'] == page['changes'][-1]['seq']
+
+    page = client.get(f"/api/changes?since={page['last_seq']}&limit=2").get_json()
+    assert [change['id'] for change in page['changes']] == [created[2]]
+    assert page['has_more'] is False
+
+    # Nothing new: the consumer keeps its position
+    empty = client.get(f"/api/changes?since={page['last_seq']}").get_json()
+    assert empty == {'changes': [], 'last_seq': page['last_seq'], 'has_more': False}
+
+
+def test_changes_filtered_by_entity(client, create, new_client, last_seq):
+    client_id = new_client()['client_id']
+    setting = create('/api/setting/', {'key_name': uuid.uuid4().hex, 'value': 'v'})
+
+    changes = client.get(f'/api/changes?since={last_seq}&entity=setting').get_json()['changes']
+    assert [(change['entity'], change['id']) for change in changes] == [('setting', setting['setting_id'])]
+    assert changes[0]['version'] == setting['version']
+
+    changes = client.get(f'/api/changes?since={last_seq}&entity=setting&entity=client').get_json()['changes']
+    assert [change['entity'] for change in changes] == ['client', 'setting']
+    assert changes[0]['id'] == client_id
+
+    assert client.get('/api/changes?entity=unknown').status_code == 400
+    assert client.get('/api/changes?since=-1').status_code == 400
+
+
+def read_events(response, count):
+    """
+    Read the first events of an SSE stream, then close it. A keep-alive
+    comment means no event is pending: the reading stops there.
+    :return: list: (id, event name, data) of each event.
+    """
+    events = []
+    try:
+        for chunk in response.response:
+            message = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if message.startswith(':'):
+                break
+            fields = dict(line.split(': ', 1) for line in message.strip().split('\n') if ': ' in line)
+            if 'id' in fields:
+                events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+                if len(events) == count:
+                    break
+    finally:
+        response.close()
+    return events
+
+
+def test_events_resume_from_last_event_id(app, client, create, last_seq, monkeypatch):
+    monkeypatch.setitem(app.config, 'EVENTS_HEARTBEAT', 0.1)
+    task = create('/api/task/', {'description': 'Check', 'employee_id': 1, 'work_id': 1,
+                                 'start_date': '2025-01-06T09:00:00', 'status': 'pending'})
+    response = client.patch(f"/api/task/{task['task_id']}", json={'status': 'in_progress'})
+    assert response.status_code == 200
+
+    stream = client.get('/api/events?entity=task', headers={'Last-Event-ID': str(last_seq)}, buffered=False)
+    assert stream.mimetype == 'text/event-stream'
+    created, updated = read_events(stream, 2)
+    assert created[0] > last_seq
+    assert (created[1], created[2]['id'], created[2]['version']) == ('task.create', task['task_id'], 1)
+    assert (updated[1], updated[2]['id'], updated[2]['version']) == ('task.update', task['task_id'], 2)
+    assert updated[2]['data']['status'] == 'in_progress'
+
+    # Reconnecting after the first event only replays the second one
+    stream = client.get('/api/events?entity=task', headers={'Last-Event-ID': str(created[0])}, buffered=False)
+    assert read_events(stream, 1) == [updated]
@@ -0,0 +1,93 @@
+"""
+Employee availability (/api/employee/availability) and workload
+(/api/employee/<id>/workload, /api/employee/workload).
+"""
+import uuid
+from datetime import timedelta
+
+import pytest
+
+from utils.schedule import schedule
+
+
+@pytest.fixture
+def employee(create):
+    """
+    A new mechanic, without tasks.
+    """
+    unique = uuid.uuid4().hex[:12]
+    return create('/api/employee/', {'name': f'Employee {unique}', 'email': f'{unique}@example.com',
+                                     'phone': '910000000', 'role': 'mechanic', 'hired_date': '2024-01-01'})
+
+
+@pytest.fixture
+def add_task(create, employee):
+    def add_task(start, end=None, status='pending'):
+        task = {'description': 'Check', 'employee_id': employee['employee_id'], 'work_id': 1,
+                'start_date': start, 'status': status}
+        return create('/api/task/', task if end is None else {**task, 'end_date': end})
+    return add_task
+
+
+def available(client, employee, start, end):
+    response = client.get(f"/api/employee/availability?from={start}&to={end}&role={employee['role']}")
+    assert response.status_code == 200, response.get_json()
+    return employee['employee_id'] in [row['employee_id'] for row in response.get_json()]
+
+
+def test_availability_follows_the_tasks(client, employee, add_task):
+    task = add_task('2031-03-04T14:00:00', '2031-03-04T16:00:00')
+
+    assert not available(client, employee, '2031-03-04T13:00:00', '2031-03-04T14:30:00')
+    assert not available(client, employee, '2031-03-04T15:00:00', '2031-03-04T15:30:00')
+    # Windows are half-open: touching the task is not overlapping it
+    assert available(client, employee, '2031-03-04T16:00:00', '2031-03-04T17:00:00')
+    assert available(client, employee, '2031-03-04T12:00:00', '2031-03-04T14:00:00')
+
+    # A cancelled task frees the employee
+    assert client.patch(f"/api/task/{task['task_id']}", json={'status': 'cancelled'}).status_code == 200
+    assert available(client, employee, '2031-03-04T13:00:00', '2031-03-04T14:30:00')
+
+
+def test_task_without_end_date_occupies_its_start_day(client, employee, add_task):
+    add_task('2031-03-05T10:00:00')
+    assert not available(client, employee, '2031-03-05T20:00:00', '2031-03-05T21:00:00')
+    assert available(client, employee, '2031-03-06T08:00:00', '2031-03-06T09:00:00')
+
+
+def test_availability_in_the_current_week(client, employee, add_task):
+    # Served by the in-memory schedule of the week, refreshed by the task writes
+    start = schedule.current_week() + timedelta(days=2, hours=9)
+    add_task(start.isoformat(), (start + timedelta(hours=2)).isoformat())
+    assert not available(client, employee, (start + timedelta(hours=1)).isoformat(),
+                         (start + timedelta(hours=3)).isoformat())
+    assert available(client, employee, (start + timedelta(hours=2)).isoformat(),
+                     (start + timedelta(hours=3)).isoformat())
+
+
+def test_invalid_availability_window(client):
+    assert client.get('/api/employee/availability?from=2031-03-04T10:00:00').status_code == 400
+    assert client.get('/api/employee/availability?from=2031-03-04T10:00:00&to=2031-03-04T09:00:00').status_code == 400
+
+
+def test_workload(app, client, employee, add_task, monkeypatch):
+    monkeypatch.setitem(app.config, 'WORKLOAD_CACHE_TTL', 0)
+    week = schedule.current_week()
+    add_task('2031-03-04T09:00:00')
+    add_task('2031-03-04T09:00:00', status='in_progress')
+    add_task((week + timedelta(hours=8)).isoformat(), (week + timedelta(hours=10)).isoformat(), status='completed')
+    add_task((week - timedelta(days=7, hours=-8)).isoformat(), (week - timedelta(days=7, hours=-12)).isoformat(),
+             status='completed')
+    add_task('2031-03-04T09:00:00', '2031-03-05T09:00:00', status='cancelled')
+
+    response = client.get(f"/api/employee/{employee['employee_id']}/workload")
+    assert response.status_code == 200, response.get_json()
+    workload = response.get_json()
+    assert workload['open_tasks'] == 2
+    assert workload['completed_this_week'] == 1
+    assert workload['avg_task_hours'] == 3.0  # 2 h and 4 h; the cancelled task is not counted
+    assert workload['week_start'] == week.date().isoformat()
+
+    workloads = client.get('/api/employee/workload?role=mechanic').get_json()
+    assert workload in workloads
+    assert {row['role'] for row in workloads} == {'mechanic'}
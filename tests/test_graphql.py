@@ -0,0 +1,64 @@
+"""
+GraphQL cost limit and batch loading (services/graphql_service.py).
+
+The service is called directly, as /api/graphql is only registered when
+GRAPHQL_ENABLED is set; graphql-core is an optional dependency.
+"""
+import pytest
+
+pytest.importorskip('graphql')
+
+from benchmarks.queries import record_statements
+from config import Config
+from services.graphql_service import load_document, measure, relation_list_sizes, run_query
+from utils.database import db
+
+# Vehicle history screen: five levels below the vehicle, three of them lists
+HISTORY = '''
+query History($id: Int!) {
+  vehicle(id: $id) {
+    license_plate model
+    client { name email phone }
+    works { description status cost start_date end_date
+      tasks { description status start_date end_date
+        employee { name role tasks { description status start_date } }
+        invoice_items { description cost invoice { issued_at total total_with_iva } } } }
+  }
+}
+'''
+
+
+@pytest.fixture
+def statements(app):
+    """
+    The SQL statements sent while the test runs, in an application context.
+    """
+    with app.app_context():
+        yield record_statements(db.engine)
+
+
+def test_history_query_within_default_cost(statements):
+    document = load_document(HISTORY)
+    depth, cost = measure(document, variables={'id': 1}, list_sizes=relation_list_sizes())
+    assert depth <= Config.GRAPHQL_MAX_DEPTH
+    assert cost <= Config.GRAPHQL_MAX_COST
+
+    result = run_query(document, {'id': 1}, max_depth=Config.GRAPHQL_MAX_DEPTH, max_cost=Config.GRAPHQL_MAX_COST)
+    assert 'errors' not in result, result
+    assert result['data']['vehicle']['works']
+
+
+def test_root_list_cost_counts_ids():
+    document = load_document('{ works(ids: [1, 2, 3]) { cost } }')
+    assert measure(document) == (2, 1 + 3)
+
+
+def test_relations_batched_per_selection_level(statements):
+    document = load_document('{ work(id: 1) { tasks { task_id } } works(ids: [2, 3]) { tasks { task_id } } }')
+    run_query(document)  # Measures the list sizes first
+    statements.clear()
+    result = run_query(document)
+    assert 'errors' not in result, result
+    task_queries = [statement for statement in statements if 'FROM task WHERE task.work_id IN' in statement]
+    # One query per level, each for the works of its own level only
+    assert [statement.count('?') for statement in task_queries] == [1, 2]
@@ -0,0 +1,36 @@
+"""
+Cold-start checks (see benchmarks/importtime.py).
+
+The project modules must import within PROJECT_IMPORT_BUDGET_MS, and
+importing the api package must not load the namespaces (they are imported by
+api.register_namespaces() when the application is created). The time is the
+lowest of a few runs, as the interpreters compete with the rest of the machine.
+"""
+import os
+import subprocess
+import sys
+
+from benchmarks.importtime import PROJECT_MODULES, ROOT, import_profile
+
+PROJECT_IMPORT_BUDGET_MS = float(os.getenv('PROJECT_IMPORT_BUDGET_MS', 100))
+RUNS = 3
+
+
+def project_import_ms():
+    """
+    :return: float: Self time of the project modules in one cold start, in milliseconds.
+    """
+    return sum(self_us for module, self_us, _ in import_profile() if module.split('.')[0] in PROJECT_MODULES) / 1000
+
+
+def test_project_import_budget():
+    project_ms = min(project_import_ms() for _ in range(RUNS))
+    assert project_ms <= PROJECT_IMPORT_BUDGET_MS, f"project modules take {project_ms:.1f}ms"
+
+
+def test_api_import_does_not_load_namespaces():
+    code = "import sys, api; print(' '.join(sorted(sys.modules)))"
+    child = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    loaded = child.stdout.split()
+    assert [name for name in loaded if name.split('.')[0] in ('models', 'services')] == []
+    assert [name for name in loaded if name.startswith('api.') and name != 'api.spec'] == []
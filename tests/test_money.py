@@ -0,0 +1,84 @@
+"""
+Invoice totals: item costs summed in integer cents, IVA rounded half-up to the
+cent once per invoice, whether it is applied when an item changes or by the
+UPDATE that sets a new rate.
+"""
+from decimal import Decimal
+
+import pytest
+
+from utils.money import add_iva, check_rate, parse_rate, to_decimal
+
+
+@pytest.fixture
+def invoice(create, new_client):
+    def invoice(iva):
+        return create('/api/invoice/', {'client_id': new_client()['client_id'], 'iva': iva})
+    return invoice
+
+
+def add_item(create, invoice_id, cost):
+    return create('/api/invoice_items/', {'description': 'Part', 'cost': cost, 'invoice_id': invoice_id, 'task_id': 1})
+
+
+def test_amounts_round_half_up_to_the_cent():
+    assert to_decimal(50.5) == Decimal('50.50')
+    assert to_decimal(0.125) == Decimal('0.13')
+    assert to_decimal(-0.125) == Decimal('-0.13')
+    # 1.50 + 23 % = 1.845: float arithmetic would give 1.84
+    assert add_iva(Decimal('1.50'), Decimal('0.23')) == Decimal('1.85')
+
+
+def test_invoice_totals_are_exact(client, create, invoice):
+    invoice_id = invoice(0.23)['invoice_id']
+    add_item(create, invoice_id, 0.1)
+    add_item(create, invoice_id, 0.2)
+    add_item(create, invoice_id, 1.2)
+
+    data = client.get(f'/api/invoice/{invoice_id}').get_json()
+    assert data['total'] == 1.5  # Not 1.5000000000000002
+    assert data['total_with_iva'] == 1.85
+
+
+def test_new_rate_recomputes_the_totals(client, create, invoice):
+    invoice_id = invoice(0)['invoice_id']
+    add_item(create, invoice_id, 1.5)
+    assert client.get(f'/api/invoice/{invoice_id}').get_json()['total_with_iva'] == 1.5
+
+    # The totals are recomputed by the UPDATE that sets the rate, in integer arithmetic
+    response = client.patch(f'/api/invoice/{invoice_id}', json={'iva': 0.23})
+    assert response.status_code == 200
+    assert (response.get_json()['total'], response.get_json()['total_with_iva']) == (1.5, 1.85)
+
+    response = client.put(f'/api/invoice/{invoice_id}', json={'client_id': response.get_json()['client_id'], 'iva': 0.06})
+    assert (response.get_json()['total'], response.get_json()['total_with_iva']) == (1.5, 1.59)
+
+
+def test_deleting_an_item_recomputes_the_totals(client, create, invoice):
+    invoice_id = invoice(0.23)['invoice_id']
+    add_item(create, invoice_id, 1.5)
+    item = add_item(create, invoice_id, 10)
+    assert client.delete(f"/api/invoice_items/{item['item_id']}").status_code == 204
+    data = client.get(f'/api/invoice/{invoice_id}').get_json()
+    assert (data['total'], data['total_with_iva']) == (1.5, 1.85)
+
+
+def test_rates():
+    # The 'iva' setting may be written as a percentage
+    assert parse_rate('0,23') == parse_rate('23') == parse_rate('23%') == Decimal('0.23')
+    # Rates sent to the API must be fractions
+    assert check_rate(0.23) == Decimal('0.23')
+    assert check_rate(0) == 0
+    for value in (1, 23, -0.1):
+        with pytest.raises(ValueError):
+            check_rate(value)
+    with pytest.raises(TypeError):
+        check_rate('0.23')
+
+
+@pytest.mark.parametrize('iva', [23, 1, -0.01])
+def test_api_rejects_rates_that_are_not_fractions(client, invoice, iva):
+    assert client.post('/api/invoice/', json={'client_id': 1, 'iva': iva}).status_code == 400
+    invoice_id = invoice(0.23)['invoice_id']
+    assert client.patch(f'/api/invoice/{invoice_id}', json={'iva': iva}).status_code == 400
+    assert client.put(f'/api/invoice/{invoice_id}', json={'client_id': 1, 'iva': iva}).status_code == 400
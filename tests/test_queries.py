@@ -0,0 +1,42 @@
+"""
+Statement budgets of the create and list endpoints.
+
+The create budgets are the ones of benchmarks/queries.py: one INSERT ...
+RETURNING per row, its change_log entries and the documented side effects,
+and nothing read back after the commit. A list is a single SELECT.
+"""
+import pytest
+
+from benchmarks.queries import CREATES, record_statements
+from utils.database import db
+
+LISTS = [
+    '/api/client/', '/api/employee/', '/api/vehicle/', '/api/setting/',
+    '/api/task/', '/api/work/', '/api/invoice/', '/api/invoice_items/',
+]
+
+
+@pytest.fixture(scope='module')
+def statements(app):
+    """
+    The SQL statements sent to the database, cleared before each test.
+    """
+    with app.app_context():
+        return record_statements(db.engine)
+
+
+@pytest.mark.parametrize('path, payload, budget, select_budget, expected', CREATES, ids=[c[0] for c in CREATES])
+def test_create_statements(client, statements, path, payload, budget, select_budget, expected):
+    statements.clear()
+    response = client.post(path, json=payload)
+    assert response.status_code == 201, response.get_json()
+    assert len(statements) <= budget, f"expected {expected}, got: {statements}"
+    assert sum(statement.startswith('SELECT') for statement in statements) <= select_budget, statements
+
+
+@pytest.mark.parametrize('path', LISTS)
+def test_list_statements(client, statements, path):
+    statements.clear()
+    response = client.get(path)
+    assert response.status_code == 200, response.get_json()
+    assert len(statements) == 1 and statements[0].startswith('SELECT'), statements
@@ -0,0 +1,44 @@
+"""
+Response cache (utils/response_cache.py): cached GET responses are dropped
+when a write changes one of their tables, including rows deleted by
+ON DELETE CASCADE.
+"""
+import uuid
+
+import pytest
+
+from utils.response_cache import cache
+
+
+@pytest.fixture
+def cached_app(app, monkeypatch):
+    """
+    The application with the response cache enabled (conftest disables it).
+    """
+    monkeypatch.setitem(app.config, 'RESPONSE_CACHE_ENABLED', True)
+    cache.clear()
+    yield app
+    cache.clear()
+
+
+def test_cascade_delete_invalidates_cached_responses(cached_app, client, create, new_client):
+    owner = new_client()
+    vehicle = create('/api/vehicle/', {'brand': 'A', 'client_id': owner['client_id'],
+                                       'license_plate': uuid.uuid4().hex[:8], 'model': 'B', 'year': 2020})
+    vehicle_path = f"/api/vehicle/{vehicle['vehicle_id']}"
+    list_path = f"/api/vehicle/?ids={vehicle['vehicle_id']}"
+
+    assert client.get(vehicle_path).status_code == 200
+    assert len(client.get(list_path).get_json()) == 1
+    hits = cache.stats()['hits']
+    assert client.get(vehicle_path).status_code == 200
+    assert len(client.get(list_path).get_json()) == 1
+    assert cache.stats()['hits'] == hits + 2
+
+    # Deleting the client removes its vehicles in the database, not through the vehicle service
+    assert client.delete(f"/api/client/{owner['client_id']}").status_code == 204
+
+    assert client.get(vehicle_path).status_code == 404
+    response = client.get(list_path)
+    assert response.get_json() == []
+    assert response.headers['X-Missing-Ids'] == str(vehicle['vehicle_id'])
@@ -0,0 +1,96 @@
+"""
+Partial and conditional updates (PATCH, If-Match) and idempotent creates
+(Idempotency-Key).
+"""
+import uuid
+
+
+def test_patch_writes_null_and_zero(client, create, new_client):
+    vehicle = create('/api/vehicle/', {'brand': 'A', 'client_id': new_client()['client_id'],
+                                       'license_plate': uuid.uuid4().hex[:8], 'model': 'B', 'year': 2020})
+    work = create('/api/work/', {'cost': 12.5, 'description': 'Check', 'status': 'pending',
+                                 'vehicle_id': vehicle['vehicle_id'], 'start_date': '2025-01-06T09:00:00',
+                                 'end_date': '2025-01-10'})
+
+    response = client.patch(f"/api/work/{work['work_id']}", json={'end_date': None, 'cost': 0})
+    assert response.status_code == 200, response.get_json()
+    patched = response.get_json()
+    assert patched['end_date'] is None
+    assert patched['cost'] == 0
+    assert patched['description'] == 'Check'  # Absent fields are left unchanged
+    assert patched['version'] == work['version'] + 1
+
+
+def test_patch_rejects_invalid_fields(client, new_client):
+    client_id = new_client()['client_id']
+    for body, message in [
+        ({'phone': None}, "Field 'phone' cannot be null."),
+        ({'client_id': 7}, "Field 'client_id' cannot be updated."),
+        ({'created_at': '2025-01-01T00:00:00'}, "Field 'created_at' cannot be updated."),
+        ({'unknown': 1}, "Field 'unknown' cannot be updated."),
+        ({'phone': 910000000}, "Invalid value for field 'phone': expected a string."),
+    ]:
+        response = client.patch(f'/api/client/{client_id}', json=body)
+        assert response.status_code == 400
+        assert response.get_json() == {'message': message, 'status': 'error'}
+
+
+def test_patch_rejects_computed_invoice_totals(client, create, new_client):
+    invoice = create('/api/invoice/', {'client_id': new_client()['client_id'], 'iva': 0.23})
+    response = client.patch(f"/api/invoice/{invoice['invoice_id']}", json={'total': 100})
+    assert response.status_code == 400
+
+
+def test_stale_if_match_is_rejected(client, new_client):
+    row = new_client()
+    path = f"/api/client/{row['client_id']}"
+    etag = client.get(path).headers['ETag']
+
+    response = client.patch(path, json={'phone': '911111111'}, headers={'If-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    stale = {'If-Match': etag}
+    full = {name: row[name] for name in ('name', 'email', 'phone', 'address')}
+    assert client.patch(path, json={'phone': '912222222'}, headers=stale).status_code == 412
+    assert client.put(path, json=full, headers=stale).status_code == 412
+    assert client.delete(path, headers=stale).status_code == 412
+    assert client.get(path).get_json()['phone'] == '911111111'
+
+
+def test_if_none_match_returns_304(client, new_client):
+    client_id = new_client()['client_id']
+    etag = client.get(f'/api/client/{client_id}').headers['ETag']
+    response = client.get(f'/api/client/{client_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_idempotency_key_replays_the_first_response(client):
+    key = uuid.uuid4().hex
+    unique = uuid.uuid4().hex[:12]
+    payload = {'name': f'Client {unique}', 'email': f'{unique}@example.com', 'phone': '910000000', 'address': 'Rua A'}
+
+    first = client.post('/api/client/', json=payload, headers={'Idempotency-Key': key})
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+
+    # Same payload with the keys in another order: same request
+    retry = client.post('/api/client/', json=dict(reversed(payload.items())), headers={'Idempotency-Key': key})
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+
+    clients = client.get('/api/client/').get_json()
+    assert sum(row['name'] == payload['name'] for row in clients) == 1
+
+
+def test_idempotency_key_reused_for_another_request(client):
+    key = uuid.uuid4().hex
+    unique = uuid.uuid4().hex[:12]
+    payload = {'name': f'Client {unique}', 'email': f'{unique}@example.com', 'phone': '910000000', 'address': 'Rua A'}
+    assert client.post('/api/client/', json=payload, headers={'Idempotency-Key': key}).status_code == 201
+
+    response = client.post('/api/client/', json={**payload, 'phone': '919999999'}, headers={'Idempotency-Key': key})
+    assert response.status_code == 422
+    assert response.get_json()['status'] == 'error'
@@ -0,0 +1,71 @@
+# Asynchronous database access used by the ASGI read-only application (asgi.py).
+# It shares the table definitions of the models in models/ with the Flask app,
+# but talks to the database through SQLAlchemy's asyncio engine.
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from config import Config
+
+# Async drivers used for each synchronous dialect
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+# Flask-SQLAlchemy resolves relative SQLite paths against the instance folder
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance')
+
+
+def async_database_uri(uri):
+    """
+    Convert a synchronous database URI into its asyncio equivalent.
+    :param uri: Database URI as used by the Flask application (e.g. sqlite:///app.db).
+    :return: str: URI using an async driver (e.g. sqlite+aiosqlite:////abs/path/instance/app.db).
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == 'sqlite' and url.database and url.database != ':memory:' and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(INSTANCE_PATH, url.database))
+    return url.render_as_string(hide_password=False)
+
+
+# Engine and session factory, created lazily so importing this module has no side effects
+_engine = None
+_session_factory = None
+
+
+def get_engine():
+    """
+    Return the shared async engine, creating it on first use.
+    """
+    global _engine
+    if _engine is None:
+        uri = Config.ASYNC_DATABASE_URI or async_database_uri(Config.SQLALCHEMY_DATABASE_URI)
+        _engine = create_async_engine(uri, pool_pre_ping=True)
+    return _engine
+
+
+def get_session():
+    """
+    Return a new AsyncSession bound to the shared engine.
+    """
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(get_engine(), expire_on_commit=False)
+    return _session_factory()
+
+
+async def dispose_engine():
+    """
+    Close all pooled connections (called on application shutdown).
+    """
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _session_factory = None
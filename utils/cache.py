@@ -0,0 +1,52 @@
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Small thread-safe cache whose entries expire after a fixed number of seconds.
+    Used for aggregates that are expensive to compute and may be slightly
+    stale (e.g. employee workloads). Each worker process has its own copy.
+    """
+
+    def __init__(self, ttl=30.0, maxsize=1024):
+        """
+        :param ttl: Lifetime of an entry in seconds (0 disables the cache).
+        :param maxsize: Maximum number of entries; the oldest ones are evicted first.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = {}  # key -> (expiry time, value), in insertion order
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """
+        Return the cached value of a key, computing and storing it when missing or expired.
+        The value is computed outside the lock; concurrent misses may compute it twice.
+        :param key: Hashable cache key.
+        :param compute: Callable taking no arguments and returning the value.
+        :param ttl: Lifetime of a new entry, overriding the cache's default (e.g. from the app config).
+        :return: The cached or computed value.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return compute()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.maxsize:
+                self._entries.pop(next(iter(self._entries)))  # Evict the oldest entry
+            self._entries[key] = (now + ttl, value)
+        return value
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with self._lock:
+            self._entries.clear()
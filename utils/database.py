@@ -1,14 +1,330 @@
 # Import the necessary modules from Flask and SQLAlchemy
-from flask import Flask
+import sqlite3
+from contextlib import contextmanager
+from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import delete, event, func, inspect, literal_column, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import DeclarativeBase, Session
 
 # Base class for SQLAlchemy models. All model classes will inherit from this class.
 # This allows SQLAlchemy to recognize them as models and interact with the database.
 class Base(DeclarativeBase):
-  pass  # Placeholder for model classes, no extra functionality is added here.
+  # Fetch server-generated values (IDs, created_at defaults) in the INSERT/UPDATE itself
+  # with RETURNING, instead of a SELECT when the attribute is first read
+  __mapper_args__ = {'eager_defaults': True}
 
 # Create an instance of SQLAlchemy to manage database interactions
 # The 'model_class=Base' argument tells SQLAlchemy that all models will inherit from the Base class
 db = SQLAlchemy(model_class=Base)
 
+
+class Versioned:
+    """
+    Mixin adding a row version and a last-update timestamp to a model.
+    Both are maintained by the database: every UPDATE of the row, whether it
+    comes from update_row(), an ORM flush or a bulk UPDATE, also sets
+    version = version + 1 and updated_at = CURRENT_TIMESTAMP in the same
+    statement, so concurrent writers can never reuse a version.
+    The version is the row's ETag in the API (If-Match / If-None-Match).
+    """
+    version = db.Column(db.Integer, nullable=False, server_default='1',
+                        onupdate=literal_column('version') + 1)  # Bumped by every UPDATE
+    updated_at = db.Column(db.DateTime, default=func.now(), onupdate=func.now(), index=True)  # Last change (ix_<table>_updated_at)
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a conditional write (If-Match) targets a row whose version
+    has changed since the client read it. Nothing was written.
+    """
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """
+    Enforce foreign keys on every SQLite connection (they are off by default),
+    so the ON DELETE CASCADE clauses of the schema remove the dependent rows
+    of single-statement deletes.
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+
+
+def _row_filter(model, row_id, version):
+    """
+    WHERE clause selecting one row by primary key, and by version for conditional writes.
+    """
+    table = model.__table__
+    primary_key = table.primary_key.columns.values()[0]
+    if version is None:
+        return primary_key == row_id
+    return (primary_key == row_id) & (table.c.version == version)
+
+
+def _check_version_conflict(model, row_id, version):
+    """
+    Tell a version conflict from a missing row after a write that matched nothing.
+    Only runs when the conditional write failed, so successful writes stay one statement.
+    :raises VersionConflict: If the row exists with another version.
+    """
+    if version is None:
+        return
+    primary_key = model.__table__.primary_key.columns.values()[0]
+    if db.session.scalar(select(primary_key).where(primary_key == row_id)) is not None:
+        raise VersionConflict(f"{model.__tablename__} {row_id} is no longer at version {version}.")
+
+
+def update_row(model, row_id, values, version=None):
+    """
+    Update one row with a single UPDATE ... WHERE <primary key> = ? RETURNING <all columns>.
+    Nothing is read before the write: a missing row is detected from the
+    empty result, and the returned row is the state after the update.
+    With a version, the statement is UPDATE ... WHERE <primary key> = ? AND
+    version = ?, so the write only happens if nobody changed the row since
+    the client read it.
+    :param model: Model class of the row.
+    :param row_id: Primary key of the row.
+    :param values: dict: Column name -> new value. Empty to only fetch the row.
+    :param version: Version the row must still have (optional, see Versioned).
+    :return: dict: The updated row (column name -> value), or None if it does not exist.
+    :raises VersionConflict: If the row exists but its version differs.
+    """
+    table = model.__table__
+    primary_key = table.primary_key.columns.values()[0]
+    if not values:
+        # No-op SET that still returns the row; the version is not bumped for an empty change
+        values = {primary_key.name: primary_key}
+        if 'version' in table.c:
+            values.update(version=table.c.version, updated_at=table.c.updated_at)
+    row = db.session.execute(
+        update(model).where(_row_filter(model, row_id, version)).values(values).returning(*table.columns)
+    ).mappings().first()
+    if row is None:
+        _check_version_conflict(model, row_id, version)
+        return None
+    return dict(row)
+
+
+def delete_row(model, row_id, *columns, version=None):
+    """
+    Delete one row with a single DELETE ... WHERE <primary key> = ? RETURNING <columns>.
+    The row and its dependent rows (ON DELETE CASCADE) are never loaded.
+    :param model: Model class of the row.
+    :param row_id: Primary key of the row.
+    :param columns: Columns of the deleted row to return (default: the primary key).
+    :param version: Version the row must still have (optional, see update_row).
+    :return: Row: The requested values of the deleted row, or None if it did not exist.
+    :raises VersionConflict: If the row exists but its version differs.
+    """
+    table = model.__table__
+    primary_key = table.primary_key.columns.values()[0]
+    row = db.session.execute(
+        delete(model).where(_row_filter(model, row_id, version)).returning(*(columns or (primary_key,)))
+    ).first()
+    if row is None:
+        _check_version_conflict(model, row_id, version)
+    return row
+
+
+def changed_since(model, since):
+    """
+    Filter on the rows of a Versioned model changed at or after a point in time.
+    updated_at is stored by CURRENT_TIMESTAMP with a precision of one second,
+    so the bound value is normalized the same way (datetime()) and the bound
+    is inclusive: a client passing the latest updated_at it has seen may get
+    a row twice, but never misses one. Served by the ix_<table>_updated_at index.
+    :param model: Versioned model class.
+    :param since: datetime
+    :return: SQL expression for .where() / .filter().
+    """
+    return model.updated_at >= func.datetime(since)
+
+
+def in_id_order(rows, ids):
+    """
+    Order model instances fetched with WHERE <primary key> IN (ids) like the requested IDs.
+    The database returns them in index order; the requested order is restored
+    in Python instead of with an ORDER BY CASE over every ID.
+    :param rows: Model instances of one model.
+    :param ids: Requested primary keys, without duplicates.
+    :return: list: The rows in the order of ids (missing IDs are skipped).
+    """
+    if not rows:
+        return rows
+    key = inspect(type(rows[0])).primary_key[0].key
+    position = {row_id: index for index, row_id in enumerate(ids)}
+    return sorted(rows, key=lambda row: position[getattr(row, key)])
+
+
+def after_commit(callback):
+    """
+    Run a callback once the current database transaction is committed.
+    Callbacks are discarded if the transaction is rolled back, so they are
+    only used for side effects that must not happen for unsaved changes.
+    :param callback: Callable taking no arguments.
+    """
+    db.session.info.setdefault('after_commit', []).append(callback)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_after_commit_callbacks(session):
+    """
+    Run (and clear) the callbacks registered with after_commit().
+    """
+    for callback in session.info.pop('after_commit', []):
+        callback()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_commit_callbacks(session):
+    """
+    Discard the callbacks of a rolled back transaction.
+    """
+    session.info.pop('after_commit', None)
+
+
+# WSGI environ key set while the unit of work of a request is open
+UNIT_OF_WORK_KEY = 'garage.unit_of_work'
+
+
+class TransactionRolledBack(Exception):
+    """
+    Raised when a unit of work ends after one of its operations rolled back.
+    Nothing of the unit was committed.
+    """
+
+
+def commit():
+    """
+    Commit the session's changes, or only flush them inside a unit of work.
+    Services call this instead of db.session.commit(). Inside transaction() or
+    in the per-request unit of work mode (UNIT_OF_WORK) the changes are sent
+    to the database but committed once, when the outermost unit ends.
+    """
+    session = db.session()
+    if session.info.get('uow_depth'):
+        session.flush()
+        session.info['uow_pending'] = True
+    else:
+        session.commit()
+
+
+def rollback():
+    """
+    Roll back the session. Inside a unit of work the whole unit is rolled
+    back and nothing it does afterwards is committed.
+    """
+    session = db.session()
+    session.rollback()
+    if session.info.get('uow_depth'):
+        session.info['uow_failed'] = True
+
+
+def begin_unit_of_work():
+    """
+    Open a unit of work; nested units join the outermost one.
+    """
+    info = db.session.info
+    info['uow_depth'] = info.get('uow_depth', 0) + 1
+
+
+def end_unit_of_work(commit_changes=True):
+    """
+    Close a unit of work. The outermost unit commits the changes flushed by
+    commit(), unless an operation rolled back or commit_changes is False.
+    :param commit_changes: False to roll back the unit (e.g. on an exception).
+    :return: bool: True if this call committed the unit.
+    :raises TransactionRolledBack: If commit_changes is True but an operation of the unit rolled back.
+    """
+    session = db.session()
+    info = session.info
+    info['uow_depth'] -= 1
+    if not commit_changes:
+        info['uow_failed'] = True
+    if info['uow_depth'] > 0:
+        return False  # The outermost unit decides
+    failed = info.pop('uow_failed', False)
+    pending = info.pop('uow_pending', False)
+    if failed:
+        session.rollback()
+        if commit_changes:
+            raise TransactionRolledBack("An operation of the unit of work failed; nothing was committed.")
+        return False
+    if pending or session.new or session.dirty or session.deleted:
+        session.commit()
+        return True
+    return False
+
+
+def has_uncommitted_changes():
+    """
+    Whether the session holds changes that are not committed yet, e.g. the
+    writes of earlier requests of an atomic /api/batch. Reads in such a
+    transaction see data other requests cannot see.
+    :return: bool
+    """
+    session = db.session()
+    return bool(session.info.get('uow_pending') or session.new or session.dirty or session.deleted)
+
+
+@contextmanager
+def transaction():
+    """
+    Run several service calls in one database transaction:
+
+        with transaction():
+            work = create_work(...)
+            create_task(..., work_id=work['work_id'])
+
+    The services only flush; everything is committed once at the end of the
+    block, or rolled back if the block raises or one of the services fails.
+    Nested blocks, and blocks inside a request in UNIT_OF_WORK mode, join the
+    enclosing unit of work.
+    :raises TransactionRolledBack: If a service rolled back inside the block.
+    """
+    begin_unit_of_work()
+    try:
+        yield db.session
+    except BaseException:
+        end_unit_of_work(commit_changes=False)
+        raise
+    end_unit_of_work()
+
+
+def init_unit_of_work(app):
+    """
+    Enable the per-request unit of work when UNIT_OF_WORK is set: every request
+    runs in one transaction, committed once after the handler when the response
+    is successful (status < 400) and rolled back otherwise.
+    Resources whose class sets unit_of_work = False (the /api/batch endpoint)
+    manage their transactions themselves. Requests dispatched inside another
+    request (batch sub-requests) join its unit of work.
+    :param app: Flask application.
+    """
+    if not app.config.get('UNIT_OF_WORK'):
+        return
+
+    @app.before_request
+    def begin_request_unit_of_work():
+        view_class = getattr(app.view_functions.get(request.endpoint), 'view_class', None)
+        if getattr(view_class, 'unit_of_work', True):
+            begin_unit_of_work()
+            request.environ[UNIT_OF_WORK_KEY] = True
+
+    @app.after_request
+    def end_request_unit_of_work(response):
+        if request.environ.pop(UNIT_OF_WORK_KEY, False):
+            try:
+                end_unit_of_work(commit_changes=response.status_code < 400)
+            except TransactionRolledBack:
+                pass  # The failing service already produced the error response
+        return response
+
+    @app.teardown_request
+    def reset_request_unit_of_work(exc):
+        # The handler or a hook raised before the unit of this request was closed
+        if request.environ.pop(UNIT_OF_WORK_KEY, False):
+            end_unit_of_work(commit_changes=False)
@@ -0,0 +1,205 @@
+# In-process publish/subscribe of change events with cross-worker fan-out.
+#
+# Services record each change in the change_log table within their own
+# transaction (record_change). Every worker runs a single background poller
+# that reads new change_log rows and pushes them to the local subscribers
+# (the open /api/events streams), so the database is read once per worker
+# instead of once per connected client. Commits made in the same worker wake
+# the poller immediately; changes from other workers are picked up within
+# EVENTS_POLL_INTERVAL seconds.
+import json
+import logging
+import queue
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from models.change_log import ChangeLog
+from utils.database import after_commit, db
+from utils.table_versions import mark_changed, mark_deleted
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of change_log rows read per query
+BATCH_SIZE = 500
+
+
+def _json_default(value):
+    """
+    JSON encoder for values returned by the services (dates, datetimes and money amounts).
+    """
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)  # Amounts keep their JSON number form
+    return str(value)
+
+
+def record_change(entity, entity_id, op, payload):
+    """
+    Record a change in the change log as part of the current transaction.
+    The change is logged with the version of the row after it (the one
+    returned by INSERT/UPDATE ... RETURNING and sent in the row's ETag).
+    The local event broker is woken up, and the version of the entity's
+    table incremented, once the transaction is committed.
+    :param entity: Name of the changed entity (e.g. 'task').
+    :param entity_id: Primary key of the changed row.
+    :param op: Operation performed: 'create' or 'update' (deletes are logged by triggers).
+    :param payload: Dictionary with the row after the change, including its "version".
+    """
+    db.session.add(ChangeLog(
+        entity=entity,
+        entity_id=entity_id,
+        op=op,
+        version=payload["version"],
+        payload=json.dumps(payload, default=_json_default),
+    ))
+    mark_changed(entity)
+    after_commit(broker.wakeup)
+
+
+def notify_changes(entity):
+    """
+    Wake up the local event broker once the current transaction is committed,
+    for changes logged by the database itself (the delete triggers of
+    migration 0007, which also log the rows removed by ON DELETE CASCADE).
+    The versions of the entity's table and of the tables changed by the
+    cascades are incremented at the same time.
+    :param entity: Name of the entity whose rows are deleted (e.g. 'vehicle').
+    """
+    mark_deleted(entity)
+    after_commit(broker.wakeup)
+
+
+def serialize_change(change):
+    """
+    Convert a ChangeLog row into the event dictionary sent to clients.
+    """
+    return {
+        "seq": change.seq,
+        "entity": change.entity,
+        "id": change.entity_id,
+        "op": change.op,
+        "version": change.version,
+        "data": json.loads(change.payload) if change.payload else None,
+        "created_at": change.created_at.isoformat() if change.created_at else None,
+    }
+
+
+def fetch_changes(after_seq, entities=None, limit=BATCH_SIZE):
+    """
+    Read changes recorded after a sequence number.
+    :param after_seq: Only changes with a greater sequence number are returned.
+    :param entities: Optional list of entity names to filter on.
+    :param limit: Maximum number of changes to return.
+    :return: list: Event dictionaries ordered by sequence number.
+    """
+    query = select(ChangeLog).where(ChangeLog.seq > after_seq)
+    if entities:
+        query = query.where(ChangeLog.entity.in_(entities))
+    query = query.order_by(ChangeLog.seq).limit(limit)
+    return [serialize_change(change) for change in db.session.scalars(query)]
+
+
+class EventBroker:
+    """
+    Fans out change_log rows to the subscribers of this worker process.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.entities = []
+        self.poll_interval = 1.0
+        self.queue_size = 1000
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.last_seq = 0
+
+    def init_app(self, app):
+        """
+        Bind the broker to the Flask application and read its settings.
+        """
+        self.app = app
+        self.entities = app.config['EVENTS_ENTITIES']
+        self.poll_interval = app.config['EVENTS_POLL_INTERVAL']
+        self.queue_size = app.config['EVENTS_QUEUE_SIZE']
+        app.extensions['event_broker'] = self
+
+    def wakeup(self):
+        """
+        Ask the poller to read the change log now (called after local commits).
+        """
+        self._wakeup.set()
+
+    def subscribe(self):
+        """
+        Register a new subscriber queue, starting the poller on first use.
+        The poller is started lazily so that no thread exists before
+        gunicorn forks its workers.
+        :return: tuple: Queue receiving event dictionaries and the sequence
+            number from which events will be delivered.
+        """
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if not self._subscribers:
+                # The log is not read while nobody listens; start from its current end
+                with self.app.app_context():
+                    self.last_seq = db.session.scalar(select(func.coalesce(func.max(ChangeLog.seq), 0)))
+                    db.session.remove()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+                self._thread.start()
+            self._subscribers.add(subscriber)
+            return subscriber, self.last_seq
+
+    def unsubscribe(self, subscriber):
+        """
+        Remove a subscriber queue.
+        """
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _publish(self, event):
+        """
+        Push an event to every subscriber, dropping it for subscribers that
+        stopped reading (they resume from the change log on reconnect).
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                logger.warning("Event subscriber queue full, dropping event %s", event["seq"])
+
+    def _run(self):
+        """
+        Poller loop: read new change_log rows and publish them.
+        """
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                if not self._subscribers:
+                    continue
+            try:
+                with self.app.app_context():
+                    events = fetch_changes(self.last_seq, self.entities)
+                    db.session.remove()
+            except Exception as e:
+                logger.error("Error reading the change log: %s", e)
+                continue
+            for event in events:
+                self.last_seq = event["seq"]
+                self._publish(event)
+            if len(events) == BATCH_SIZE:
+                # More rows are pending, read again without waiting
+                self._wakeup.set()
+
+
+# Broker shared by the whole worker process
+broker = EventBroker()
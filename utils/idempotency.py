@@ -0,0 +1,177 @@
+# Idempotency keys for the create endpoints.
+#
+# Clients retrying a POST (e.g. on a flaky connection) send the same
+# Idempotency-Key header with every attempt. The first attempt runs the
+# handler and stores its response in the idempotency_key table, in the same
+# transaction as the rows it creates; the retries get the stored response
+# back without running the handler again.
+import hashlib
+import json
+import logging
+import threading
+import time
+from functools import wraps
+
+from flask import Response, current_app, request
+from flask_restx import abort
+from flask_restx.utils import unpack
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from models.idempotency_key import IdempotencyKey
+from utils.database import db, transaction
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Swagger documentation of the header, for @ns.doc(params=...)
+IDEMPOTENCY_KEY_PARAM = {
+    HEADER: {
+        'in': 'header',
+        'type': 'string',
+        'description': 'Unique key of the request (e.g. a UUID): a retry with the same key '
+                       'returns the stored response instead of creating the resource again',
+    }
+}
+
+# Expired keys are purged at most once per IDEMPOTENCY_PURGE_INTERVAL in each worker
+_purge_lock = threading.Lock()
+_next_purge = 0.0
+
+
+def request_hash():
+    """
+    Fingerprint of the current request: method, path and JSON body.
+    The body is hashed in canonical form (sorted keys, no whitespace), so a
+    client re-encoding the same payload still matches its first attempt.
+    :return: bytes: SHA-256 digest.
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        body = request.get_data()
+    else:
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode('utf-8'))
+    digest.update(body)
+    return digest.digest()
+
+
+def _expiry():
+    """
+    Creation time before which a key has expired, computed by the database
+    in the format of CURRENT_TIMESTAMP.
+    """
+    return func.datetime('now', f"-{current_app.config['IDEMPOTENCY_KEY_TTL']} seconds")
+
+
+def find_response(key):
+    """
+    :param key: Idempotency key.
+    :return: Row: request_hash, status and body of the stored response, or None if the key is unused or expired.
+    """
+    return db.session.execute(
+        select(IdempotencyKey.request_hash, IdempotencyKey.status, IdempotencyKey.body)
+        .where(IdempotencyKey.key == key, IdempotencyKey.created_at >= _expiry())
+    ).first()
+
+
+def reserve_key(key, digest):
+    """
+    Claim a key for the current request with a single INSERT ... ON CONFLICT.
+    An expired row with the same key is taken over. While a concurrent
+    request holding the key is not committed, the INSERT waits for it.
+    :return: bool: True if the key was claimed, False if another request already used it.
+    """
+    statement = insert(IdempotencyKey).values(key=key, request_hash=digest)
+    statement = statement.on_conflict_do_update(
+        index_elements=[IdempotencyKey.key],
+        set_={
+            'request_hash': statement.excluded.request_hash,
+            'status': None,
+            'body': None,
+            'created_at': func.now(),
+        },
+        where=IdempotencyKey.created_at < _expiry(),
+    )
+    return db.session.execute(statement.returning(IdempotencyKey.key)).first() is not None
+
+
+def store_response(key, status, data):
+    """
+    Store the response of the request holding a key (in the request's transaction).
+    :param key: Idempotency key claimed by reserve_key().
+    :param status: HTTP status code of the response.
+    :param data: Marshalled body of the response.
+    """
+    db.session.execute(
+        IdempotencyKey.__table__.update()
+        .where(IdempotencyKey.key == key)
+        .values(status=status, body=json.dumps(data) + '\n')
+    )
+
+
+def purge_expired_keys():
+    """
+    Delete the expired keys (served by the created_at index).
+    Runs in the caller's transaction, at most once per IDEMPOTENCY_PURGE_INTERVAL.
+    """
+    global _next_purge
+    now = time.monotonic()
+    with _purge_lock:
+        if now < _next_purge:
+            return
+        _next_purge = now + current_app.config['IDEMPOTENCY_PURGE_INTERVAL']
+    purged = db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < _expiry())).rowcount
+    if purged:
+        logger.info("Purged %s expired idempotency keys", purged)
+
+
+def replay(stored, digest):
+    """
+    Response of a retried request, rebuilt from the stored one.
+    :raises UnprocessableEntity: If the key was used for a different request.
+    """
+    if stored.request_hash != digest:
+        abort(422, f"The {HEADER} was already used for a different request.")
+    return Response(stored.body, status=stored.status, mimetype='application/json',
+                    headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(func):
+    """
+    Decorator making a create endpoint idempotent for requests with an
+    Idempotency-Key header. Place it above @ns.marshal_with so that the
+    stored response is the marshalled one.
+
+    - First request with a key: the key is claimed, the handler runs and its
+      response is stored, all in one transaction. If the handler fails,
+      nothing is stored and the key can be retried.
+    - Retry with the same key and request: the stored response is returned
+      (with an Idempotent-Replayed header); the handler does not run.
+    - Same key with a different request: 422 Unprocessable Entity.
+    Requests without the header are not affected.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return func(*args, **kwargs)
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            abort(400, f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters long.")
+        digest = request_hash()
+
+        stored = find_response(key)  # Retries only read
+        if stored is not None:
+            return replay(stored, digest)
+
+        with transaction():
+            if not reserve_key(key, digest):
+                # A concurrent attempt with the same key committed first
+                return replay(find_response(key), digest)
+            data, status, headers = unpack(func(*args, **kwargs))
+            store_response(key, status, data)
+            purge_expired_keys()
+        return data, status, headers
+    return wrapper
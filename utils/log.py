@@ -0,0 +1,244 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import g, has_request_context, request
+
+# Attributes of every LogRecord; anything else was passed through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+# Listener writing the queued records, set by configure_logging
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format log records as one JSON object per line.
+    Fields passed with `extra` (e.g. status, duration_ms) are added as
+    top-level keys next to the timestamp, level, logger and message.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Logging filter letting through at most `burst` records per `interval`
+    seconds for each logger and message template, so that a client hammering
+    a failing endpoint cannot flood the logs. Records are grouped by their
+    unformatted message, which is why log calls use %-style arguments instead
+    of f-strings. The first record of a new window reports how many similar
+    records were dropped in the previous one in its `suppressed` field.
+    """
+
+    def __init__(self, burst=10, interval=60.0, level=logging.WARNING):
+        """
+        :param burst: Records allowed per logger and template in each window.
+        :param interval: Length of a window in seconds.
+        :param level: Records below this level are never limited.
+        """
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.level = level
+        self._windows = {}  # (logger name, template) -> [window start, records let through, records dropped]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if len(self._windows) >= 10000:
+                    self._windows.clear()  # Bound the memory used by unusual templates
+                self._windows[key] = [now, 1, 0]
+                if window is not None and window[2]:
+                    record.suppressed = window[2]  # Similar records dropped in the previous window
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the INFO and DEBUG records while the log queue is
+    backed up. Warnings and errors are always kept.
+    """
+
+    def __init__(self, log_queue, rate=0.1, high_water=1000):
+        """
+        :param log_queue: Queue between the request threads and the listener.
+        :param rate: Fraction of the INFO/DEBUG records kept under load (1.0 keeps everything).
+        :param high_water: Number of pending records from which sampling starts (0 always samples).
+        """
+        super().__init__()
+        self.log_queue = log_queue
+        self.rate = rate
+        self.high_water = high_water
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        if self.log_queue.qsize() < self.high_water:
+            return True
+        return random.random() < self.rate
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Add the request id, method and path to records logged while handling a request.
+    Runs on the request thread, before the record is queued.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(g, 'request_id', None)
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the request thread.
+    The message is formatted with its arguments before queuing (the arguments
+    may change once the call returns); the JSON encoding and the I/O happen in
+    the listener thread. Records are dropped when the queue is full.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))  # Copy: other handlers may still use the original
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None  # Tracebacks hold frames that must not outlive the request
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # Dropping a record is better than stalling a request
+
+
+def configure_logging(level=logging.INFO, log_file=None, log_format='json', rate_limit_burst=10,
+                      rate_limit_interval=60.0, queue_size=10000, sample_rate=1.0, sample_high_water=1000):
+    """
+    Configure the logging system for the application.
+    Called once by create_app; modules only create their own loggers so that
+    importing them has no side effects. Later calls are no-ops.
+    Records are put on a bounded queue by the request threads and written by a
+    QueueListener thread, so slow disks do not add to request latency.
+    :param level: Minimum level of the logged messages.
+    :param log_file: Optional file receiving the log messages instead of the console.
+    :param log_format: 'json' for one JSON object per line, 'text' for plain lines.
+    :param rate_limit_burst: Warnings and errors logged per message template and interval (0 disables the limit).
+    :param rate_limit_interval: Rate limiting interval in seconds.
+    :param queue_size: Maximum number of records waiting to be written.
+    :param sample_rate: Fraction of INFO/DEBUG records kept while the queue is backed up.
+    :param sample_high_water: Pending records from which INFO/DEBUG records are sampled.
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return  # Already configured (by this function or by the embedding server)
+
+    handler = (
+        logging.FileHandler(log_file, mode='a') if log_file  # Logs to file (e.g. app.log)
+        else logging.StreamHandler()  # Logs to console
+    )
+    handler.setFormatter(
+        JsonFormatter() if log_format == 'json'
+        else logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')  # Log message format
+    )
+
+    log_queue = queue.Queue(queue_size)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    # Filters run on the request thread and drop records before they are copied and queued
+    if rate_limit_burst:
+        queue_handler.addFilter(RateLimitFilter(rate_limit_burst, rate_limit_interval))
+    queue_handler.addFilter(SamplingFilter(log_queue, sample_rate, sample_high_water))
+    queue_handler.addFilter(RequestContextFilter())
+
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # Flush the pending records on exit
+
+
+def _restart_listener():
+    """
+    Start a new listener in a forked child (e.g. gunicorn workers with preload_app).
+    The parent's listener thread does not exist in the child, and its queue may
+    have been locked at fork time, so the child gets a new queue as well.
+    """
+    global _listener
+    if _listener is None:
+        return
+    queue_handler = next(h for h in logging.getLogger().handlers if isinstance(h, NonBlockingQueueHandler))
+    log_queue = queue.Queue(queue_handler.queue.maxsize)
+    queue_handler.queue = log_queue
+    for log_filter in queue_handler.filters:
+        if isinstance(log_filter, SamplingFilter):
+            log_filter.log_queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+os.register_at_fork(after_in_child=_restart_listener)
+
+
+def init_request_logging(app):
+    """
+    Assign an id to every request and log its completion with its duration.
+    The id is taken from the X-Request-ID header when the client (or a proxy)
+    sends one, and is returned in the response's X-Request-ID header.
+    :param app: Flask application.
+    """
+    logger = logging.getLogger('request')
+
+    @app.before_request
+    def start_request_timer():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        started = g.get('request_started')
+        if started is None:
+            return response  # before_request did not run (e.g. error raised by an earlier hook)
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        response.headers['X-Request-ID'] = g.request_id
+        logger.info("%s %s %s", request.method, request.path, response.status_code,
+                    extra={"status": response.status_code, "duration_ms": duration_ms})
+        return response
@@ -0,0 +1,76 @@
+# Minimal SQL migration runner.
+# Migrations are plain SQL files in migrations/, applied in file name order.
+# Applied migrations are recorded in the 'schema_migration' table.
+import logging
+import os
+import sqlite3
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import text
+
+from utils.database import db
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+def split_statements(sql):
+    """
+    Split a SQL script into individual statements.
+    A statement ends at the first semicolon that completes it, so the
+    semicolons inside a CREATE TRIGGER ... BEGIN ... END body do not split it.
+    :param sql: Content of a migration file.
+    :return: list: Statements without comments or trailing semicolons.
+    """
+    statements, current = [], []
+    for line in sql.splitlines():
+        if line.strip().startswith('--'):
+            continue
+        current.append(line)
+        if sqlite3.complete_statement('\n'.join(current)):
+            statements.append('\n'.join(current).strip().rstrip(';').strip())
+            current = []
+    if '\n'.join(current).strip():
+        statements.append('\n'.join(current).strip().rstrip(';').strip())  # Last statement without a semicolon
+    return statements
+
+
+def apply_migrations(engine):
+    """
+    Apply all pending migrations, each one in its own transaction.
+    :param engine: SQLAlchemy engine of the target database.
+    :return: list: Names of the migrations applied.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migration ("
+            "name TEXT PRIMARY KEY, applied_at DATETIME DEFAULT (CURRENT_TIMESTAMP))"
+        ))
+        applied = set(conn.execute(text("SELECT name FROM schema_migration")).scalars())
+
+    names = sorted(name for name in os.listdir(MIGRATIONS_PATH) if name.endswith('.sql'))
+    pending = [name for name in names if name not in applied]
+    for name in pending:
+        with open(os.path.join(MIGRATIONS_PATH, name), encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+            conn.execute(text("INSERT INTO schema_migration (name) VALUES (:name)"), {"name": name})
+        logger.info("Applied migration %s", name)
+    return pending
+
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """
+    Apply pending SQL migrations to the configured database.
+    """
+    applied = apply_migrations(db.engine)
+    if applied:
+        click.echo(f"Applied: {', '.join(applied)}")
+    else:
+        click.echo("Database is up to date.")
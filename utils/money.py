@@ -0,0 +1,114 @@
+# Exact money arithmetic.
+#
+# Amounts are stored as integer cents and handled as Decimal in Python, so
+# sums done by the database (SUM over integers) and totals computed by the
+# services are exact. The API keeps exchanging amounts in euros as JSON
+# numbers; the conversion happens in the column types below.
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import Float, Integer
+from sqlalchemy.types import TypeDecorator
+
+CENT = Decimal('0.01')
+
+
+def to_decimal(value):
+    """
+    Convert an amount (int, float, Decimal or string) into a Decimal rounded to the cent.
+    Floats are converted through their shortest repr, so 50.5 becomes exactly 50.50.
+    :param value: Amount in euros, or None.
+    :return: Decimal or None
+    """
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def to_cents(value):
+    """
+    :param value: Amount in euros, or None.
+    :return: int: The amount in cents, or None.
+    """
+    amount = to_decimal(value)
+    return None if amount is None else int(amount * 100)
+
+
+def from_cents(cents):
+    """
+    :param cents: Amount in cents, or None.
+    :return: Decimal: The amount in euros, or None.
+    """
+    return None if cents is None else (Decimal(int(cents)) / 100).quantize(CENT)
+
+
+def parse_rate(value):
+    """
+    Parse a tax rate as written in the settings: '0,23', '0.23' or '23' (percent).
+    Only for the settings, which are free text: rates received by the API are checked by check_rate.
+    :param value: Rate as a string or number.
+    :return: Decimal: The rate as a fraction (e.g. Decimal('0.23')).
+    """
+    rate = Decimal(str(value).strip().replace(',', '.').rstrip('%'))
+    return rate / 100 if rate >= 1 else rate
+
+
+def check_rate(value):
+    """
+    Validate a tax rate received by the API: a JSON number holding a fraction
+    in [0, 1) (e.g. 0.23). The unit is never guessed, so 23 is rejected rather
+    than read as a percentage.
+    :param value: Rate as a JSON number.
+    :return: Decimal: The rate (e.g. Decimal('0.23')).
+    :raises TypeError: If the value is not a number.
+    :raises ValueError: If the value is not a fraction in [0, 1).
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+        raise TypeError("expected a number")
+    rate = Decimal(str(value))
+    if not (rate.is_finite() and 0 <= rate < 1):
+        raise ValueError(f"The IVA rate must be a fraction between 0 and 1 (e.g. 0.23), got {value}.")
+    return rate
+
+
+def add_iva(total, rate):
+    """
+    Total with IVA, rounded half-up to the cent.
+    :param total: Amount before IVA (Decimal).
+    :param rate: IVA rate as a fraction (Decimal).
+    :return: Decimal
+    """
+    return to_decimal(total + total * rate)
+
+
+class Money(TypeDecorator):
+    """
+    Amount in euros stored as integer cents. Accepts ints, floats, Decimals and
+    numeric strings; returns Decimals with two decimal places. SQL aggregates
+    over a Money column (SUM, window sums) get the same conversion.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return from_cents(value)
+
+
+class Rate(TypeDecorator):
+    """
+    Tax rate stored as a REAL fraction (e.g. 0.23) and returned as an exact Decimal.
+    """
+
+    impl = Float
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else float(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else Decimal(repr(value))
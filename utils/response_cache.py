@@ -0,0 +1,154 @@
+# Cache of serialized GET responses, invalidated by table versions.
+#
+# GET handlers tagged with @cached(<tables>) have their responses kept as
+# JSON bytes, keyed by the normalized request (path, query parameters and
+# credentials), which determines the statements the handler runs and their
+# parameters. An entry records the versions of its tables when it was
+# computed (see utils/table_versions.py); once any of them changes, in this
+# worker or another one, the entry is stale and the handler runs again.
+# Each worker has its own cache, limited in bytes (least recently used
+# entries are evicted first).
+import threading
+from collections import OrderedDict
+from functools import wraps
+from operator import itemgetter
+
+from flask import Response, current_app, request
+
+from utils.database import has_uncommitted_changes
+from utils.table_versions import table_versions
+
+# Request headers that scope a response to a client
+SCOPE_HEADERS = ('Authorization', 'Cookie')
+
+# Estimated memory used by an entry besides its body and headers
+ENTRY_OVERHEAD = 256
+
+
+def cached(*tables):
+    """
+    Decorator tagging a GET method of a resource as cacheable by response_cache.
+    Place it above the other decorators.
+    :param tables: Names of the tables the response is read from.
+    """
+    def decorator(func):
+        func.cache_tables = tables
+        return func
+    return decorator
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of responses, limited by the bytes they use.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (versions, status, headers, body, size)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0}
+
+    def get(self, key, versions):
+        """
+        :return: tuple: (status, headers, body) of the entry, or None if it is missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] != versions:
+                self._stats['stale'] += 1
+                self._remove(key)
+                return None
+            self._stats['hits'] += 1
+            self._entries.move_to_end(key)
+            return entry[1:4]
+
+    def put(self, key, versions, status, headers, body):
+        """
+        Store a response, evicting the least recently used entries to stay
+        within max_bytes. Responses larger than a quarter of it are not stored.
+        """
+        size = len(body) + sum(len(name) + len(value) for name, value in headers) + ENTRY_OVERHEAD
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.size + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+            self._entries[key] = (versions, status, headers, body, size)
+            self.size += size
+
+    def _remove(self, key):
+        self.size -= self._entries.pop(key)[4]
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Counters of this worker: hits, misses, stale (entries dropped because a
+        table changed), evictions, and the current entries and bytes.
+        :return: dict
+        """
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries), 'bytes': self.size}
+
+
+cache = ResponseCache()
+
+
+def init_response_cache(app):
+    """
+    Size the response cache from RESPONSE_CACHE_MAX_BYTES.
+    :param app: Flask application.
+    """
+    cache.max_bytes = app.config['RESPONSE_CACHE_MAX_BYTES']
+    cache.clear()
+
+
+def request_key():
+    """
+    Key of the current request: path, query parameters (in a normalized
+    order; repeated parameters keep their order) and the SCOPE_HEADERS.
+    """
+    query = tuple(sorted(request.args.items(multi=True), key=itemgetter(0)))
+    return request.path, query, tuple(request.headers.get(name) for name in SCOPE_HEADERS)
+
+
+def response_cache(view):
+    """
+    Decorator of view functions (see Api decorators) serving the GET methods
+    tagged with @cached from the cache. Only 200 responses that are not
+    streamed are stored. Reads of a transaction holding uncommitted changes
+    (e.g. inside an atomic /api/batch) bypass the cache.
+    """
+    method = getattr(getattr(view, 'view_class', None), 'get', None)
+    tables = getattr(method, 'cache_tables', None)
+    if not tables:
+        return view
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or not current_app.config['RESPONSE_CACHE_ENABLED'] or has_uncommitted_changes():
+            return view(*args, **kwargs)
+        key = request_key()
+        versions = table_versions.get(tables)  # Read before the handler: a concurrent commit makes the entry stale
+        entry = cache.get(key, versions)
+        if entry is not None:
+            status, headers, body = entry
+            return Response(body, status=status, headers=headers)
+        response = view(*args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200 and not response.is_streamed:
+            cache.put(key, versions, response.status_code, list(response.headers), response.get_data())
+        return response
+    return wrapper
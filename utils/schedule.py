@@ -0,0 +1,186 @@
+# In-memory schedule of the employees for the current week.
+#
+# Availability queries ("which mechanics are free between 14:00 and 16:00
+# tomorrow") are answered from per-employee lists of busy intervals sorted by
+# start time. The lists only hold the tasks overlapping the current week; they
+# are built once from the task table and then kept up to date from the
+# change_log 'task' entries, so every worker sees the writes of the others
+# without re-reading the tasks. Windows outside the current week are answered
+# from the database through the (employee_id, start_date, end_date) index.
+import bisect
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from models.change_log import ChangeLog
+from models.task import Task
+from utils.database import db
+from utils.events import fetch_changes, BATCH_SIZE
+from utils.utils import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+# Tasks in these states do not keep an employee busy
+INACTIVE_STATUSES = ('cancelled',)
+
+
+def task_interval(start_date, end_date):
+    """
+    Busy interval [start, end) of a task.
+    Task dates are often stored without a time: an end date at midnight
+    covers that whole day, and a task without an end date occupies the rest
+    of its start day.
+    :param start_date: Start of the task (datetime, date or ISO string).
+    :param end_date: End of the task (datetime, date, ISO string or None).
+    :return: tuple: (start, end) datetimes.
+    """
+    start = parse_datetime(start_date).replace(tzinfo=None)
+    end = parse_datetime(end_date)
+    if end is None:
+        end = datetime(start.year, start.month, start.day) + timedelta(days=1)
+    else:
+        end = end.replace(tzinfo=None)
+        if end.time() == datetime.min.time():
+            end += timedelta(days=1)
+    return start, end
+
+
+def fetch_busy_intervals(start, end, employee_ids=None):
+    """
+    Read the busy intervals overlapping [start, end) from the database.
+    The range condition on start_date and the day-level condition on end_date
+    are both served by the ix_task_employee_schedule index; the exact overlap
+    is checked on the normalized intervals.
+    :param start: Start of the window (naive datetime).
+    :param end: End of the window (naive datetime).
+    :param employee_ids: Optional list of employees to read.
+    :return: dict: employee_id -> list of (start, end, task_id) sorted by start.
+    """
+    query = select(Task.task_id, Task.employee_id, Task.start_date, Task.end_date).where(
+        Task.start_date < end,
+        # Dates may be stored with or without a time; compare days to keep both
+        func.coalesce(func.date(Task.end_date), func.date(Task.start_date)) >= start.date().isoformat(),
+        Task.status.notin_(INACTIVE_STATUSES),
+    )
+    if employee_ids is not None:
+        query = query.where(Task.employee_id.in_(employee_ids))
+    intervals = {}
+    for task_id, employee_id, start_date, end_date in db.session.execute(query):
+        task_start, task_end = task_interval(start_date, end_date)
+        if task_start < end and task_end > start:
+            intervals.setdefault(employee_id, []).append((task_start, task_end, task_id))
+    for employee_intervals in intervals.values():
+        employee_intervals.sort()
+    return intervals
+
+
+def overlaps(intervals, start, end):
+    """
+    Check whether any interval of a sorted list overlaps [start, end).
+    :param intervals: List of (start, end, task_id) sorted by start.
+    :return: bool: True if the employee is busy during the window.
+    """
+    # Intervals starting before the end of the window; (end,) sorts before (end, ...)
+    candidates = bisect.bisect_left(intervals, (end,))
+    return any(interval_end > start for _, interval_end, _ in intervals[:candidates])
+
+
+class WeekSchedule:
+    """
+    Busy intervals of every employee for the current week (Monday to Sunday).
+    """
+
+    def __init__(self):
+        self.week_start = None
+        self.last_seq = 0  # Last change_log entry applied
+        self._intervals = {}  # employee_id -> sorted list of (start, end, task_id)
+        self._tasks = {}  # task_id -> (employee_id, interval) for removals
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def current_week():
+        """
+        :return: datetime: Monday 00:00 of the current week.
+        """
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=today.weekday())
+
+    def covers(self, start, end):
+        """
+        Check whether a window lies within the current week.
+        """
+        week_start = self.current_week()
+        return week_start <= start and end <= week_start + timedelta(days=7)
+
+    def refresh(self):
+        """
+        Bring the schedule up to date: rebuild it when the week changed,
+        otherwise apply the task changes recorded since the last refresh.
+        """
+        week_start = self.current_week()
+        if week_start != self.week_start:
+            self._rebuild(week_start)
+            return
+        while True:
+            changes = fetch_changes(self.last_seq, ['task'])
+            for change in changes:
+                self._apply(change)
+                self.last_seq = change['seq']
+            if len(changes) < BATCH_SIZE:
+                break
+
+    def _rebuild(self, week_start):
+        # Read the log position first: changes made while loading are applied again, which is harmless
+        self.last_seq = db.session.scalar(select(func.coalesce(func.max(ChangeLog.seq), 0)))
+        self._intervals = fetch_busy_intervals(week_start, week_start + timedelta(days=7))
+        self._tasks = {
+            task_id: (employee_id, (start, end, task_id))
+            for employee_id, intervals in self._intervals.items()
+            for start, end, task_id in intervals
+        }
+        self.week_start = week_start
+        logger.info("Schedule of the week of %s loaded: %s tasks", week_start.date(), len(self._tasks))
+
+    def _apply(self, change):
+        """
+        Apply one change_log entry of a task (create, update or delete).
+        """
+        task_id = change['id']
+        previous = self._tasks.pop(task_id, None)
+        if previous is not None:
+            employee_id, interval = previous
+            self._intervals[employee_id].remove(interval)
+        data = change['data']
+        if change['op'] == 'delete' or not data or data.get('status') in INACTIVE_STATUSES:
+            return
+        start, end = task_interval(data['start_date'], data.get('end_date'))
+        week_start = self.week_start
+        if start < week_start + timedelta(days=7) and end > week_start:
+            interval = (start, end, task_id)
+            bisect.insort(self._intervals.setdefault(data['employee_id'], []), interval)
+            self._tasks[task_id] = (data['employee_id'], interval)
+
+    def busy_employees(self, employee_ids, start, end):
+        """
+        Return the employees with a task overlapping [start, end).
+        Windows within the current week are answered from memory, others from the database.
+        :param employee_ids: Employees to check.
+        :param start: Start of the window (naive datetime).
+        :param end: End of the window (naive datetime).
+        :return: set: IDs of the busy employees.
+        """
+        if not self.covers(start, end):
+            intervals = fetch_busy_intervals(start, end, employee_ids)
+            return set(intervals)
+        with self._lock:
+            self.refresh()
+            return {
+                employee_id for employee_id in employee_ids
+                if overlaps(self._intervals.get(employee_id, []), start, end)
+            }
+
+
+# Schedule shared by the requests of this worker
+schedule = WeekSchedule()
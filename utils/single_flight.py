@@ -0,0 +1,102 @@
+# Request coalescing (single flight) for GET requests.
+#
+# When identical GET requests arrive concurrently in a worker (e.g. the
+# workshop board refreshing on many screens at once), the first one runs the
+# handler and the others wait for it and get a copy of its serialized
+# response, so the database is queried once. Requests are identical when they
+# have the same path, query parameters, credentials and validators.
+# Nothing is cached: a request arriving after the first one completed runs
+# the handler again.
+import threading
+from functools import wraps
+from operator import itemgetter
+
+from flask import Response, current_app, request
+
+from utils.database import has_uncommitted_changes
+
+# Request headers that change the response or scope it to a client
+KEY_HEADERS = ('Authorization', 'Cookie', 'If-None-Match', 'If-Modified-Since')
+
+
+class Flight:
+    """
+    A request in progress; the identical requests waiting for it get its result.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # (status, headers, body) once shared, None if it cannot be
+
+
+_flights = {}  # request key -> Flight
+_lock = threading.Lock()
+_stats = {'executed': 0, 'coalesced': 0, 'fallbacks': 0}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def stats():
+    """
+    Counters of this worker since it started:
+    executed (requests that ran the handler and shared their response),
+    coalesced (requests served with the response of an identical one),
+    fallbacks (requests that waited but ran the handler themselves, because the
+    response could not be shared or took longer than SINGLE_FLIGHT_TIMEOUT)
+    and in_flight (requests currently running the handler).
+    :return: dict
+    """
+    with _lock:
+        return {**_stats, 'in_flight': len(_flights)}
+
+
+def request_key():
+    """
+    Key of the current request: path, query parameters (in a normalized
+    order; repeated parameters keep their order) and the KEY_HEADERS.
+    """
+    query = tuple(sorted(request.args.items(multi=True), key=itemgetter(0)))
+    return request.path, query, tuple(request.headers.get(name) for name in KEY_HEADERS)
+
+
+def single_flight(view):
+    """
+    Decorator of view functions (see Api decorators) coalescing concurrent
+    identical GET requests. Streamed responses (e.g. /api/events) are not
+    shared, and neither are reads of a transaction holding uncommitted
+    changes (e.g. inside an atomic /api/batch): the waiting requests run the
+    handler themselves.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET' or not current_app.config['SINGLE_FLIGHT_ENABLED'] or has_uncommitted_changes():
+            return view(*args, **kwargs)
+        key = request_key()
+        with _lock:
+            flight = _flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _flights[key] = Flight()
+
+        if not leader:
+            if flight.done.wait(current_app.config['SINGLE_FLIGHT_TIMEOUT']) and flight.result is not None:
+                _count('coalesced')
+                status, headers, body = flight.result
+                return Response(body, status=status, headers=headers)
+            _count('fallbacks')
+            return view(*args, **kwargs)
+
+        try:
+            response = view(*args, **kwargs)
+            if isinstance(response, Response) and not response.is_streamed:
+                flight.result = (response.status_code, list(response.headers), response.get_data())
+                _count('executed')
+            return response
+        finally:
+            with _lock:
+                del _flights[key]
+            flight.done.set()
+    return wrapper
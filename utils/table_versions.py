@@ -0,0 +1,115 @@
+# Per-table version counters shared by the worker processes.
+#
+# Every committed change to a table increments its counter, so a cached
+# result can be checked with a few memory reads: it is still valid if the
+# versions of the tables it was read from have not changed. The counters live
+# in a small file mapped in memory by every worker (one 64-bit slot per
+# table), so a commit in one worker invalidates the results cached by all of
+# them. Increments take a lock on the file; reads do not.
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from utils.database import after_commit, db
+
+# Tables with a counter, in slot order (append only: the slots are stored in the file)
+TABLES = ['client', 'employee', 'invoice', 'invoice_item', 'setting', 'task', 'vehicle', 'work']
+SLOT = struct.Struct('<Q')
+
+# Tables whose rows are also changed when a row of a table is deleted
+# (ON DELETE CASCADE foreign keys of the schema; employees with tasks cannot be deleted)
+CASCADES = {
+    'client': ['vehicle', 'work', 'task', 'invoice', 'invoice_item'],
+    'vehicle': ['work', 'task', 'invoice_item'],
+    'work': ['task', 'invoice_item'],
+    'task': ['invoice_item'],
+    'invoice': ['invoice_item'],
+}
+
+
+class TableVersions:
+    """
+    Version counters of the tables, in a file mapped in memory (TABLE_VERSIONS_FILE).
+    """
+
+    def __init__(self):
+        self._fd = None
+        self._map = None
+        self._lock = threading.Lock()  # POSIX record locks do not exclude threads of the same process
+
+    def init_app(self, app):
+        """
+        Open (or create) the counter file of the application.
+        It defaults to table_versions in the instance folder. Files are only
+        ever extended, so workers of an older deploy keep their slots.
+        """
+        path = app.config.get('TABLE_VERSIONS_FILE') or os.path.join(app.instance_path, 'table_versions')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        size = SLOT.size * len(TABLES)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        app.extensions['table_versions'] = self
+
+    def get(self, tables):
+        """
+        :param tables: Names of tables (see TABLES).
+        :return: tuple: Their current versions.
+        """
+        return tuple(SLOT.unpack_from(self._map, TABLES.index(table) * SLOT.size)[0] for table in tables)
+
+    def bump(self, tables):
+        """
+        Increment the versions of tables, atomically across processes.
+        :param tables: Names of tables (see TABLES).
+        """
+        if self._map is None:
+            return  # Not bound to an application: nothing can be cached
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+            try:
+                for table in tables:
+                    offset = TABLES.index(table) * SLOT.size
+                    SLOT.pack_into(self._map, offset, SLOT.unpack_from(self._map, offset)[0] + 1)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+
+table_versions = TableVersions()
+
+
+def mark_changed(*tables):
+    """
+    Record that the current transaction changes tables: their versions are
+    incremented once it is committed (once per table and transaction).
+    :param tables: Names of the changed tables.
+    """
+    info = db.session.info
+    changed = info.get('changed_tables')
+    if changed is None:
+        changed = info['changed_tables'] = set()
+        after_commit(lambda: table_versions.bump(info.pop('changed_tables', changed)))
+    changed.update(tables)
+
+
+def mark_deleted(table):
+    """
+    Record that the current transaction deletes rows of a table, including
+    the rows the database changes in other tables through cascades.
+    :param table: Name of the table the rows are deleted from.
+    """
+    mark_changed(table, *CASCADES.get(table, []))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    """
+    Forget the tables changed by a rolled back transaction.
+    """
+    session.info.pop('changed_tables', None)
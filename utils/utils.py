@@ -1,9 +1,59 @@
-# utils/swagger.py
-from flask_restx import fields
+from flask import current_app, request
+from flask_restx import Model, Namespace, abort, fields
+from werkzeug.http import quote_etag
 from sqlalchemy import Integer, String, Text, Date, DateTime, Boolean, Float, Numeric
+from datetime import date, datetime
+from functools import cached_property
+from utils.money import Money, Rate, check_rate, to_decimal
 import logging
 
-def generate_swagger_model(api, model, exclude_fields=None, readonly_fields=None):
+def is_server_managed(column):
+    """
+    Whether a column is filled by the database rather than by clients
+    (server default or value recomputed on update, see Versioned).
+
+    :param column: SQLAlchemy Column
+    :return: bool
+    """
+    return column.server_default is not None or column.onupdate is not None
+
+
+class SharedModel(Model):
+    """
+    Swagger model shared instead of copied by the documentation decorators.
+
+    Flask-RESTx deep-copies the documentation gathered on a resource method,
+    models included, at every @doc/@expect/@marshal_with/@response decorator.
+    That copying was most of the time spent importing the resources. Models
+    are never changed once defined, so the copies can share them.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @cached_property
+    def resolved(self):
+        # Resolved on a real copy: resolution adds the fields of the parents
+        model = Model(self.name, self.items(), mask=self.__mask__, strict=self.__strict__)
+        model.__parents__ = self.__parents__
+        return model.resolved
+
+
+class ApiNamespace(Namespace):
+    """
+    Namespace whose models (model() and inherit()) are SharedModels.
+    """
+
+    def model(self, name=None, model=None, mask=None, strict=False, **kwargs):
+        shared = SharedModel(name, model, mask=mask, strict=strict)
+        shared.__apidoc__.update(kwargs)
+        return self.add_model(name, shared)
+
+    def inherit(self, name, *specs):
+        return self.add_model(name, SharedModel.inherit(name, *specs))
+
+
+def generate_swagger_model(api, model, exclude_fields=None, readonly_fields=None, name=None):
     """
     Generate a Swagger model from an SQLAlchemy model.
 
@@ -11,6 +61,7 @@ def generate_swagger_model(api, model, exclude_fields=None, readonly_fields=None
     :param model: SQLAlchemy model class
     :param exclude_fields: List of field names to exclude from the Swagger model
     :param readonly_fields: List of field names to mark as read-only
+    :param name: Name of the Swagger model (defaults to the model class name)
     :return: Flask-RESTx model
     """
     exclude_fields = exclude_fields or []
@@ -33,30 +84,228 @@ def generate_swagger_model(api, model, exclude_fields=None, readonly_fields=None
             field_type = fields.DateTime
         elif column_type == Boolean:
             field_type = fields.Boolean
-        elif column_type in [Float, Numeric]:
+        elif column_type in [Float, Numeric, Money, Rate]:  # Amounts are exchanged in euros as JSON numbers
             field_type = fields.Float
         else:
             # Default to String for unsupported types
             field_type = fields.String
 
         swagger_field = field_type(description=column.comment or column.name)
-        if column.name in readonly_fields or column.primary_key:
+        # Server-managed columns (created_at, version, updated_at, ...) are read-only too
+        if column.name in readonly_fields or column.primary_key or is_server_managed(column):
             swagger_field.readonly = True
 
         swagger_model[column.name] = swagger_field
 
-    return api.model(model.__name__, swagger_model)
+    return api.model(name or model.__name__, swagger_model)
+
+def parse_datetime(value):
+    """
+    Convert an ISO 8601 string (as sent in JSON payloads) into a datetime.
+
+    :param value: ISO 8601 date or date-time string, datetime/date object or None
+    :return: datetime object or None
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def parse_date(value):
+    """
+    Convert an ISO 8601 string (as sent in JSON payloads) into a date.
+
+    :param value: ISO 8601 date or date-time string, date/datetime object or None
+    :return: date object or None
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return parse_datetime(value).date()
+
+
+def _parse_integer(value):
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError("expected an integer")
+    return value
+
+
+def _parse_string(value):
+    if not isinstance(value, str):
+        raise TypeError("expected a string")
+    return value
+
+
+def _parse_amount(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError("expected a number")
+    return to_decimal(value)
+
+
+def _parse_iso(parser):
+    def parse(value):
+        if not isinstance(value, str):
+            raise TypeError("expected an ISO 8601 string")
+        return parser(value)
+    return parse
+
+
+# Conversion of the JSON values of a PATCH body, by column type
+PATCH_PARSERS = {
+    Integer: _parse_integer,
+    String: _parse_string,
+    Text: _parse_string,
+    Date: _parse_iso(parse_date),
+    DateTime: _parse_iso(parse_datetime),
+    Money: _parse_amount,
+    Rate: check_rate,
+}
+
 
-def configure_logging():
+def parse_patch(model, payload, api_model):
     """
-    Configure the logging system for the application.
-    Logs messages to both the console and a log file.
+    Validate and convert the sparse JSON body of a PATCH request.
+    Only the fields present in the body are returned, so an explicit null, 0
+    or empty string is written while an absent field is left unchanged.
+
+    :param model: SQLAlchemy model class of the resource
+    :param payload: Decoded JSON body
+    :param api_model: Flask-RESTx model of the resource; its read-only fields cannot be patched
+    :return: dict: Column name -> converted value, for the supplied fields only
+    :raises ValueError: If the body is not an object, or a field is unknown, read-only,
+        null while the column is NOT NULL, or has a value of the wrong type
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("The request body must be a JSON object.")
+    columns = model.__table__.columns
+    changes = {}
+    for name, value in payload.items():
+        column = columns.get(name)
+        field = api_model.get(name)
+        if column is None or field is None or field.readonly or is_server_managed(column):
+            raise ValueError(f"Field '{name}' cannot be updated.")
+        if value is None:
+            if not column.nullable:
+                raise ValueError(f"Field '{name}' cannot be null.")
+            changes[name] = None
+            continue
+        try:
+            changes[name] = PATCH_PARSERS.get(type(column.type), _parse_string)(value)
+        except TypeError as e:
+            raise ValueError(f"Invalid value for field '{name}': {e}.")
+        except (ValueError, ArithmeticError):
+            raise ValueError(f"Invalid value for field '{name}'.")
+    return changes
+
+
+def etag_header(data):
+    """
+    ETag header of a versioned resource: its row version, as a strong ETag.
+
+    :param data: Resource dictionary with a "version" key
+    :return: dict: Response headers
+    """
+    return {'ETag': quote_etag(str(data['version']))}
+
+
+def if_match_version():
+    """
+    Row version required by the If-Match header of the current request.
+
+    :return: int: The version of the ETag, or None without If-Match (or with If-Match: *)
+    :raises BadRequest: If the header does not hold exactly one strong version ETag
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    tags = if_match.as_set()  # Strong ETags only: If-Match uses the strong comparison
+    if len(tags) != 1 or not next(iter(tags)).isdigit():
+        abort(400, 'If-Match must hold one ETag as returned by the API (e.g. "3").')
+    return int(next(iter(tags)))
+
+
+def parse_updated_since():
+    """
+    The updated_since query parameter of the current request.
+
+    :return: datetime or None
+    :raises BadRequest: If the parameter is not an ISO 8601 date or date-time
+    """
+    value = request.args.get('updated_since')
+    if not value:
+        return None
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        abort(400, "updated_since must be an ISO 8601 date or date-time.")
+
+
+# Body of POST /api/<resource>/batch, registered on each namespace as 'Ids'
+IDS_FIELDS = {
+    'ids': fields.List(fields.Integer, required=True, description='IDs of the resources, in the order of the response'),
+}
+
+
+def parse_ids(values=None):
+    """
+    IDs requested by a batch read: the ids query parameter ("1,2,3") of the
+    current request, or the ids of a POST /batch body.
+    Duplicates are dropped, keeping the first occurrence.
+
+    :param values: List of IDs from a request body (default: read the query parameter)
+    :return: list: The IDs as integers, or None if the request has no ids parameter
+    :raises BadRequest: If an ID is not an integer or there are more than BATCH_MAX_IDS
+    """
+    if values is None:
+        if 'ids' not in request.args:
+            return None
+        values = split_ids(request.args['ids'])
+    try:
+        return check_ids(values, current_app.config['BATCH_MAX_IDS'])
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def split_ids(value):
+    """
+    :param value: Value of an ids query parameter ("1,2,3")
+    :return: list: Its non-empty items, as strings
+    """
+    return [item for item in value.split(',') if item.strip()]
+
+
+def check_ids(values, max_ids):
+    """
+    Convert requested IDs to integers, dropping duplicates (the first occurrence is kept).
+
+    :param values: IDs as integers or strings
+    :param max_ids: Maximum number of IDs (BATCH_MAX_IDS)
+    :return: list: The IDs as integers
+    :raises ValueError: If an ID is not an integer or there are more than max_ids
+    """
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError("ids must be a comma-separated list of integer IDs.")
+    if len(ids) > max_ids:
+        raise ValueError(f"At most {max_ids} ids can be requested at once.")
+    return ids
+
+
+def missing_ids_header(items, ids, id_field):
+    """
+    X-Missing-Ids header of a batch read: the requested IDs that were not found.
+
+    :param items: Resources returned, as dictionaries
+    :param ids: Requested IDs
+    :param id_field: Name of the ID field of the resources (e.g. "task_id")
+    :return: dict: Response headers (empty when every ID was found)
     """
-    logging.basicConfig(
-        level=logging.DEBUG,  # You can adjust the level (DEBUG, INFO, etc.)
-        format='%(asctime)s - %(levelname)s - %(message)s',  # Log message format
-        handlers=[
-            #logging.StreamHandler(),  # Logs to console
-            logging.FileHandler('app.log', mode='a')  # Logs to file (app.log)
-        ]
-    )
+    found = {item[id_field] for item in items}
+    missing = [str(row_id) for row_id in ids if row_id not in found]
+    return {'X-Missing-Ids': ','.join(missing)} if missing else {}
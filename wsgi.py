@@ -0,0 +1,6 @@
+from app import create_app  # Import the application factory
+
+# WSGI entry point used by production servers (e.g. `gunicorn wsgi:app`).
+# The application is created once at import time so that gunicorn can
+# preload it in the master process and share it with the workers.
+app = create_app()